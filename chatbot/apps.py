@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ChatbotConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chatbot"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .utils import get_chatbot_processor
+
+        # Build keyword tables and matchers once per process instead of per message
+        get_chatbot_processor()
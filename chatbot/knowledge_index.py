@@ -0,0 +1,377 @@
+import logging
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, F, Max, Q
+
+from ml_engine.text_index import column_dot, tokenize
+from .matching import KeywordMatcher
+from .models import ChatbotKnowledge
+
+logger = logging.getLogger(__name__)
+
+# Question phrasing shared by most FAQ entries, on top of the general stop words
+QUESTION_WORDS = frozenset(
+    'how what when where which who why do doe did can could would should will am if there any this that me'.split()
+)
+
+
+def knowledge_tokens(text):
+    return [token for token in tokenize(text) if token not in QUESTION_WORDS]
+
+
+class KnowledgeEntry:
+    """Pre-processed active ChatbotKnowledge row"""
+
+    __slots__ = ('id', 'question', 'answer', 'keywords', 'tokens')
+
+    def __init__(self, id, question, answer, keywords):
+        self.id = id
+        self.question = question.lower()
+        self.answer = answer
+        self.keywords = keywords
+        self.tokens = frozenset(re.findall(r'\b\w+\b', self.question))
+
+
+def load_entries():
+    """All active entries in their default (category, question) order"""
+    return [
+        KnowledgeEntry(
+            knowledge.id,
+            knowledge.question,
+            knowledge.answer,
+            tuple(knowledge.get_keywords_list())
+        )
+        for knowledge in ChatbotKnowledge.objects.filter(is_active=True).only(
+            'id', 'question', 'answer', 'keywords'
+        )
+    ]
+
+
+def table_signature():
+    """Changes whenever an entry is added, deleted, (de)activated or edited"""
+    summary = ChatbotKnowledge.objects.order_by().aggregate(
+        total=Count('id'), active=Count('id', filter=Q(is_active=True)), updated=Max('updated_at')
+    )
+    return (summary['total'], summary['active'], summary['updated'])
+
+
+class KnowledgeIndex:
+    """
+    In-memory index over active ChatbotKnowledge entries
+
+    Scores entries like the original full scan - 0.7 x SequenceMatcher ratio
+    against the question plus 0.3 x the share of the entry's keywords found in
+    the message - and returns the same best match above the threshold. Keyword
+    hits come from one pass of a combined matcher and a keyword -> entry index.
+    Per-character count vectors give SequenceMatcher.quick_ratio(), an upper
+    bound on ratio(), for every entry at once, so the expensive ratio() is only
+    computed for entries (those sharing tokens first) whose bound can still beat
+    the best score so far.
+    """
+
+    QUESTION_WEIGHT = 0.7
+    KEYWORD_WEIGHT = 0.3
+    THRESHOLD = 0.4
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.by_id = {entry.id: entry for entry in entries}
+        self.keyword_entries = {}
+        self.token_entries = {}
+        for position, entry in enumerate(entries):
+            for keyword in entry.keywords:
+                self.keyword_entries.setdefault(keyword, []).append(position)
+            for token in entry.tokens:
+                self.token_entries.setdefault(token, []).append(position)
+        self.keyword_matcher = KeywordMatcher({'knowledge': self.keyword_entries})
+
+        self.alphabet = {char: i for i, char in enumerate(sorted({c for e in entries for c in e.question}))}
+        self.char_counts = np.zeros((len(entries), len(self.alphabet)), dtype=np.int32)
+        for position, entry in enumerate(entries):
+            for char in entry.question:
+                self.char_counts[position, self.alphabet[char]] += 1
+        self.question_lengths = np.array([len(entry.question) for entry in entries], dtype=np.int64)
+        self.keyword_counts = np.array([len(entry.keywords) for entry in entries], dtype=float)
+
+    @classmethod
+    def build(cls):
+        return cls(load_entries())
+    
+    @classmethod
+    def current(cls, index=None):
+        """Cheap enough to rebuild from the table every time"""
+        return cls.build()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, message_lower):
+        """Best entry above the threshold for the message, or None"""
+        if not self.entries:
+            return None
+
+        keyword_scores = self._keyword_scores(message_lower)
+
+        # quick_ratio(): matching characters counted as a multiset intersection
+        message_counts = np.zeros(len(self.alphabet), dtype=np.int32)
+        for char in message_lower:
+            index = self.alphabet.get(char)
+            if index is not None:
+                message_counts[index] += 1
+        common = np.minimum(self.char_counts, message_counts).sum(axis=1)
+        total = self.question_lengths + len(message_lower)
+        ratio_bounds = np.divide(2.0 * common, total, out=np.zeros(len(self.entries)), where=total > 0)
+        bounds = self.QUESTION_WEIGHT * ratio_bounds + self.KEYWORD_WEIGHT * keyword_scores
+
+        # Entries sharing tokens with the message first, then by bound; ties keep the scan order
+        shared = np.zeros(len(self.entries), dtype=bool)
+        for token in set(re.findall(r'\b\w+\b', message_lower)):
+            shared[self.token_entries.get(token, [])] = True
+        order = np.lexsort((np.arange(len(self.entries)), -bounds, ~shared))
+
+        best_position = None
+        best_score = self.THRESHOLD
+        for position in order.tolist():
+            bound = bounds[position]
+            if bound < best_score or (bound == best_score and best_position is not None and position > best_position):
+                continue
+            question_score = SequenceMatcher(None, message_lower, self.entries[position].question).ratio()
+            score = question_score * self.QUESTION_WEIGHT + keyword_scores[position] * self.KEYWORD_WEIGHT
+            if score > best_score or (score == best_score and best_position is not None and position < best_position):
+                best_position = position
+                best_score = score
+
+        return self.entries[best_position] if best_position is not None else None
+
+    def _keyword_scores(self, message_lower):
+        """Share of each entry's keywords contained in the message"""
+        hits = np.zeros(len(self.entries))
+        for keyword in self.keyword_matcher.keywords(message_lower):
+            for position in self.keyword_entries[keyword]:
+                hits[position] += 1
+        return np.divide(hits, self.keyword_counts, out=np.zeros(len(self.entries)), where=self.keyword_counts > 0)
+
+
+class BM25KnowledgeIndex:
+    """
+    Sparse BM25 matrix over knowledge question, keywords and answer
+
+    Each field's term frequencies are saturated with k1 and normalized for that
+    field's length with b, mixed with FIELD_WEIGHTS (so long answers don't drown
+    out the question) and scaled by idf; each entry's row is then L2-normalized.
+    A message is scored against every entry with one sparse mat-vec over
+    column-major arrays, giving cosine similarities in [0, 1] between its
+    idf-weighted terms and the entries. The index is built and saved, with a
+    signature of the table, by `manage.py populate_chatbot --index-only`;
+    workers load it, and only build one in memory while it is out of date.
+    """
+
+    FORMAT_VERSION = 1
+    FIELD_WEIGHTS = {'question': 1.0, 'keywords': 1.0, 'answer': 0.25}  # In the order load_entries() texts are read
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, entries, vocabulary, idf, indptr, column_rows, column_weights, signature=None):
+        self.entries = entries
+        self.by_id = {entry.id: entry for entry in entries}
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.indptr = indptr
+        self.column_rows = column_rows
+        self.column_weights = column_weights
+        self.signature = signature
+        self.min_score = getattr(settings, 'CHATBOT_KNOWLEDGE_MIN_SCORE', 0.25)
+
+    @classmethod
+    def build(cls, signature=None):
+        entries = load_entries()
+        fields = list(cls.FIELD_WEIGHTS)
+        vocabulary = {}
+        rows, terms, field_ids, frequencies = [], [], [], []
+        for position, entry in enumerate(entries):
+            texts = (entry.question, ' '.join(entry.keywords), entry.answer)
+            for field_id, text in enumerate(texts):
+                for term, frequency in Counter(knowledge_tokens(text)).items():
+                    rows.append(position)
+                    terms.append(vocabulary.setdefault(term, len(vocabulary)))
+                    field_ids.append(field_id)
+                    frequencies.append(frequency)
+
+        n_entries, n_terms = len(entries), len(vocabulary)
+        rows = np.array(rows, dtype=np.int64)
+        terms = np.array(terms, dtype=np.int64)
+        field_ids = np.array(field_ids, dtype=np.int64)
+        frequencies = np.array(frequencies, dtype=float)
+
+        # Saturate each field's term frequency against that field's length, then mix the fields
+        lengths = np.bincount(field_ids * n_entries + rows, weights=frequencies,
+                              minlength=len(fields) * n_entries).reshape(len(fields), n_entries)
+        average_lengths = lengths.mean(axis=1, keepdims=True) if n_entries else np.zeros((len(fields), 1))
+        length_norm = 1.0 - cls.B + cls.B * np.divide(
+            lengths, average_lengths, out=np.zeros_like(lengths), where=average_lengths > 0
+        )
+        saturated = frequencies * (cls.K1 + 1.0) / (frequencies + cls.K1 * length_norm[field_ids, rows])
+        saturated *= np.array([cls.FIELD_WEIGHTS[field] for field in fields])[field_ids]
+
+        cells, cell_index = np.unique(rows * n_terms + terms, return_inverse=True)
+        rows, terms = cells // max(n_terms, 1), cells % max(n_terms, 1)
+        saturated = np.bincount(cell_index, weights=saturated, minlength=len(cells))
+
+        document_frequency = np.bincount(terms, minlength=n_terms)
+        idf = np.log(1.0 + (n_entries - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        weights = idf[terms] * saturated
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=n_entries))
+        weights = np.divide(weights, norms[rows], out=np.zeros_like(weights), where=norms[rows] > 0)
+
+        # Cells are sorted by entry; a stable sort by term keeps entries in order within each column
+        order = np.argsort(terms, kind='stable')
+        indptr = np.concatenate([[0], np.cumsum(document_frequency)])
+        return cls(entries, vocabulary, idf, indptr, rows[order], weights[order], signature)
+
+    @classmethod
+    def current(cls, index=None):
+        """
+        index if it still matches the table, else the saved index if that does.
+        Otherwise, so deactivated or edited entries are never served, one is built
+        in memory (with a warning) and kept until populate_chatbot --index-only
+        saves a matching index; it is never saved here.
+        """
+        signature = table_signature()
+        if index is not None and index.signature == signature:
+            return index
+
+        path = knowledge_index_path()
+        try:
+            saved = cls.load(path)
+        except FileNotFoundError:
+            saved = None
+        except Exception as e:
+            logger.error(f"Error loading chatbot knowledge index from {path}: {str(e)}")
+            saved = None
+        if saved is not None and saved.signature == signature:
+            return saved
+
+        logger.warning(f"Chatbot knowledge index at {path} is missing or out of date; building one in memory, "
+                       "run populate_chatbot --index-only to save it")
+        return cls.build(signature)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def top_k(self, message, k=5):
+        """Up to k (entry, cosine similarity) pairs, best first, for entries sharing a term with the message"""
+        term_ids = sorted({self.vocabulary[t] for t in knowledge_tokens(message) if t in self.vocabulary})
+        if not term_ids:
+            return []
+
+        query_weights = self.idf[term_ids]
+        query_weights = query_weights / np.linalg.norm(query_weights)
+        scores = column_dot(
+            self.indptr, self.column_rows, self.column_weights, term_ids, query_weights, len(self.entries)
+        )
+
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            # Entries tied with the k-th score are taken in table order too
+            kth_score = np.partition(scores[matched], len(matched) - k)[len(matched) - k]
+            above = matched[scores[matched] > kth_score]
+            tied = matched[scores[matched] == kth_score][:k - len(above)]
+            matched = np.concatenate([above, tied])
+        # Best first; equal scores keep the table order
+        matched = matched[np.lexsort((matched, -scores[matched]))]
+        return [(self.entries[position], float(min(scores[position], 1.0))) for position in matched.tolist()]
+
+    def search(self, message_lower):
+        """Best entry scoring at least CHATBOT_KNOWLEDGE_MIN_SCORE, or None"""
+        results = self.top_k(message_lower, 1)
+        if results and results[0][1] >= self.min_score:
+            return results[0][0]
+        return None
+
+    def save(self, path):
+        """Atomically write the index to disk"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({
+                'version': self.FORMAT_VERSION,
+                'entries': self.entries,
+                'vocabulary': self.vocabulary,
+                'idf': self.idf,
+                'indptr': self.indptr,
+                'column_rows': self.column_rows,
+                'column_weights': self.column_weights,
+                'signature': self.signature,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != cls.FORMAT_VERSION:
+            return None
+        return cls(
+            data['entries'], data['vocabulary'], data['idf'], data['indptr'],
+            data['column_rows'], data['column_weights'], data['signature']
+        )
+
+
+KNOWLEDGE_INDEXES = {
+    'fuzzy': KnowledgeIndex,
+    'bm25': BM25KnowledgeIndex,
+}
+
+
+def knowledge_index_path():
+    return Path(getattr(settings, 'ML_ENGINE_DATA_DIR', settings.BASE_DIR / 'ml_data')) / 'chatbot_knowledge_bm25.pkl'
+
+
+def record_usage(entry):
+    """Count a served answer without a model save, so the index is not invalidated"""
+    ChatbotKnowledge.objects.filter(pk=entry.id).update(usage_count=F('usage_count') + 1)
+
+
+_index = None
+_built_at = 0.0
+_stale = False
+_lock = threading.Lock()
+
+
+def get_knowledge_index():
+    """
+    Process-wide knowledge index of the CHATBOT_KNOWLEDGE_INDEX kind ('bm25' or
+    'fuzzy'), checked against the table after a ChatbotKnowledge change in this
+    process or every CHATBOT_KNOWLEDGE_REFRESH_INTERVAL seconds: the fuzzy index
+    is rebuilt, the BM25 index reloaded from disk or, if the saved one is out of
+    date, rebuilt in memory
+    """
+    global _index, _built_at, _stale
+
+    index_class = KNOWLEDGE_INDEXES[getattr(settings, 'CHATBOT_KNOWLEDGE_INDEX', 'bm25')]
+    interval = getattr(settings, 'CHATBOT_KNOWLEDGE_REFRESH_INTERVAL', 300)
+    with _lock:
+        if (not isinstance(_index, index_class) or _stale
+                or time.monotonic() - _built_at >= interval):
+            _index = index_class.current(_index if isinstance(_index, index_class) else None)
+            _built_at = time.monotonic()
+            _stale = False
+        return _index
+
+
+def mark_knowledge_index_stale():
+    """Check the index against the table on the next lookup in this process"""
+    global _stale
+    _stale = True
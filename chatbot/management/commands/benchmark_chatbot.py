@@ -0,0 +1,79 @@
+import io
+import random
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from chatbot.utils import ChatbotProcessor, get_chatbot_processor
+
+MESSAGE_TEMPLATES = [
+    "hello, I need a plumber for a leaking kitchen sink",
+    "how much does deep cleaning cost for a 2 bhk",
+    "can you book an electrician for tomorrow morning",
+    "my fridge stopped cooling, is it urgent repair possible today",
+    "thanks for the help",
+    "what payment methods do you accept",
+    "do you have termite treatment in my area",
+    "I want to schedule interior painting next week",
+    "how do I cancel my booking",
+    "are your service providers verified",
+    "goodbye",
+    "plumbr needed",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark chatbot message processing in messages per second: a processor built per "
+        "message versus the shared one, plus intent and service detection alone. "
+        "Runs against a throwaway test database seeded by populate_chatbot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000, help="Messages processed per measurement")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for message order")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        # A distinct suffix per message keeps memoized matches from flattering the numbers
+        messages = [
+            f"{rng.choice(MESSAGE_TEMPLATES)} {i}" for i in range(options["messages"])
+        ]
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Keep the throwaway knowledge index away from the saved one
+            with tempfile.TemporaryDirectory() as data_dir, override_settings(ML_ENGINE_DATA_DIR=data_dir):
+                call_command("populate_chatbot", stdout=io.StringIO())
+                shared = get_chatbot_processor()
+
+                results = {
+                    "processor per message": self._rate(
+                        messages, lambda message: ChatbotProcessor().process_message(message)
+                    ),
+                    "shared processor": self._rate(messages, shared.process_message),
+                    "detection only": self._rate(messages, lambda message: self._detect(shared, message)),
+                }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for name, rate in results.items():
+            self.stdout.write(f"{name:>24}: {rate:>10.0f} msgs/sec")
+
+    def _rate(self, messages, func):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        return len(messages) / (time.perf_counter() - start)
+
+    def _detect(self, processor, message):
+        message_lower = message.lower()
+        processor._detect_intent(message)
+        processor._detect_service_type(message_lower)
+        processor._is_booking_request(message_lower)
+        processor._is_pricing_request(message_lower)
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot.semantic_index import SemanticIndex, load_embedding_model, semantic_index_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Embed active chatbot knowledge questions and intent examples for semantic search, "
+        "saving the model and a memory-mapped embedding matrix"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            default=None,
+            help="sentence-transformers model name or path (default: CHATBOT_EMBEDDING_MODEL)",
+        )
+
+    def handle(self, *args, **options):
+        model_name = options["model"] or getattr(
+            settings, "CHATBOT_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+        )
+        start = time.perf_counter()
+
+        model = load_embedding_model(model_name)
+        if model is None:
+            raise CommandError("sentence-transformers is not installed; the chatbot keeps matching lexically")
+
+        index = SemanticIndex.build(model, model_name)
+        directory = semantic_index_dir()
+        index.save(directory)
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {len(index.rows)} embeddings of dimension {index.embeddings.shape[1]} from {model_name} "
+            f"to {directory} in {time.perf_counter() - start:.1f}s"
+        ))
@@ -1,11 +1,40 @@
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from chatbot.knowledge_index import BM25KnowledgeIndex, knowledge_index_path, table_signature
 from chatbot.models import ChatbotKnowledge, ChatbotIntent, ChatbotEntity
 
 
 class Command(BaseCommand):
-    help = 'Populate chatbot with sample knowledge base'
+    help = 'Populate chatbot with sample knowledge base and rebuild the saved retrieval index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index-only',
+            action='store_true',
+            help='Only rebuild the knowledge retrieval index from the current entries',
+        )
 
     def handle(self, *args, **options):
+        if not options['index_only']:
+            self.populate()
+        self.build_index()
+        if getattr(settings, 'CHATBOT_SEMANTIC_SEARCH', False):
+            try:
+                call_command('build_chatbot_embeddings', stdout=self.stdout)
+            except CommandError as e:
+                self.stdout.write(self.style.WARNING(f'Skipped semantic embeddings: {e}'))
+
+    def build_index(self):
+        path = knowledge_index_path()
+        index = BM25KnowledgeIndex.build(table_signature())
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved knowledge retrieval index with {len(index)} entries and '
+            f'{len(index.vocabulary)} terms to {path}'
+        ))
+
+    def populate(self):
         self.stdout.write('Populating chatbot knowledge base...')
         
         # Sample knowledge base data
@@ -0,0 +1,164 @@
+import re
+from functools import lru_cache
+
+
+class KeywordMatcher:
+    """
+    Every keyword list compiled into one regex for single-pass substring matching
+
+    The keywords form a trie, turned into a pattern that is tried as a lookahead
+    at each position so overlapping matches are found; longer keywords are
+    preferred, and any shorter keywords that are prefixes of a match are added
+    back. The result is exactly the set of keywords for which `keyword in text`
+    holds, labelled with the groups they belong to. Results are memoized per text.
+    """
+    
+    def __init__(self, groups, cache_size=1024):
+        self.groups = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                self.groups.setdefault(keyword, set()).add(group)
+        
+        keywords = sorted(self.groups)
+        self.prefixes = {
+            keyword: frozenset(other for other in keywords if keyword.startswith(other))
+            for keyword in keywords
+        }
+        self.pattern = re.compile('(?=(' + self._trie_pattern(keywords) + '))')
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+    
+    @classmethod
+    def _trie_pattern(cls, keywords):
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True
+        return cls._node_pattern(trie)
+    
+    @classmethod
+    def _node_pattern(cls, node):
+        branches = [re.escape(char) + cls._node_pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A keyword ending here makes the rest optional; the greedy group keeps the longest match
+        return f'(?:{pattern})?' if '' in node else pattern
+    
+    def _match(self, text):
+        """(matched keywords, matched groups) for text"""
+        keywords = set()
+        for found in self.pattern.finditer(text):
+            keyword = found.group(1)
+            if keyword:
+                keywords |= self.prefixes[keyword]
+        groups = set()
+        for keyword in keywords:
+            groups |= self.groups[keyword]
+        return frozenset(keywords), frozenset(groups)
+    
+    def keywords(self, text):
+        return self.match(text)[0]
+    
+    def labels(self, text):
+        return self.match(text)[1]
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance between a and b, or limit + 1 once it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            cost = char_a != char_b
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                current[j] = min(current[j], previous2[j - 2] + cost)
+        # A transposition skips one row, so only two rows over the limit rule out a match
+        if min(current) > limit and min(previous) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class FuzzyKeywordMatcher:
+    """
+    Typo-tolerant keyword lookup over the words of a text (SymSpell-style)
+
+    Every keyword of at least min_length characters is stored under each string
+    obtained by deleting up to its allowed number of characters: 1 edit, or 2 for
+    keywords of long_length characters or more. A word (or pair of adjacent words,
+    for two-word keywords) then only needs its own deletions looked up to find all
+    keywords within that edit distance, which are confirmed with an exact bounded
+    distance. Typos rarely hit the first letter, so candidates must share it; this
+    keeps common words ('just', 'night') from matching keywords ('dust', 'light').
+    Results are memoized per word and per text.
+    """
+    
+    MAX_DISTANCE = 2
+    
+    def __init__(self, groups, min_length=5, long_length=8, cache_size=1024):
+        self.min_length = min_length
+        self.long_length = long_length
+        self.rank = {}  # keyword -> (group position, keyword position, group) for ties
+        for group_position, (group, keywords) in enumerate(groups.items()):
+            for keyword_position, keyword in enumerate(keywords):
+                if len(keyword) >= min_length and keyword not in self.rank:
+                    self.rank[keyword] = (group_position, keyword_position, group)
+        
+        self.deletes = {}
+        for keyword in self.rank:
+            for variant in self._deletes(keyword, self._allowed(keyword)):
+                self.deletes.setdefault(variant, set()).add(keyword)
+        self.phrase_words = max((keyword.count(' ') + 1 for keyword in self.rank), default=1)
+        
+        self.lookup = lru_cache(maxsize=cache_size * 4)(self._lookup)
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+    
+    def _allowed(self, keyword):
+        return 2 if len(keyword) >= self.long_length else 1
+    
+    @staticmethod
+    def _deletes(word, distance):
+        variants = {word}
+        frontier = {word}
+        for _ in range(distance):
+            frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+            variants |= frontier
+        return variants
+    
+    def _lookup(self, term):
+        """(distance, keyword) pairs for keywords within their allowed distance of term"""
+        if len(term) < self.min_length - 1:
+            return ()
+        candidates = set()
+        for variant in self._deletes(term, self.MAX_DISTANCE):
+            candidates |= self.deletes.get(variant, set())
+        
+        found = []
+        for keyword in candidates:
+            if keyword[0] != term[0]:
+                continue
+            distance = edit_distance(term, keyword, self._allowed(keyword))
+            if distance <= self._allowed(keyword):
+                found.append((distance, keyword))
+        return tuple(found)
+    
+    def _match(self, text):
+        """(group, keyword, distance) of the closest keyword to a word of text, or None"""
+        words = re.findall(r'\b\w+\b', text)
+        best = None
+        for size in range(1, self.phrase_words + 1):
+            for start in range(len(words) - size + 1):
+                for distance, keyword in self.lookup(' '.join(words[start:start + size])):
+                    key = (distance, self.rank[keyword][:2])
+                    if best is None or key < best[0]:
+                        best = (key, keyword, distance)
+        if best is None:
+            return None
+        _, keyword, distance = best
+        return self.rank[keyword][2], keyword, distance
@@ -0,0 +1,199 @@
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .models import ChatbotIntent, ChatbotKnowledge
+
+logger = logging.getLogger(__name__)
+
+
+def semantic_index_dir():
+    return Path(getattr(settings, 'ML_ENGINE_DATA_DIR', settings.BASE_DIR / 'ml_data')) / 'chatbot_semantic'
+
+
+def load_embedding_model(name_or_path):
+    """SentenceTransformer for name_or_path, or None when sentence-transformers is not installed"""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    return SentenceTransformer(str(name_or_path), device='cpu')
+
+
+class SemanticIndex:
+    """
+    Sentence embeddings of knowledge questions and intent examples
+
+    Built offline (`manage.py build_chatbot_embeddings`): the model is saved next
+    to a float32 matrix of L2-normalized embeddings, one row per text, which is
+    memory-mapped when loaded. At request time only the queries are embedded, in
+    one batch, and scored against the matrix with blocked dot products (cosine
+    similarity). Rows point back to their ChatbotKnowledge or ChatbotIntent.
+    """
+
+    FORMAT_VERSION = 1
+    BLOCK_ROWS = 65536  # Matrix rows multiplied at a time, bounding the score buffer
+    ENCODE_BATCH_SIZE = 64
+
+    def __init__(self, model, embeddings, rows, model_name):
+        self.model = model
+        self.embeddings = embeddings
+        self.rows = rows  # (kind, object id, label) per embedding row
+        self.model_name = model_name
+        self.kinds = np.array([kind for kind, _, _ in rows])
+        self.min_score = getattr(settings, 'CHATBOT_SEMANTIC_MIN_SCORE', 0.6)
+        self._embed_one = lru_cache(maxsize=256)(self._encode_one)
+
+    @classmethod
+    def build(cls, model, model_name):
+        """Embed every active knowledge question and intent example"""
+        rows, texts = [], []
+        for knowledge_id, question in ChatbotKnowledge.objects.filter(is_active=True).values_list('id', 'question'):
+            rows.append(('knowledge', knowledge_id, question))
+            texts.append(question)
+        for intent in ChatbotIntent.objects.filter(is_active=True):
+            for example in intent.examples or []:
+                rows.append(('intent', intent.id, intent.name))
+                texts.append(example)
+
+        embeddings = cls._encode(model, texts)
+        return cls(model, embeddings, rows, model_name)
+
+    @classmethod
+    def _encode(cls, model, texts):
+        dimension = model.get_sentence_embedding_dimension()
+        if not texts:
+            return np.zeros((0, dimension), dtype=np.float32)
+        return np.asarray(model.encode(
+            list(texts), batch_size=cls.ENCODE_BATCH_SIZE, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False
+        ), dtype=np.float32)
+
+    def _encode_one(self, text):
+        return self._encode(self.model, [text])[0]
+
+    def embed(self, queries):
+        """Query embeddings; a single query is memoized, since a message is looked up more than once"""
+        if len(queries) == 1:
+            return self._embed_one(queries[0])[np.newaxis, :]
+        return self._encode(self.model, queries)
+
+    def search(self, queries, k=5, kind=None):
+        """
+        Per query, up to k (object id, label, cosine similarity) for the nearest rows
+        of kind ('knowledge', 'intent' or any), best first, at least min_score
+        """
+        if not queries:
+            return []
+        query_embeddings = self.embed(list(queries))
+
+        scores = np.empty((len(queries), len(self.rows)), dtype=np.float32)
+        for start in range(0, len(self.rows), self.BLOCK_ROWS):
+            block = self.embeddings[start:start + self.BLOCK_ROWS]
+            scores[:, start:start + len(block)] = query_embeddings @ block.T
+        if kind is not None:
+            scores[:, self.kinds != kind] = -np.inf
+
+        results = []
+        for query_scores in scores:
+            candidates = np.flatnonzero(query_scores >= self.min_score)
+            if len(candidates) > k:
+                # Rows tied with the k-th score are taken in row order, like the final sort
+                candidate_scores = query_scores[candidates]
+                kth_score = np.partition(candidate_scores, len(candidates) - k)[len(candidates) - k]
+                above = candidates[candidate_scores > kth_score]
+                tied = candidates[candidate_scores == kth_score][:k - len(above)]
+                candidates = np.concatenate([above, tied])
+            candidates = candidates[np.lexsort((candidates, -query_scores[candidates]))]
+            results.append([
+                (self.rows[row][1], self.rows[row][2], float(query_scores[row])) for row in candidates.tolist()
+            ])
+        return results
+
+    def save(self, directory):
+        """Write the model, embeddings and row metadata to directory, replacing the embeddings atomically"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.model.save(str(directory / 'model'))
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.npy.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        fd, tmp_meta_path = tempfile.mkstemp(dir=directory, suffix='.pkl.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({
+                'version': self.FORMAT_VERSION,
+                'rows': self.rows,
+                'model_name': self.model_name,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, directory / 'embeddings.npy')
+        os.replace(tmp_meta_path, directory / 'rows.pkl')
+
+    @classmethod
+    def load(cls, directory):
+        """Index saved in directory, or None if there is none or the model can't be loaded"""
+        directory = Path(directory)
+        with open(directory / 'rows.pkl', 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != cls.FORMAT_VERSION:
+            return None
+        embeddings = np.load(directory / 'embeddings.npy', mmap_mode='r')
+        if len(embeddings) != len(data['rows']):
+            return None
+
+        model = load_embedding_model(directory / 'model')
+        if model is None:
+            return None
+        return cls(model, embeddings, data['rows'], data['model_name'])
+
+
+_index = None
+_loaded_mtime = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_semantic_index():
+    """
+    Process-wide semantic index, or None when CHATBOT_SEMANTIC_SEARCH is off, nothing
+    has been built, or sentence-transformers is not installed (callers then match
+    lexically). Reloaded when the saved embeddings change, checked every
+    CHATBOT_KNOWLEDGE_REFRESH_INTERVAL seconds; never rebuilt here.
+    """
+    global _index, _loaded_mtime, _checked_at
+
+    if not getattr(settings, 'CHATBOT_SEMANTIC_SEARCH', False):
+        return None
+
+    interval = getattr(settings, 'CHATBOT_KNOWLEDGE_REFRESH_INTERVAL', 300)
+    with _lock:
+        if _checked_at and time.monotonic() - _checked_at < interval:
+            return _index
+        _checked_at = time.monotonic()
+
+        directory = semantic_index_dir()
+        try:
+            mtime = (directory / 'rows.pkl').stat().st_mtime
+        except FileNotFoundError:
+            _index, _loaded_mtime = None, None
+            return None
+        if mtime == _loaded_mtime:
+            return _index
+
+        try:
+            _index = SemanticIndex.load(directory)
+        except Exception as e:
+            logger.error(f"Error loading chatbot semantic index from {directory}: {str(e)}")
+            _index = None
+        if _index is None:
+            logger.warning("Chatbot semantic search unavailable, falling back to lexical matching")
+        _loaded_mtime = mtime
+        return _index
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .knowledge_index import mark_knowledge_index_stale
+from .models import ChatbotKnowledge
+
+
+@receiver(post_save, sender=ChatbotKnowledge)
+def invalidate_knowledge_index_on_save(sender, instance, update_fields=None, **kwargs):
+    """Usage count bumps don't change what the index matches on"""
+    if update_fields is not None and set(update_fields) == {'usage_count'}:
+        return
+    mark_knowledge_index_stale()
+
+
+@receiver(post_delete, sender=ChatbotKnowledge)
+def invalidate_knowledge_index_on_delete(sender, instance, **kwargs):
+    mark_knowledge_index_stale()
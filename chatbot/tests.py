@@ -1,3 +1,271 @@
-from django.test import TestCase
+import random
+import tempfile
+from difflib import SequenceMatcher
+from io import StringIO
+from string import ascii_lowercase
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .knowledge_index import KnowledgeIndex, get_knowledge_index, mark_knowledge_index_stale
+from .matching import FuzzyKeywordMatcher, KeywordMatcher, edit_distance
+from .models import ChatbotKnowledge
+from .utils import ChatbotProcessor
+
+FILLER = ['i', 'need', 'a', 'the', 'my', 'is', 'for', 'please', 'at', 'home', 'tomorrow', 'asap', 'x', 'ing']
+
+
+def sample_messages(keywords, count=2000, seed=0):
+    """Keywords and filler words joined with and without spaces, so keywords also overlap and nest"""
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        parts = rng.sample(keywords, rng.randint(0, 3)) + rng.sample(FILLER, rng.randint(0, 4))
+        rng.shuffle(parts)
+        messages.append(rng.choice([' ', '', '-']).join(parts))
+    return messages
+
+
+class KeywordMatcherTests(SimpleTestCase):
+    """One regex pass finds exactly the keywords that `keyword in message` finds"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.processor = ChatbotProcessor()
+        cls.groups = {
+            'greeting': cls.processor.greetings,
+            'booking': cls.processor.booking_keywords,
+            'pricing': cls.processor.pricing_keywords,
+            'emergency': cls.processor.emergency_keywords,
+            **{f'service:{name}': keywords for name, keywords in cls.processor.service_keywords.items()},
+        }
+        cls.keywords = sorted({keyword for keywords in cls.groups.values() for keyword in keywords})
+
+    def test_matches_substring_search(self):
+        matcher = KeywordMatcher(self.groups)
+        for message in sample_messages(self.keywords):
+            with self.subTest(message=message):
+                expected = {keyword for keyword in self.keywords if keyword in message}
+                self.assertEqual(matcher.keywords(message), expected)
+                self.assertEqual(matcher.labels(message), {
+                    group for group, keywords in self.groups.items() if any(k in message for k in keywords)
+                })
+
+    def test_overlapping_and_prefix_keywords(self):
+        matcher = KeywordMatcher({'a': ['pest', 'pest control', 'control'], 'b': ['ant', 'pesticide']})
+        self.assertEqual(matcher.keywords('pest control'), {'pest', 'pest control', 'control'})
+        self.assertEqual(matcher.keywords('pesticide plant'), {'pest', 'pesticide', 'ant'})
+        self.assertEqual(matcher.keywords('nothing here'), frozenset())
+
+    def test_service_type_matches_declaration_order(self):
+        service_keywords = self.processor.service_keywords
+        for message in sample_messages(self.keywords, seed=1):
+            expected = next((
+                service_type for service_type, keywords in service_keywords.items()
+                if any(keyword in message for keyword in keywords)
+            ), None)
+            if expected is not None:
+                with self.subTest(message=message):
+                    self.assertEqual(self.processor._detect_service_type(message), expected)
+
+
+def osa_distance(a, b):
+    """Unbounded optimal string alignment distance, computed over the full table"""
+    table = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            table[i][j] = min(table[i - 1][j] + 1, table[i][j - 1] + 1, table[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                table[i][j] = min(table[i][j], table[i - 2][j - 2] + cost)
+    return table[-1][-1]
+
+
+def typos(word, rng):
+    """One deletion, substitution, insertion or transposition, never touching the first letter"""
+    i = rng.randrange(1, len(word))
+    char = rng.choice(ascii_lowercase)
+    return {
+        word[:i] + word[i + 1:],
+        word[:i] + char + word[i + 1:],
+        word[:i] + char + word[i:],
+        word[:i] + word[i + 1:i + 2] + word[i] + word[i + 2:],
+    } - {word}
+
+
+class FuzzyServiceMatchingTests(SimpleTestCase):
+    """Typo matching finds what the old whole-message SequenceMatcher found, and typos inside longer messages"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.processor = ChatbotProcessor()
+        cls.matcher = cls.processor.service_fuzzy_matcher
+
+    def old_fuzzy_service_type(self, message):
+        best_match, best_score = None, 0
+        for service_type, keywords in self.processor.service_keywords.items():
+            for keyword in keywords:
+                similarity = SequenceMatcher(None, message, keyword).ratio()
+                if similarity > 0.6 and similarity > best_score:
+                    best_match, best_score = service_type, similarity
+        return best_match
+
+    def test_edit_distance_is_bounded_osa(self):
+        rng = random.Random(0)
+        for _ in range(3000):
+            a = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 7)))
+            b = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 7)))
+            limit = rng.randint(0, 3)
+            with self.subTest(a=a, b=b, limit=limit):
+                self.assertEqual(edit_distance(a, b, limit), min(osa_distance(a, b), limit + 1))
+
+    def test_lookup_matches_scan_of_keywords(self):
+        keywords = list(self.matcher.rank)
+        rng = random.Random(1)
+        terms = {typo for keyword in keywords for _ in range(5) for typo in typos(keyword, rng)}
+        for term in sorted(terms):
+            expected = {
+                (osa_distance(term, keyword), keyword) for keyword in keywords
+                if keyword[0] == term[0] and osa_distance(term, keyword) <= self.matcher._allowed(keyword)
+            }
+            with self.subTest(term=term):
+                self.assertEqual(set(self.matcher.lookup(term)), expected)
+
+    def test_finds_typos_the_old_matcher_found(self):
+        service_keywords = self.processor.service_keywords
+        keywords = [keyword for words in service_keywords.values() for keyword in words if len(keyword) >= 5]
+        rng = random.Random(2)
+        checked = 0
+        for keyword in keywords:
+            for typo in sorted(typos(keyword, rng)):
+                if self.processor.matcher.labels(typo) or self.old_fuzzy_service_type(typo) is None:
+                    continue
+                checked += 1
+                with self.subTest(keyword=keyword, typo=typo):
+                    match = self.matcher.match(typo)
+                    self.assertIsNotNone(match)
+                    # The closest keyword wins, so it is at most as far as the one the typo came from
+                    self.assertLessEqual(match[2], osa_distance(typo, keyword))
+        self.assertGreater(checked, 100)
+
+    def test_detect_service_type(self):
+        cases = {
+            'plumbr': 'plumbing',
+            'need a plumbr tomorrow': 'plumbing',  # The whole-message comparison missed typos in longer messages
+            'electritian for the kitchen': 'electrical',
+            'cockraoch in the kitchen': 'pest_control',
+            'refrigirator stopped working': 'appliance',
+            'hello there': None,
+            'nice night': None,  # Near 'light' and 'dust' only when the first letter changes
+            'just asking': None,
+        }
+        for message, service_type in cases.items():
+            with self.subTest(message=message):
+                self.assertEqual(self.processor._detect_service_type(message), service_type)
+
+    def test_short_keywords_are_not_fuzzy(self):
+        matcher = FuzzyKeywordMatcher({'pest_control': ['ant', 'bug', 'pest']})
+        self.assertIsNone(matcher.match('and big past'))
+
+
+class FuzzyKnowledgeIndexTests(TestCase):
+    """The bounded fuzzy index picks the same entry as the full SequenceMatcher scan it replaced"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(
+            ML_ENGINE_DATA_DIR=cls.enterClassContext(tempfile.TemporaryDirectory())
+        ))
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('populate_chatbot', stdout=StringIO())
+
+    def old_search(self, message_lower):
+        best_match, best_score = None, 0
+        for entry in ChatbotKnowledge.objects.filter(is_active=True):
+            question_score = SequenceMatcher(None, message_lower, entry.question.lower()).ratio()
+            keywords = entry.get_keywords_list()
+            keyword_score = sum(keyword in message_lower for keyword in keywords) / len(keywords) if keywords else 0
+            combined_score = (question_score * 0.7) + (keyword_score * 0.3)
+            if combined_score > best_score and combined_score > 0.4:
+                best_match, best_score = entry, combined_score
+        return best_match
+
+    def messages(self):
+        rng = random.Random(3)
+        entries = list(ChatbotKnowledge.objects.filter(is_active=True))
+        keywords = sorted({keyword for entry in entries for keyword in entry.get_keywords_list()})
+        for entry in entries:
+            words = entry.question.lower().split()
+            yield ' '.join(words)
+            for _ in range(5):
+                kept = [word for word in words if rng.random() > 0.3] + rng.sample(FILLER, rng.randint(0, 2))
+                rng.shuffle(kept)
+                yield ' '.join(kept)
+        yield from sample_messages(keywords, count=300, seed=4)
+        yield from ('', 'hello', 'xyz', 'what')
+
+    def test_matches_full_scan(self):
+        index = KnowledgeIndex.build()
+        self.assertGreater(len(index), 10)
+        matched = 0
+        for message in self.messages():
+            with self.subTest(message=message):
+                expected = self.old_search(message)
+                actual = index.search(message)
+                self.assertEqual(actual and actual.id, expected and expected.id)
+                matched += expected is not None
+        self.assertGreater(matched, 100)
+
+
+class BM25KnowledgeIndexTests(TestCase):
+    """The saved BM25 index never serves entries that were deactivated or edited since it was saved"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(
+            ML_ENGINE_DATA_DIR=cls.enterClassContext(tempfile.TemporaryDirectory()),
+            CHATBOT_KNOWLEDGE_INDEX='bm25',
+        ))
+
+    def setUp(self):
+        self.cancel = ChatbotKnowledge.objects.create(
+            category='booking', question='How do I cancel a booking?',
+            answer='Open the booking and choose Cancel.', keywords='cancel, booking, refund'
+        )
+        ChatbotKnowledge.objects.create(
+            category='pricing', question='How are service prices set?',
+            answer='Providers set their own prices.', keywords='price, cost, charge'
+        )
+        call_command('populate_chatbot', index_only=True, stdout=StringIO())
+        mark_knowledge_index_stale()
+
+    def search(self, message):
+        return get_knowledge_index().search(message)
+
+    def test_serves_saved_index(self):
+        self.assertEqual(self.search('how do i cancel my booking').id, self.cancel.id)
+
+    def test_deactivated_entry_is_not_returned(self):
+        self.assertEqual(self.search('how do i cancel my booking').id, self.cancel.id)
+        self.cancel.is_active = False
+        self.cancel.save()
+        self.assertIsNone(self.search('how do i cancel my booking'))
+
+    def test_deactivated_elsewhere_is_not_returned_after_check(self):
+        self.search('how do i cancel my booking')
+        # No signal in this process, as if another worker had made the change
+        ChatbotKnowledge.objects.filter(id=self.cancel.id).update(is_active=False)
+        mark_knowledge_index_stale()
+        self.assertIsNone(self.search('how do i cancel my booking'))
+
+    def test_edited_answer_is_served(self):
+        self.search('how do i cancel my booking')
+        self.cancel.answer = 'Bookings can be cancelled from the dashboard.'
+        self.cancel.save()
+        self.assertEqual(self.search('how do i cancel my booking').answer, self.cancel.answer)
@@ -1,12 +1,14 @@
-import re
 import json
 import time
+import threading
 import openai
-from difflib import SequenceMatcher
 from django.conf import settings
 from django.db.models import Q
 from django.utils import timezone
-from .models import ChatbotKnowledge, ChatbotIntent, ChatbotEntity, ChatbotAnalytics, ChatSession
+from .models import ChatbotIntent, ChatbotEntity, ChatbotAnalytics, ChatSession
+from .knowledge_index import get_knowledge_index, record_usage
+from .matching import FuzzyKeywordMatcher, KeywordMatcher
+from .semantic_index import get_semantic_index
 from services.models import Service
 from accounts.models import User
 
@@ -56,6 +58,26 @@ class ChatbotProcessor:
         self.booking_keywords = ['book', 'schedule', 'appointment', 'reserve', 'order', 'hire', 'get', 'need', 'want', 'looking for']
         self.pricing_keywords = ['price', 'cost', 'rate', 'fee', 'charge', 'expensive', 'cheap', 'affordable', 'how much', 'pricing']
         self.emergency_keywords = ['emergency', 'urgent', 'asap', 'immediately', 'now', 'today', 'quick', 'fast']
+        self.help_keywords = ['help', 'support', 'assist', 'guide', 'how to']
+        
+        # Intent and entity words used for analytics
+        self.service_entities = ['cleaning', 'plumbing', 'electrical', 'painting', 'pest control']
+        self.time_keywords = ['today', 'tomorrow', 'week', 'month', 'urgent', 'emergency']
+        
+        # One pass over a message finds every keyword of every list
+        self.matcher = KeywordMatcher({
+            'greeting': self.greetings,
+            'thanks': self.thanks,
+            'goodbye': self.goodbyes,
+            'help': self.help_keywords,
+            'booking': self.booking_keywords,
+            'pricing': self.pricing_keywords,
+            'emergency': self.emergency_keywords,
+            'intent': ['book', 'schedule', 'price', 'cost', 'service'],
+            'entity': self.service_entities + self.time_keywords,
+            **{f'service:{service_type}': keywords for service_type, keywords in self.service_keywords.items()}
+        })
+        self.service_fuzzy_matcher = FuzzyKeywordMatcher(self.service_keywords)
     
     def process_message(self, message, user=None, session_id=None):
         """Process user message with enhanced intelligence and context awareness"""
@@ -131,52 +153,25 @@ class ChatbotProcessor:
     
     def _detect_service_type(self, message_lower):
         """Detect service type with fuzzy matching"""
-        best_match = None
-        best_score = 0
-        
-        for service_type, keywords in self.service_keywords.items():
-            for keyword in keywords:
-                # Exact match
-                if keyword in message_lower:
-                    return service_type
-                
-                # Fuzzy match
-                similarity = SequenceMatcher(None, message_lower, keyword).ratio()
-                if similarity > 0.6 and similarity > best_score:
-                    best_match = service_type
-                    best_score = similarity
-        
-        # Special cases for better detection
-        if 'washing machine' in message_lower or 'fridge' in message_lower or 'refrigerator' in message_lower:
-            return 'appliance'
-        if 'pest control' in message_lower:
-            return 'pest_control'
+        # Exact match - first service type (in declaration order) with a keyword in the message
+        labels = self.matcher.labels(message_lower)
+        for service_type in self.service_keywords:
+            if f'service:{service_type}' in labels:
+                return service_type
         
-        return best_match if best_score > 0.6 else None
+        # Fuzzy match - closest keyword to a word of the message, within a typo or two
+        fuzzy_match = self.service_fuzzy_matcher.match(message_lower)
+        return fuzzy_match[0] if fuzzy_match else None
     
     def _is_booking_request(self, message_lower):
         """Enhanced booking request detection"""
-        booking_indicators = 0
-        for keyword in self.booking_keywords:
-            if keyword in message_lower:
-                booking_indicators += 1
-        
-        # Also check for service keywords
-        service_indicators = 0
-        for service_type, keywords in self.service_keywords.items():
-            for keyword in keywords:
-                if keyword in message_lower:
-                    service_indicators += 1
-                    break
-        
-        return booking_indicators > 0 and service_indicators > 0
+        # Needs both a booking keyword and a service keyword
+        labels = self.matcher.labels(message_lower)
+        return 'booking' in labels and any(label.startswith('service:') for label in labels)
     
     def _is_pricing_request(self, message_lower):
         """Enhanced pricing request detection"""
-        for keyword in self.pricing_keywords:
-            if keyword in message_lower:
-                return True
-        return False
+        return 'pricing' in self.matcher.labels(message_lower)
     
     def _get_service_response(self, service_type, message_lower, user):
         """Get detailed service response"""
@@ -267,7 +262,7 @@ class ChatbotProcessor:
             response += "2. **Service Details** - Any specific requirements?\n"
             response += "3. **Location** - Your address for the service\n\n"
             
-            if any(keyword in message_lower for keyword in self.emergency_keywords):
+            if 'emergency' in self.matcher.labels(message_lower):
                 response += "🚨 **Emergency Service Available** - We can arrange same-day service for urgent needs!\n\n"
             
             response += "Would you like to proceed with booking? You can also visit our services page to see available providers and book directly."
@@ -328,47 +323,31 @@ class ChatbotProcessor:
         return response
     
     def _search_knowledge_base_enhanced(self, message_lower):
-        """Enhanced knowledge base search with fuzzy matching"""
-        # Get all active knowledge entries
-        knowledge_entries = ChatbotKnowledge.objects.filter(is_active=True)
-        
-        best_match = None
-        best_score = 0
-        
-        for entry in knowledge_entries:
-            # Calculate multiple similarity scores
-            question_score = self._calculate_similarity(message_lower, entry.question.lower())
-            keyword_score = self._calculate_keyword_similarity(message_lower, entry.get_keywords_list())
-            
-            # Combined score with weights
-            combined_score = (question_score * 0.7) + (keyword_score * 0.3)
-            
-            if combined_score > best_score and combined_score > 0.4:  # Lower threshold for better matching
-                best_match = entry
-                best_score = combined_score
+        """Enhanced knowledge base search with the configured retrieval index"""
+        knowledge_index = get_knowledge_index()
+        best_match = self._semantic_knowledge_match(message_lower, knowledge_index)
+        if best_match is None:
+            best_match = knowledge_index.search(message_lower)
         
         if best_match:
             # Increment usage count
-            best_match.increment_usage()
+            record_usage(best_match)
             return best_match.answer
         
         return None
     
-    def _calculate_similarity(self, text1, text2):
-        """Calculate similarity between two texts"""
-        return SequenceMatcher(None, text1, text2).ratio()
-    
-    def _calculate_keyword_similarity(self, message, keywords):
-        """Calculate similarity based on keyword matches"""
-        if not keywords:
-            return 0
-        
-        matches = 0
-        for keyword in keywords:
-            if keyword in message:
-                matches += 1
+    def _semantic_knowledge_match(self, message_lower, knowledge_index):
+        """Nearest knowledge entry by sentence embedding, if semantic search is available"""
+        semantic_index = get_semantic_index()
+        if semantic_index is None:
+            return None
         
-        return matches / len(keywords)
+        # Embeddings can lag behind the table; skip entries since removed or deactivated
+        for knowledge_id, _, _ in semantic_index.search([message_lower], k=3, kind='knowledge')[0]:
+            entry = knowledge_index.by_id.get(knowledge_id)
+            if entry is not None:
+                return entry
+        return None
     
     def _get_contextual_response(self, message_lower, context, user):
         """Generate contextual responses based on conversation history"""
@@ -572,38 +551,43 @@ What would you like to know about our services?"""
     
     def _detect_intent(self, message):
         """Detect intent from user message"""
-        message_lower = message.lower()
+        keywords, labels = self.matcher.match(message.lower())
         
-        if any(greeting in message_lower for greeting in self.greetings):
+        if 'greeting' in labels:
             return "greeting"
-        elif any(thanks in message_lower for thanks in self.thanks):
+        elif 'thanks' in labels:
             return "thanks"
-        elif any(goodbye in message_lower for goodbye in self.goodbyes):
+        elif 'goodbye' in labels:
             return "goodbye"
-        elif 'book' in message_lower or 'schedule' in message_lower:
+        elif 'book' in keywords or 'schedule' in keywords:
             return "booking"
-        elif 'price' in message_lower or 'cost' in message_lower:
+        elif 'price' in keywords or 'cost' in keywords:
             return "pricing"
-        elif 'service' in message_lower:
+        elif 'service' in keywords:
             return "service_inquiry"
-        else:
-            return "general_inquiry"
+        
+        # Nearest intent example by sentence embedding, if semantic search is available
+        semantic_index = get_semantic_index()
+        if semantic_index is not None:
+            nearest = semantic_index.search([message.lower().strip()], k=1, kind='intent')[0]
+            if nearest:
+                return nearest[0][1]
+        
+        return "general_inquiry"
     
     def _extract_entities(self, message):
         """Extract entities from user message"""
         entities = {}
-        message_lower = message.lower()
+        keywords = self.matcher.keywords(message.lower())
         
-        # Service entities
-        service_entities = ['cleaning', 'plumbing', 'electrical', 'painting', 'pest control']
-        for service in service_entities:
-            if service in message_lower:
+        # Service entities - the last one listed wins
+        for service in self.service_entities:
+            if service in keywords:
                 entities['service'] = service
         
         # Time entities
-        time_keywords = ['today', 'tomorrow', 'week', 'month', 'urgent', 'emergency']
-        for time_kw in time_keywords:
-            if time_kw in message_lower:
+        for time_kw in self.time_keywords:
+            if time_kw in keywords:
                 entities['time'] = time_kw
                 break
         
@@ -637,20 +621,19 @@ What would you like to know about our services?"""
     
     def _is_greeting(self, message):
         """Check if message is a greeting"""
-        return any(greeting in message for greeting in self.greetings)
+        return 'greeting' in self.matcher.labels(message)
     
     def _is_thanks(self, message):
         """Check if message is expressing thanks"""
-        return any(thanks in message for thanks in self.thanks)
+        return 'thanks' in self.matcher.labels(message)
     
     def _is_goodbye(self, message):
         """Check if message is a goodbye"""
-        return any(goodbye in message for goodbye in self.goodbyes)
+        return 'goodbye' in self.matcher.labels(message)
     
     def _is_help_request(self, message):
         """Check if message is asking for help"""
-        help_keywords = ['help', 'support', 'assist', 'guide', 'how to']
-        return any(keyword in message for keyword in help_keywords)
+        return 'help' in self.matcher.labels(message)
     
     def _get_greeting_response(self, user):
         """Get greeting response"""
@@ -694,46 +677,13 @@ What would you like to know more about?"""
     
     def _search_knowledge_base(self, message):
         """Search knowledge base for relevant answers"""
-        # Get all active knowledge entries
-        knowledge_entries = ChatbotKnowledge.objects.filter(is_active=True)
-        
-        best_match = None
-        best_score = 0
-        
-        for entry in knowledge_entries:
-            score = self._calculate_match_score(message, entry)
-            if score > best_score and score > 0.3:  # Minimum threshold
-                best_match = entry
-                best_score = score
+        best_match = get_knowledge_index().search(message)
         
         if best_match:
             return best_match.answer
         
         return None
     
-    def _calculate_match_score(self, message, knowledge_entry):
-        """Calculate match score between message and knowledge entry"""
-        message_words = set(re.findall(r'\b\w+\b', message.lower()))
-        question_words = set(re.findall(r'\b\w+\b', knowledge_entry.question.lower()))
-        keyword_words = set(knowledge_entry.get_keywords_list())
-        
-        # Calculate word overlap
-        all_keywords = question_words.union(keyword_words)
-        overlap = len(message_words.intersection(all_keywords))
-        
-        if len(message_words) == 0:
-            return 0
-        
-        # Calculate score based on overlap ratio
-        score = overlap / len(message_words)
-        
-        # Boost score for exact keyword matches
-        keyword_matches = len(message_words.intersection(keyword_words))
-        if keyword_matches > 0:
-            score += keyword_matches * 0.2
-        
-        return min(score, 1.0)  # Cap at 1.0
-    
     def _get_default_response(self):
         """Get default response when no specific match is found"""
         responses = [
@@ -745,3 +695,22 @@ What would you like to know more about?"""
         ]
         import random
         return random.choice(responses)
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+def get_chatbot_processor():
+    """
+    Process-wide ChatbotProcessor, built once (at app ready) and shared by all requests
+    
+    The processor holds no per-message state, and the keyword matcher is read-only
+    apart from its thread-safe memo cache.
+    """
+    global _processor
+    if _processor is None:
+        with _processor_lock:
+            if _processor is None:
+                _processor = ChatbotProcessor()
+    return _processor
@@ -12,7 +12,7 @@ import uuid
 import re
 
 from .models import ChatSession, ChatMessage, ChatbotKnowledge, ChatbotAnalytics
-from .utils import ChatbotProcessor
+from .utils import get_chatbot_processor
 
 
 @csrf_exempt
@@ -41,7 +41,7 @@ def send_message(request):
         )
         
         # Process message and get bot response
-        processor = ChatbotProcessor()
+        processor = get_chatbot_processor()
         bot_response = processor.process_message(message_content, request.user, session_id)
         
         # Save bot response
@@ -142,3 +142,100 @@ AUTH_USER_MODEL = 'accounts.User'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by every worker process on this host. Recommendation cache invalidation
+    # (bookings, reviews, `manage.py score_review_sentiment`) bumps version keys stored here, so a
+    # per-process backend such as LocMemCache would leave the other workers serving stale results.
+    # Deployments spanning several hosts should point this at Redis or Memcached instead.
+    'recommendations': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'recommendations',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Recommendation engine
+# Score and rank candidates with NumPy array operations instead of per-provider dicts
+RECOMMENDATION_ENGINE_VECTORIZED = False
+# CACHES alias holding recommendation results, their version keys and last-known results
+RECOMMENDATION_CACHE_ALIAS = 'recommendations'
+# Seconds a cached recommendation result is served before being recomputed
+RECOMMENDATION_CACHE_TIMEOUT = 15 * 60
+# Write RecommendationScore rows on a background thread instead of inside the request
+RECOMMENDATION_DEFER_PERSISTENCE = False
+# Serve stored RecommendationScore rows (`manage.py precompute_recommendations` or live scoring)
+# written within this many seconds before scoring live. They are re-checked against the
+# provider filters but not against newer bookings and reviews, so keep this short if enabled
+# (None disables precomputed reads)
+RECOMMENDATION_PRECOMPUTED_MAX_AGE = None
+# Render the services page without waiting on the engine; recommendations load from
+# services/api/recommendations/, which answers within the time budget with live, stale
+# (kept for RECOMMENDATION_STALE_TIMEOUT seconds) or best-rated results
+SERVICE_LIST_ASYNC_RECOMMENDATIONS = True
+RECOMMENDATION_TIME_BUDGET_MS = 300
+RECOMMENDATION_STALE_TIMEOUT = 24 * 60 * 60
+RECOMMENDATION_ASYNC_WORKERS = 4
+# Live computations queued or running at once; further requests are served the fallback directly
+RECOMMENDATION_ASYNC_MAX_PENDING = 32
+# Collaborative filtering: 'user' (user-user Jaccard) or 'item' (item-item co-booking index)
+RECOMMENDATION_COLLABORATIVE_MODE = 'user'
+# Weight of stored review sentiment (`manage.py score_review_sentiment`) in provider rankings, in [0, 1)
+# and taken from the other components in proportion; 0 disables
+RECOMMENDATION_SENTIMENT_WEIGHT = 0.0
+
+# Persisted ML artifacts (similarity indexes etc.)
+ML_ENGINE_DATA_DIR = BASE_DIR / 'ml_data'
+# Seconds between incremental refreshes of the item similarity index
+ITEM_SIMILARITY_REFRESH_INTERVAL = 60
+# Provider TF-IDF text index used for preference matching: seconds between catching up on
+# service changes from other processes, and between checks for a newer index file. The file
+# is only written by `manage.py build_text_index` (schedule it; --full after bulk deletes)
+TEXT_INDEX_REFRESH_INTERVAL = 60
+TEXT_INDEX_RELOAD_INTERVAL = 60 * 60
+
+# Seconds between full rebuilds of the provider service-area index
+GEO_INDEX_REBUILD_INTERVAL = 300
+
+# Postal code prefix matching for locations without coordinates
+POSTAL_INDEX_REBUILD_INTERVAL = 300
+POSTAL_PREFIX_MIN_CANDIDATES = 10  # Widen to a shorter prefix below this
+POSTAL_PREFIX_MIN_LENGTH = 3
+
+# Seconds between rebuilds of the per-category price distribution used for price scores
+PRICE_DISTRIBUTION_REFRESH_INTERVAL = 300
+
+# Postal code characters that identify an area in demand forecasts and dynamic pricing
+DEMAND_FORECAST_AREA_PREFIX_LENGTH = 3
+# Seconds between reloads of the in-memory DynamicPricing lookup table (`manage.py update_dynamic_pricing`)
+DYNAMIC_PRICING_REFRESH_INTERVAL = 300
+
+# Write-behind MLPrediction logging for the recommendation and pricing engines
+ML_PREDICTION_LOGGING = True
+ML_PREDICTION_QUEUE_SIZE = 10000  # Records beyond this are dropped and counted
+ML_PREDICTION_BATCH_SIZE = 200  # Flush once this many records are queued...
+ML_PREDICTION_FLUSH_INTERVAL = 5  # ...or this many seconds after the first one
+
+# Per-stage recommendation engine histograms (served at ml_engine/api/profiling/)
+RECOMMENDATION_PROFILING = True
+# Log a per-stage breakdown for engine calls slower than this many milliseconds (None disables)
+RECOMMENDATION_SLOW_LOG_MS = 500
+
+# Chatbot knowledge base retrieval: 'bm25' (ranked over question, keywords and answer, saved
+# under ML_ENGINE_DATA_DIR by `manage.py populate_chatbot --index-only`; run it after knowledge
+# edits, since until then each worker rebuilds the index in memory once the saved one no longer
+# matches the table) or 'fuzzy' (question similarity plus keyword share, rebuilt in process).
+# Checks run on the next message after an edit in this process, and every
+# CHATBOT_KNOWLEDGE_REFRESH_INTERVAL seconds
+CHATBOT_KNOWLEDGE_INDEX = 'bm25'
+CHATBOT_KNOWLEDGE_REFRESH_INTERVAL = 300
+CHATBOT_KNOWLEDGE_MIN_SCORE = 0.25  # Lowest BM25 cosine similarity answered from the knowledge base
+# Optional semantic matching of knowledge questions and intent examples, tried before the lexical
+# index. Needs sentence-transformers and `manage.py build_chatbot_embeddings`, which saves the
+# model and embeddings under ML_ENGINE_DATA_DIR; without them the chatbot matches lexically
+CHATBOT_SEMANTIC_SEARCH = False
+CHATBOT_EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+CHATBOT_SEMANTIC_MIN_SCORE = 0.6  # Lowest cosine similarity accepted as a semantic match
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+import logging
+import threading
+import time
+
+from accounts.models import User
+from .cache import RecommendationCache, request_digest
+from .recommendation_engine import RecommendationEngine, recommendation_engine
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetedRecommendationFetcher:
+    """
+    Provider recommendations under a hard time budget
+
+    A fresh cache entry is returned straight away. Otherwise live scoring runs on a
+    worker thread and is awaited for at most the budget; past it, the last result
+    computed for the same request (kept well beyond cache invalidation) is served,
+    or a non-personalized best-rated list if there is none. The worker keeps going
+    and caches its result, so a later request is served live. Identical requests
+    share one in-flight computation.
+
+    The fallback's own cost is part of the budget: the wait for the worker ends
+    early by a moving average of recent fallback times. At most max_pending
+    computations are queued or running; past that a new request skips live
+    scoring and goes straight to the fallback instead of queueing behind them.
+
+    Returns (recommendations, source) with source one of 'cache', 'live', 'stale'
+    or 'popular'.
+    """
+
+    STALE_KEY_PREFIX = f'{RecommendationCache.KEY_PREFIX}:last'
+    FALLBACK_SMOOTHING = 0.2  # Weight of the newest fallback time in its moving average
+
+    def __init__(self, engine: RecommendationEngine, max_workers: Optional[int] = None,
+                 budget_ms: Optional[int] = None, stale_timeout: Optional[int] = None,
+                 cache_alias: Optional[str] = None, max_pending: Optional[int] = None):
+        self.engine = engine
+        self.budget_ms = budget_ms if budget_ms is not None else getattr(
+            settings, 'RECOMMENDATION_TIME_BUDGET_MS', 300
+        )
+        self.stale_timeout = stale_timeout if stale_timeout is not None else getattr(
+            settings, 'RECOMMENDATION_STALE_TIMEOUT', 24 * 60 * 60
+        )
+        self.cache_alias = cache_alias or getattr(settings, 'RECOMMENDATION_CACHE_ALIAS', 'default')
+        max_workers = max_workers or getattr(settings, 'RECOMMENDATION_ASYNC_WORKERS', 4)
+        self.max_pending = max_pending or getattr(settings, 'RECOMMENDATION_ASYNC_MAX_PENDING', 8 * max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recommendation-fetch')
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Tuple, Future] = {}
+        self._fallback_ms = 0.0
+
+    def get_provider_recommendations(self, customer: User, service_category: Optional[str] = None,
+                                     location: Optional[str] = None, max_recommendations: int = 10,
+                                     budget_ms: Optional[int] = None) -> Tuple[List[Dict], str]:
+        key = (customer.id, service_category or '', location or '', max_recommendations)
+        budget_ms = budget_ms if budget_ms is not None else self.budget_ms
+        deadline = time.monotonic() + budget_ms / 1000.0
+
+        if self.engine.cache is not None:
+            cached = self.engine.cache.get(customer.id, service_category, location, max_recommendations)
+            if cached is not None:
+                return cached, 'cache'
+
+        future = self._submit(key, customer, service_category, location, max_recommendations)
+        if future is not None:
+            # Leave the expected fallback time out of the wait so the fallback also fits the budget
+            wait = max(deadline - time.monotonic() - self._fallback_ms / 1000.0, 0.0)
+            try:
+                return future.result(timeout=wait), 'live'
+            except TimeoutError:
+                pass
+            except Exception as e:
+                logger.error(f"Error fetching recommendations for customer {customer.id}: {str(e)}")
+
+        start = time.monotonic()
+        try:
+            return self._fallback(key, service_category, location, max_recommendations)
+        finally:
+            self._record_fallback((time.monotonic() - start) * 1000)
+
+    def _fallback(self, key: Tuple, service_category: Optional[str], location: Optional[str],
+                  max_recommendations: int) -> Tuple[List[Dict], str]:
+        stale = caches[self.cache_alias].get(self._stale_key(key))
+        if stale is not None:
+            return stale, 'stale'
+
+        return self.engine.get_popular_providers(service_category, location, max_recommendations), 'popular'
+
+    def _record_fallback(self, elapsed_ms: float):
+        with self._lock:
+            if self._fallback_ms:
+                elapsed_ms = (1 - self.FALLBACK_SMOOTHING) * self._fallback_ms + self.FALLBACK_SMOOTHING * elapsed_ms
+            self._fallback_ms = elapsed_ms
+
+    def _submit(self, key: Tuple, customer: User, service_category: Optional[str],
+                location: Optional[str], max_recommendations: int) -> Optional[Future]:
+        """The in-flight computation for key, a new one, or None when max_pending are already queued"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                if len(self._in_flight) >= self.max_pending:
+                    return None
+                future = self._executor.submit(
+                    self._compute, key, customer, service_category, location, max_recommendations
+                )
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+            return future
+
+    def _forget(self, key: Tuple):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _compute(self, key: Tuple, customer: User, service_category: Optional[str],
+                 location: Optional[str], max_recommendations: int) -> List[Dict]:
+        close_old_connections()
+        try:
+            recommendations = self.engine.get_provider_recommendations(
+                customer, service_category, location, max_recommendations
+            )
+            if recommendations:
+                caches[self.cache_alias].set(self._stale_key(key), recommendations, self.stale_timeout)
+            return recommendations
+        finally:
+            close_old_connections()
+
+    def _stale_key(self, key: Tuple) -> str:
+        customer_id, service_category, location, limit = key
+        return f'{self.STALE_KEY_PREFIX}:{customer_id}:{request_digest(service_category, location)}:{limit}'
+
+
+# Singleton instance
+recommendation_fetcher = BudgetedRecommendationFetcher(recommendation_engine)
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.cache import caches
+from typing import Dict, List, Optional
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def request_digest(service_category: Optional[str], location: Optional[str]) -> str:
+    """Free-text request parts hashed into a key segment valid for every cache backend"""
+    raw = f'{service_category or ""}\x00{location or ""}'
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+class RecommendationCache:
+    """
+    Versioned cache for provider recommendation results
+
+    Entries are keyed by (customer, category, location, limit), with category and
+    location hashed since they may hold spaces, and stamped with a global version
+    and a per-customer version. Invalidation bumps a version number
+    instead of deleting keys, so stale entries simply become unreachable and expire.
+    Version keys only reach other processes through a shared cache backend (see
+    CACHES); with a per-process one, invalidation is local and entries live until
+    RECOMMENDATION_CACHE_TIMEOUT. A backend error on lookup counts as a miss and
+    one on store is logged, so callers score live instead of failing. Hit, miss and
+    eviction (invalidation) counters are kept per process.
+    """
+
+    KEY_PREFIX = 'ml_engine:recommendations'
+
+    def __init__(self, alias: Optional[str] = None, timeout: Optional[int] = None):
+        self.alias = alias or getattr(settings, 'RECOMMENDATION_CACHE_ALIAS', 'default')
+        self.timeout = timeout if timeout is not None else getattr(
+            settings, 'RECOMMENDATION_CACHE_TIMEOUT', 15 * 60
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _global_version_key(self) -> str:
+        return f'{self.KEY_PREFIX}:version'
+
+    def _customer_version_key(self, customer_id: int) -> str:
+        return f'{self.KEY_PREFIX}:version:customer:{customer_id}'
+
+    def _entry_key(self, customer_id: int, service_category: Optional[str],
+                   location: Optional[str], limit: int) -> str:
+        versions = self.cache.get_many([
+            self._global_version_key(),
+            self._customer_version_key(customer_id),
+        ])
+        global_version = versions.get(self._global_version_key(), 0)
+        customer_version = versions.get(self._customer_version_key(customer_id), 0)
+        return (
+            f'{self.KEY_PREFIX}:v{global_version}.{customer_version}:'
+            f'{customer_id}:{request_digest(service_category, location)}:{limit}'
+        )
+
+    def get(self, customer_id: int, service_category: Optional[str],
+            location: Optional[str], limit: int) -> Optional[List[Dict]]:
+        """Return cached recommendations or None on a miss"""
+        try:
+            result = self.cache.get(self._entry_key(customer_id, service_category, location, limit))
+        except Exception as e:
+            logger.error(f"Recommendation cache lookup failed: {str(e)}")
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def set(self, customer_id: int, service_category: Optional[str],
+            location: Optional[str], limit: int, recommendations: List[Dict]):
+        """Store recommendations under the current versions"""
+        try:
+            self.cache.set(
+                self._entry_key(customer_id, service_category, location, limit),
+                recommendations,
+                self.timeout
+            )
+        except Exception as e:
+            logger.error(f"Recommendation cache store failed: {str(e)}")
+
+    def _bump(self, key: str):
+        # add() is a no-op if the key exists, so incr() always has a value to work on
+        self.cache.add(key, 0, None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Version key expired between add() and incr()
+            self.cache.set(key, 1, None)
+        with self._lock:
+            self.evictions += 1
+
+    def invalidate_customer(self, customer_id: int):
+        """Invalidate all cached recommendations for one customer"""
+        self._bump(self._customer_version_key(customer_id))
+
+    def invalidate_all(self):
+        """Invalidate cached recommendations for every customer"""
+        self._bump(self._global_version_key())
+
+    def stats(self) -> Dict:
+        """Hit, miss and eviction counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Singleton instance
+recommendation_cache = RecommendationCache()
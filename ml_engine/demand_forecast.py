@@ -0,0 +1,210 @@
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.functions import Substr, TruncDate
+from django.utils import timezone
+from typing import Dict, List, Optional, Set, Tuple
+from datetime import date, timedelta
+
+import numpy as np
+
+from bookings.models import Booking
+from .models import DemandForecast
+
+
+class DemandForecaster:
+    """
+    Day-of-week x linear trend demand forecasts per (service category, area)
+
+    Bookings are counted per creation day in one GROUP BY query, with the area
+    taken as the postal code prefix. Each category also gets an all-areas series
+    stored with an empty location_area. All series are fitted at once as rows of
+    a (series x days) matrix:
+
+        demand(t) = (intercept + slope * t) * seasonal[day of week]
+
+    The trend is an ordinary least-squares line, the seasonal factors are the
+    ratio of observed to trend demand per weekday (mean 1), and the confidence
+    interval is the forecast +/- z * residual standard deviation.
+    """
+
+    MODEL_VERSION = 'dow-trend-v1'
+    Z_SCORE = 1.96  # 95% interval
+    FACTOR_MAX = 9.9999  # Largest value the DemandForecast factor columns can hold
+
+    def __init__(self, history_days: int = 182, horizon_days: int = 28,
+                 area_prefix_length: Optional[int] = None, min_bookings: int = 5):
+        self.history_days = history_days
+        self.horizon_days = horizon_days
+        self.area_prefix_length = area_prefix_length or getattr(settings, 'DEMAND_FORECAST_AREA_PREFIX_LENGTH', 3)
+        self.min_bookings = min_bookings
+
+    def run(self, incremental: bool = False, today: Optional[date] = None) -> Dict[str, int]:
+        """Fit and store forecasts; with incremental=True only series with booking changes since the last run"""
+        today = today or timezone.localdate()
+        start = today - timedelta(days=self.history_days)
+
+        # None means refit everything, including an incremental run with no previous run
+        changed = self._changed_series() if incremental else None
+        if changed is not None and not changed:
+            return {'series': 0, 'forecasts': 0}
+
+        keys, history = self.load_series(start, today, categories={c for c, _ in changed} if changed else None)
+        if changed is not None:
+            # Categories are loaded whole for their all-areas series; keep only changed series
+            keep = [i for i, key in enumerate(keys) if key in changed]
+            keys = [keys[i] for i in keep]
+            history = history[keep]
+
+        enough = history.sum(axis=1) >= self.min_bookings
+        keys = [key for key, ok in zip(keys, enough) if ok]
+        history = history[enough]
+        if not keys:
+            return {'series': 0, 'forecasts': 0}
+
+        model = self.fit(history, start)
+        forecasts = self.predict(model, start, today, self.horizon_days)
+        written = self._store(keys, today, *forecasts)
+        return {'series': len(keys), 'forecasts': written}
+
+    def load_series(self, start: date, end: date,
+                    categories: Optional[Set[str]] = None) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+        """
+        Daily booking counts for [start, end) as ((category, area) keys, series x days matrix)
+
+        Cancelled bookings are not counted as demand.
+        """
+        bookings = Booking.objects.exclude(status='cancelled').filter(
+            created_at__date__gte=start,
+            created_at__date__lt=end
+        )
+        if categories is not None:
+            bookings = bookings.filter(service__category__name__in=categories)
+
+        rows = list(bookings.annotate(
+            day=TruncDate('created_at'),
+            area=Substr('postal_code', 1, self.area_prefix_length)
+        ).order_by().values_list('service__category__name', 'area', 'day').annotate(count=Count('id')))
+
+        n_days = (end - start).days
+        index = {}
+        series, days, counts = [], [], []
+        for category, area, day, count in rows:
+            area = (area or '').strip().upper()
+            # Every booking counts towards its category's all-areas series
+            for key in ([(category, area), (category, '')] if area else [(category, '')]):
+                series.append(index.setdefault(key, len(index)))
+                days.append((day - start).days)
+                counts.append(count)
+
+        matrix = np.zeros((len(index), n_days))
+        if index:
+            # Repeated (series, day) pairs (blank postal codes, all-areas rows) accumulate
+            np.add.at(matrix, (np.asarray(series), np.asarray(days)), np.asarray(counts, dtype=float))
+        return list(index), matrix
+
+    def fit(self, history: np.ndarray, start: date) -> Dict[str, np.ndarray]:
+        """Fit trend, weekday factors and residual spread for every row of history"""
+        n_days = history.shape[1]
+        t = np.arange(n_days, dtype=float)
+        t_centered = t - t.mean()
+
+        mean = history.mean(axis=1)
+        slope = history @ t_centered / max(t_centered @ t_centered, 1e-12)
+        intercept = mean - slope * t.mean()
+        trend = np.maximum(intercept[:, None] + slope[:, None] * t, 1e-9)
+
+        weekday = (np.arange(n_days) + start.weekday()) % 7
+        observed = np.stack([history[:, weekday == d].sum(axis=1) for d in range(7)], axis=1)
+        expected = np.stack([trend[:, weekday == d].sum(axis=1) for d in range(7)], axis=1)
+        seasonal = np.where(expected > 0, observed / np.where(expected > 0, expected, 1.0), 1.0)
+        seasonal_mean = seasonal.mean(axis=1, keepdims=True)
+        seasonal = np.where(seasonal_mean > 0, seasonal / np.where(seasonal_mean > 0, seasonal_mean, 1.0), 1.0)
+
+        fitted = trend * seasonal[:, weekday]
+        residual_std = np.sqrt(((history - fitted) ** 2).sum(axis=1) / max(n_days - 2, 1))
+
+        return {
+            'intercept': intercept,
+            'slope': slope,
+            'seasonal': seasonal,
+            'residual_std': residual_std,
+            'n_days': np.array(n_days),
+        }
+
+    def predict(self, model: Dict[str, np.ndarray], start: date, first_day: date,
+                horizon_days: int) -> Tuple[np.ndarray, ...]:
+        """Forecast, lower, upper, seasonal and trend factors as (series x horizon) arrays"""
+        offset = (first_day - start).days
+        t = np.arange(offset, offset + horizon_days, dtype=float)
+        weekday = (np.arange(horizon_days) + first_day.weekday()) % 7
+
+        trend = np.maximum(model['intercept'][:, None] + model['slope'][:, None] * t, 0.0)
+        seasonal = model['seasonal'][:, weekday]
+        forecast = trend * seasonal
+
+        spread = self.Z_SCORE * model['residual_std'][:, None]
+        lower = np.maximum(forecast - spread, 0.0)
+        upper = forecast + spread
+
+        # Trend relative to the end of the history window
+        last_level = (model['intercept'] + model['slope'] * (int(model['n_days']) - 1))[:, None]
+        positive = last_level > 0
+        trend_factor = np.where(positive, trend / np.where(positive, last_level, 1.0), 1.0)
+
+        return forecast, lower, upper, seasonal, trend_factor
+
+    def _changed_series(self) -> Optional[Set[Tuple[str, str]]]:
+        """(category, area) series with bookings changed since the last stored run; None if never run"""
+        last_run = DemandForecast.objects.filter(model_version=self.MODEL_VERSION).aggregate(
+            last=Max('created_at')
+        )['last']
+        if last_run is None:
+            return None
+
+        changed = set()
+        for category, area in Booking.objects.filter(updated_at__gte=last_run).annotate(
+            area=Substr('postal_code', 1, self.area_prefix_length)
+        ).order_by().values_list('service__category__name', 'area').distinct():
+            area = (area or '').strip().upper()
+            if area:
+                changed.add((category, area))
+            changed.add((category, ''))
+        return changed
+
+    def _store(self, keys: List[Tuple[str, str]], first_day: date, forecast: np.ndarray, lower: np.ndarray,
+               upper: np.ndarray, seasonal: np.ndarray, trend_factor: np.ndarray) -> int:
+        """Upsert one DemandForecast row per series and day"""
+        seasonal = np.clip(seasonal, 0.0, self.FACTOR_MAX)
+        trend_factor = np.clip(trend_factor, 0.0, self.FACTOR_MAX)
+        dates = [first_day + timedelta(days=i) for i in range(forecast.shape[1])]
+
+        rows = [
+            DemandForecast(
+                service_category=category,
+                location_area=area,
+                forecast_date=forecast_date,
+                predicted_demand=round(float(forecast[i, j]), 2),
+                confidence_interval={
+                    'lower': round(float(lower[i, j]), 2),
+                    'upper': round(float(upper[i, j]), 2),
+                    'level': 0.95,
+                },
+                seasonal_factor=round(float(seasonal[i, j]), 4),
+                trend_factor=round(float(trend_factor[i, j]), 4),
+                model_version=self.MODEL_VERSION,
+            )
+            for i, (category, area) in enumerate(keys)
+            for j, forecast_date in enumerate(dates)
+        ]
+
+        DemandForecast.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['service_category', 'location_area', 'forecast_date'],
+            update_fields=[
+                'predicted_demand', 'confidence_interval', 'seasonal_factor',
+                'trend_factor', 'model_version', 'created_at'
+            ],
+        )
+        return len(rows)
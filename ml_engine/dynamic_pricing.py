@@ -0,0 +1,311 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Substr
+from django.utils import timezone
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import threading
+import time
+
+import numpy as np
+
+from bookings.models import Booking
+from services.models import Service, ServiceArea, ServiceAvailability
+from .models import DemandForecast, DynamicPricing
+from .prediction_log import prediction_logger
+
+
+def area_key(postal_code: str, prefix_length: Optional[int] = None) -> str:
+    """Area identifier shared with demand forecasts: the upper-cased postal code prefix"""
+    if prefix_length is None:
+        prefix_length = getattr(settings, 'DEMAND_FORECAST_AREA_PREFIX_LENGTH', 3)
+    return (postal_code or '')[:prefix_length].strip().upper()
+
+
+class DynamicPricingEngine:
+    """
+    Suggested prices per (service category, area, day) from supply, demand and urgency
+
+    For every category and area (plus an all-areas row per category) the engine
+    collects the median active base price of the category's most common price unit
+    (prices in different units are never mixed), the providers offering the category
+    there and their weekly availability slots, recent bookings and their priority
+    mix, and DemandForecast rows for the coming days. All (key x day) suggestions
+    are then computed as one NumPy batch:
+
+        suggested = base_price * demand_multiplier * competition_factor * urgency_factor
+
+    demand_multiplier follows expected utilization (forecast demand / daily slot
+    capacity), competition_factor falls as more providers compete, and
+    urgency_factor rises with the share of urgent and high priority bookings.
+    """
+
+    RECENT_DAYS = 14
+    PRIORITY_WEIGHTS = {'urgent': 1.0, 'high': 0.5}
+
+    TARGET_UTILIZATION = 0.5
+    DEMAND_SENSITIVITY = 0.5
+    DEMAND_BOUNDS = (0.8, 1.5)
+    COMPETITION_BOUNDS = (0.85, 1.1)
+    URGENCY_PREMIUM = 0.3
+
+    def __init__(self, window_days: int = 7, area_prefix_length: Optional[int] = None):
+        self.window_days = window_days
+        self.area_prefix_length = area_prefix_length or getattr(settings, 'DEMAND_FORECAST_AREA_PREFIX_LENGTH', 3)
+
+    def run(self, now: Optional[datetime] = None) -> int:
+        """Replace current and future suggestions and refresh the in-process lookup table"""
+        now = now or timezone.now()
+        rows = self.compute(now)
+
+        with transaction.atomic():
+            DynamicPricing.objects.filter(date_range_end__gt=now).delete()
+            DynamicPricing.objects.bulk_create(rows, batch_size=500)
+
+        price_suggestions.replace(rows)
+        return len(rows)
+
+    def compute(self, now: Optional[datetime] = None) -> List[DynamicPricing]:
+        """Unsaved DynamicPricing rows for each (category, area) and day of the window"""
+        now = now or timezone.now()
+        today = timezone.localdate(now)
+
+        # Supply: active services, provider areas and availability slots
+        provider_ids, categories, units, prices = self._load_services()
+        if not len(provider_ids):
+            return []
+
+        provider_areas = defaultdict(set)
+        for provider_id, postal_code in ServiceArea.objects.exclude(postal_code='').values_list(
+            'provider_id', 'postal_code'
+        ):
+            provider_areas[provider_id].add(area_key(postal_code, self.area_prefix_length))
+
+        weekly_slots = dict(ServiceAvailability.objects.filter(is_available=True).order_by().values(
+            'provider_id'
+        ).annotate(count=Count('id')).values_list('provider_id', 'count'))
+
+        # Medians per (category, price_unit); a category's rows use its most common unit
+        category_names, category_codes = np.unique(categories, return_inverse=True)
+        unit_names, unit_codes = np.unique(units, return_inverse=True)
+        n_categories, n_units = len(category_names), len(unit_names)
+        group_codes = category_codes * n_units + unit_codes
+        unit_medians = self._group_medians(group_codes, prices, n_categories * n_units).reshape(n_categories, n_units)
+        unit_counts = np.bincount(group_codes, minlength=n_categories * n_units).reshape(n_categories, n_units)
+        primary_units = unit_counts.argmax(axis=1)
+        base_prices = unit_medians[np.arange(n_categories), primary_units]
+
+        # Each provider offering a category serves its all-areas key and each of its areas
+        keys: Dict[Tuple[str, str], int] = {}
+        key_base = []
+        key_category = []
+        provider_count = defaultdict(int)
+        capacity = defaultdict(float)
+        for code, provider_id in np.unique(np.stack([category_codes, provider_ids], axis=1), axis=0).tolist():
+            category = str(category_names[code])
+            daily_capacity = max(weekly_slots.get(provider_id, 0) / 7.0, 1.0)
+            for area in [''] + sorted(provider_areas.get(provider_id, ())):
+                index = keys.get((category, area))
+                if index is None:
+                    index = keys[(category, area)] = len(keys)
+                    key_base.append(base_prices[code])
+                    key_category.append(code)
+                provider_count[index] += 1
+                capacity[index] += daily_capacity
+
+        n_keys = len(keys)
+        providers = np.array([provider_count[i] for i in range(n_keys)], dtype=float)
+        daily_capacity = np.array([capacity[i] for i in range(n_keys)])
+        base = np.array(key_base)
+
+        # Demand: recent bookings with their priority mix, and forecasts for the window
+        recent = np.zeros(n_keys)
+        urgent = np.zeros(n_keys)
+        since = now - timedelta(days=self.RECENT_DAYS)
+        for category, area, priority, count in Booking.objects.exclude(status='cancelled').filter(
+            created_at__gte=since
+        ).annotate(
+            area=Substr('postal_code', 1, self.area_prefix_length)
+        ).order_by().values_list('service__category__name', 'area', 'priority').annotate(count=Count('id')):
+            area = (area or '').strip().upper()
+            for key in ([(category, area), (category, '')] if area else [(category, '')]):
+                index = keys.get(key)
+                if index is not None:
+                    recent[index] += count
+                    urgent[index] += count * self.PRIORITY_WEIGHTS.get(priority, 0.0)
+
+        days = [today + timedelta(days=i) for i in range(self.window_days)]
+        demand = np.repeat((recent / self.RECENT_DAYS)[:, None], self.window_days, axis=1)
+        forecasted = np.zeros_like(demand, dtype=bool)
+        for category, area, forecast_date, predicted in DemandForecast.objects.filter(
+            forecast_date__gte=days[0],
+            forecast_date__lte=days[-1]
+        ).values_list('service_category', 'location_area', 'forecast_date', 'predicted_demand'):
+            index = keys.get((category, area))
+            if index is not None:
+                day = (forecast_date - today).days
+                demand[index, day] = float(predicted)
+                forecasted[index, day] = True
+
+        # One batch over all (key x day) cells
+        utilization = demand / daily_capacity[:, None]
+        demand_multiplier = np.clip(
+            1.0 + self.DEMAND_SENSITIVITY * (utilization - self.TARGET_UTILIZATION), *self.DEMAND_BOUNDS
+        )
+        competition_factor = np.clip(1.1 - 0.05 * np.log2(1.0 + providers), *self.COMPETITION_BOUNDS)
+        urgent_share = np.divide(urgent, recent, out=np.zeros(n_keys), where=recent > 0)
+        urgency_factor = 1.0 + self.URGENCY_PREMIUM * urgent_share
+        suggested = base[:, None] * demand_multiplier * (competition_factor * urgency_factor)[:, None]
+
+        unit_prices = [
+            {
+                str(unit_names[u]): round(float(unit_medians[code, u]), 2)
+                for u in np.flatnonzero(unit_counts[code]).tolist()
+            }
+            for code in range(n_categories)
+        ]
+
+        tz = timezone.get_current_timezone()
+        windows = [
+            (timezone.make_aware(datetime.combine(day, datetime.min.time()), tz),
+             timezone.make_aware(datetime.combine(day + timedelta(days=1), datetime.min.time()), tz))
+            for day in days
+        ]
+
+        return [
+            DynamicPricing(
+                service_category=category,
+                location_area=area,
+                date_range_start=start,
+                date_range_end=end,
+                base_price=round(float(base[i]), 2),
+                suggested_price=round(float(suggested[i, j]), 2),
+                demand_multiplier=round(float(demand_multiplier[i, j]), 4),
+                competition_factor=round(float(competition_factor[i]), 4),
+                urgency_factor=round(float(urgency_factor[i]), 4),
+                market_data={
+                    'price_unit': str(unit_names[primary_units[key_category[i]]]),
+                    'unit_base_prices': unit_prices[key_category[i]],
+                    'providers': int(providers[i]),
+                    'daily_capacity': round(float(daily_capacity[i]), 2),
+                    'expected_demand': round(float(demand[i, j]), 2),
+                    'forecast': bool(forecasted[i, j]),
+                    'recent_bookings': int(recent[i]),
+                    'urgent_share': round(float(urgent_share[i]), 4),
+                },
+            )
+            for (category, area), i in keys.items()
+            for j, (start, end) in enumerate(windows)
+        ]
+
+    def _load_services(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        rows = list(Service.objects.filter(is_active=True).order_by().values_list(
+            'provider_id', 'category__name', 'price_unit', 'base_price'
+        ))
+        if not rows:
+            return np.empty(0, dtype=int), np.empty(0, dtype=object), np.empty(0, dtype=object), np.empty(0)
+        provider_ids, categories, units, prices = zip(*rows)
+        return (
+            np.fromiter(provider_ids, dtype=np.int64, count=len(rows)),
+            np.array(categories, dtype=object),
+            np.array(units, dtype=object),
+            np.fromiter((float(p) for p in prices), dtype=float, count=len(rows)),
+        )
+
+    @staticmethod
+    def _group_medians(codes: np.ndarray, values: np.ndarray, n_groups: int) -> np.ndarray:
+        """Median of values per group code (NaN for empty groups), via one lexsort"""
+        order = np.lexsort((values, codes))
+        sorted_values = values[order]
+        counts = np.bincount(codes, minlength=n_groups)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        medians = np.full(n_groups, np.nan)
+        present = counts > 0
+        lower = sorted_values[(starts + (counts - 1) // 2)[present]]
+        upper = sorted_values[(starts + counts // 2)[present]]
+        medians[present] = (lower + upper) / 2
+        return medians
+
+
+class PriceSuggestionTable:
+    """
+    In-memory suggestions keyed by (category, area, day) for O(1) lookup at quote time
+
+    Loaded from current DynamicPricing rows on first use and reloaded every
+    DYNAMIC_PRICING_REFRESH_INTERVAL seconds, or replaced directly by a run in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table: Optional[Dict[Tuple[str, str, date], DynamicPricing]] = None
+        self._loaded_at = 0.0
+
+    def replace(self, rows: List[DynamicPricing]):
+        table = {
+            (row.service_category, row.location_area, timezone.localdate(row.date_range_start)): row
+            for row in rows
+        }
+        with self._lock:
+            self._table = table
+            self._loaded_at = time.monotonic()
+
+    def _get_table(self) -> Dict[Tuple[str, str, date], DynamicPricing]:
+        interval = getattr(settings, 'DYNAMIC_PRICING_REFRESH_INTERVAL', 300)
+        with self._lock:
+            table, loaded_at = self._table, self._loaded_at
+        if table is None or time.monotonic() - loaded_at >= interval:
+            self.replace(list(DynamicPricing.objects.filter(date_range_end__gt=timezone.now())))
+            with self._lock:
+                table = self._table
+        return table
+
+    def get(self, service_category: str, postal_code: str = '',
+            when: Optional[datetime] = None) -> Optional[DynamicPricing]:
+        """Suggestion for the area of postal_code, falling back to the category's all-areas row"""
+        table = self._get_table()
+        day = timezone.localdate(when) if when else timezone.localdate()
+        area = area_key(postal_code)
+        suggestion = table.get((service_category, area, day)) if area else None
+        return suggestion or table.get((service_category, '', day))
+
+    def quote(self, service: Service, postal_code: str = '', when: Optional[datetime] = None,
+              customer_id: Optional[int] = None) -> Decimal:
+        """Service base price adjusted by the current multipliers for its category and area"""
+        suggestion = self.get(service.category.name, postal_code, when)
+        if suggestion is None:
+            price = service.base_price
+        else:
+            # Factors are floats on freshly computed rows and Decimals when loaded from the database
+            factor = (
+                float(suggestion.demand_multiplier) *
+                float(suggestion.competition_factor) *
+                float(suggestion.urgency_factor)
+            )
+            price = (service.base_price * Decimal(str(round(factor, 4)))).quantize(Decimal('0.01'))
+
+        prediction_logger.log(
+            'price_optimization',
+            input_data={
+                'service_category': service.category.name,
+                'area': suggestion.location_area if suggestion else '',
+                'postal_code': postal_code,
+                'date': (timezone.localdate(when) if when else timezone.localdate()).isoformat(),
+                'base_price': float(service.base_price),
+            },
+            prediction_result={
+                'quoted_price': float(price),
+                'demand_multiplier': float(suggestion.demand_multiplier) if suggestion else None,
+                'competition_factor': float(suggestion.competition_factor) if suggestion else None,
+                'urgency_factor': float(suggestion.urgency_factor) if suggestion else None,
+            },
+            user_id=customer_id,
+            related_object=service,
+        )
+        return price
+
+
+# Singleton instance
+price_suggestions = PriceSuggestionTable()
@@ -0,0 +1,118 @@
+from django.db.models import Avg, Count
+from django.utils import timezone
+from typing import Dict, Iterable, NamedTuple, FrozenSet, Optional, Tuple
+from collections import defaultdict
+
+from accounts.models import ServiceProviderProfile
+from services.models import Service, ServiceAvailability
+from reviews.models import Review
+from bookings.models import Booking
+
+
+class ProviderFeatures(NamedTuple):
+    """Compact, immutable feature row for a single provider"""
+    average_rating: float
+    total_reviews: int
+    years_of_experience: int
+    completed_jobs: int
+    recent_completed_bookings: int  # Completed bookings in the last 30 days
+    review_count: int
+    average_sentiment: Optional[float]  # Mean stored Review.sentiment_score, None until reviews are scored
+    available_slots: int
+    is_available: bool
+    active_categories: FrozenSet[str]
+    active_services: Tuple[Tuple[int, str, str, float], ...]  # (category_id, category name, price_unit, base_price)
+
+
+class ProviderFeatureStore:
+    """
+    Provider feature table shared by all recommendation scorers
+
+    Built with a fixed number of bulk queries regardless of how many providers
+    are requested, so scoring over the candidate list is pure in-memory arithmetic.
+    """
+
+    RECENT_BOOKINGS_DAYS = 30
+
+    def __init__(self, features: Dict[int, ProviderFeatures]):
+        self.features = features
+
+    def __getitem__(self, provider_id: int) -> ProviderFeatures:
+        return self.features[provider_id]
+
+    def __contains__(self, provider_id: int) -> bool:
+        return provider_id in self.features
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    @classmethod
+    def build(cls, provider_ids: Iterable[int]) -> 'ProviderFeatureStore':
+        """Load features for the given providers"""
+        provider_ids = list(provider_ids)
+        if not provider_ids:
+            return cls({})
+
+        since = timezone.now() - timezone.timedelta(days=cls.RECENT_BOOKINGS_DAYS)
+
+        recent_bookings = dict(
+            Booking.objects.filter(
+                provider_id__in=provider_ids,
+                status='completed',
+                created_at__gte=since
+            ).order_by().values('provider_id').annotate(
+                count=Count('id')
+            ).values_list('provider_id', 'count')
+        )
+
+        review_counts = {}
+        review_sentiment = {}
+        for provider_id, count, sentiment in Review.objects.filter(
+            provider_id__in=provider_ids
+        ).order_by().values('provider_id').annotate(
+            count=Count('id'),
+            sentiment=Avg('sentiment_score')
+        ).values_list('provider_id', 'count', 'sentiment'):
+            review_counts[provider_id] = count
+            if sentiment is not None:
+                review_sentiment[provider_id] = float(sentiment)
+
+        available_slots = dict(
+            ServiceAvailability.objects.filter(
+                provider_id__in=provider_ids,
+                is_available=True
+            ).order_by().values('provider_id').annotate(
+                count=Count('id')
+            ).values_list('provider_id', 'count')
+        )
+
+        active_categories = defaultdict(set)
+        active_services = defaultdict(list)
+        for provider_id, category_id, category_name, price_unit, base_price in Service.objects.filter(
+            provider_id__in=provider_ids,
+            is_active=True
+        ).order_by('id').values_list('provider_id', 'category_id', 'category__name', 'price_unit', 'base_price'):
+            active_categories[provider_id].add(category_name)
+            active_services[provider_id].append((category_id, category_name, price_unit, float(base_price)))
+
+        features = {}
+        for profile in ServiceProviderProfile.objects.filter(user_id__in=provider_ids).only(
+            'user_id', 'average_rating', 'total_reviews', 'years_of_experience',
+            'completed_jobs', 'is_available'
+        ):
+            provider_id = profile.user_id
+            features[provider_id] = ProviderFeatures(
+                average_rating=float(profile.average_rating),
+                total_reviews=profile.total_reviews,
+                years_of_experience=profile.years_of_experience,
+                completed_jobs=profile.completed_jobs,
+                recent_completed_bookings=recent_bookings.get(provider_id, 0),
+                review_count=review_counts.get(provider_id, 0),
+                average_sentiment=review_sentiment.get(provider_id),
+                available_slots=available_slots.get(provider_id, 0),
+                is_available=profile.is_available,
+                active_categories=frozenset(active_categories[provider_id]),
+                active_services=tuple(active_services[provider_id])
+            )
+
+        return cls(features)
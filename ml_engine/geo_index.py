@@ -0,0 +1,220 @@
+from django.conf import settings
+from typing import Dict, Optional, Set, Tuple
+from collections import defaultdict
+import math
+import threading
+import time
+
+from accounts.models import ServiceProviderProfile
+from services.models import ServiceArea
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def parse_coordinates(location: str) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) for a "lat,lng" string, or None"""
+    parts = location.split(',')
+    if len(parts) == 2:
+        try:
+            latitude, longitude = float(parts[0]), float(parts[1])
+        except ValueError:
+            return None
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            return latitude, longitude
+    return None
+
+
+class ProviderGeoIndex:
+    """
+    Grid index over provider service-area coordinates
+
+    Areas are bucketed into CELL_DEGREES x CELL_DEGREES cells. A radius query only
+    visits the cells that the largest service radius can reach, then checks each
+    area with the haversine distance against its own provider's service_radius.
+    Areas without coordinates are not indexed. Postal codes and area names of the
+    indexed areas are kept so a location string can be resolved to a point.
+    """
+
+    CELL_DEGREES = 0.1  # About 11 km of latitude
+
+    def __init__(self):
+        self.cells: Dict[Tuple[int, int], Dict[int, Tuple[int, float, float]]] = defaultdict(dict)
+        self.areas: Dict[int, Tuple[int, float, float, str, str]] = {}
+        self.places: Dict[str, Set[int]] = defaultdict(set)
+        self.radii: Dict[int, float] = {}
+        self._max_radius = 0.0
+
+    @classmethod
+    def build(cls) -> 'ProviderGeoIndex':
+        """Build the index from all service areas and provider radii in two queries"""
+        index = cls()
+        for user_id, service_radius in ServiceProviderProfile.objects.values_list('user_id', 'service_radius'):
+            index.radii[user_id] = float(service_radius)
+        index._max_radius = max(index.radii.values(), default=0.0)
+
+        for area_id, provider_id, latitude, longitude, postal_code, area_name in ServiceArea.objects.filter(
+            latitude__isnull=False,
+            longitude__isnull=False
+        ).values_list('id', 'provider_id', 'latitude', 'longitude', 'postal_code', 'area_name'):
+            index.set_area(area_id, provider_id, float(latitude), float(longitude), postal_code, area_name)
+        return index
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.CELL_DEGREES), math.floor(longitude / self.CELL_DEGREES))
+
+    @staticmethod
+    def _place_key(value: str) -> str:
+        return ' '.join(value.lower().split())
+
+    def set_area(self, area_id: int, provider_id: int, latitude: float, longitude: float,
+                 postal_code: str = '', area_name: str = ''):
+        """Add or move one service area"""
+        self.remove_area(area_id)
+        self.cells[self._cell(latitude, longitude)][area_id] = (provider_id, latitude, longitude)
+        self.areas[area_id] = (provider_id, latitude, longitude, postal_code, area_name)
+        for place in (postal_code, area_name):
+            if place:
+                self.places[self._place_key(place)].add(area_id)
+
+    def remove_area(self, area_id: int):
+        entry = self.areas.pop(area_id, None)
+        if entry is None:
+            return
+        _, latitude, longitude, postal_code, area_name = entry
+
+        cell = self._cell(latitude, longitude)
+        self.cells[cell].pop(area_id, None)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+        for place in (postal_code, area_name):
+            key = self._place_key(place) if place else None
+            if key in self.places:
+                self.places[key].discard(area_id)
+                if not self.places[key]:
+                    del self.places[key]
+
+    def set_radius(self, provider_id: int, service_radius: float):
+        old = self.radii.get(provider_id)
+        self.radii[provider_id] = float(service_radius)
+        if service_radius >= self._max_radius:
+            self._max_radius = float(service_radius)
+        elif old == self._max_radius:
+            self._max_radius = max(self.radii.values(), default=0.0)
+
+    def resolve(self, location: str) -> Optional[Tuple[float, float]]:
+        """
+        Resolve "lat,lng", or a postal code or area name of an indexed service area
+
+        Place names resolve to the centroid of all areas that carry them.
+        Returns None if the location cannot be resolved.
+        """
+        point = parse_coordinates(location)
+        if point is not None:
+            return point
+
+        area_ids = self.places.get(self._place_key(location))
+        if not area_ids:
+            return None
+        points = [self.areas[area_id][1:3] for area_id in area_ids]
+        return (
+            sum(lat for lat, _ in points) / len(points),
+            sum(lng for _, lng in points) / len(points),
+        )
+
+    def providers_within_reach(self, latitude: float, longitude: float) -> Dict[int, Tuple[float, float]]:
+        """
+        Providers with a service area within their service_radius of the point
+
+        Returns {provider_id: (km to their nearest area, service_radius in km)}.
+        """
+        reach = self._max_radius
+        lat_cells = math.ceil(reach / KM_PER_DEGREE / self.CELL_DEGREES)
+        lng_km_per_degree = KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)
+        lng_cells = math.ceil(reach / lng_km_per_degree / self.CELL_DEGREES)
+        center_lat, center_lng = self._cell(latitude, longitude)
+
+        nearest = {}
+        for cell_lat in range(center_lat - lat_cells, center_lat + lat_cells + 1):
+            for cell_lng in range(center_lng - lng_cells, center_lng + lng_cells + 1):
+                cell = self.cells.get((cell_lat, cell_lng))
+                if not cell:
+                    continue
+                for provider_id, area_lat, area_lng in cell.values():
+                    distance = haversine_km(latitude, longitude, area_lat, area_lng)
+                    if distance <= self.radii.get(provider_id, 0.0) and distance < nearest.get(provider_id, math.inf):
+                        nearest[provider_id] = distance
+        return {provider_id: (distance, self.radii[provider_id]) for provider_id, distance in nearest.items()}
+
+
+_index: Optional[ProviderGeoIndex] = None
+_built_at = 0.0
+_lock = threading.RLock()
+
+
+def get_geo_index() -> ProviderGeoIndex:
+    """
+    Process-wide index, built on first use
+
+    Changes made in this process are applied incrementally by signals; the index
+    is rebuilt every GEO_INDEX_REBUILD_INTERVAL seconds to pick up other processes.
+    """
+    global _index, _built_at
+
+    interval = getattr(settings, 'GEO_INDEX_REBUILD_INTERVAL', 300)
+    with _lock:
+        if _index is None or time.monotonic() - _built_at >= interval:
+            _index = ProviderGeoIndex.build()
+            _built_at = time.monotonic()
+        return _index
+
+
+def locate_providers(location: str) -> Optional[Dict[int, Tuple[float, float]]]:
+    """Providers that can reach the location, as for providers_within_reach, or None if unresolvable"""
+    with _lock:
+        index = get_geo_index()
+        point = index.resolve(location)
+        if point is None:
+            return None
+        return index.providers_within_reach(*point)
+
+
+def update_geo_area(area: ServiceArea):
+    """Apply a saved ServiceArea to the index if it has been built"""
+    with _lock:
+        if _index is None:
+            return
+        if area.latitude is None or area.longitude is None:
+            _index.remove_area(area.pk)
+        else:
+            _index.set_area(area.pk, area.provider_id, float(area.latitude), float(area.longitude),
+                            area.postal_code, area.area_name)
+
+
+def remove_geo_area(area_id: int):
+    with _lock:
+        if _index is not None:
+            _index.remove_area(area_id)
+
+
+def update_geo_radius(provider_id: int, service_radius: float):
+    with _lock:
+        if _index is not None:
+            _index.set_radius(provider_id, service_radius)
+
+
+def mark_geo_index_stale():
+    """Force a rebuild on the next lookup in this process"""
+    global _index
+    with _lock:
+        _index = None
@@ -0,0 +1,267 @@
+from django.conf import settings
+from django.utils import timezone
+from typing import Dict, Iterable, Optional, Set, Tuple
+from collections import defaultdict
+from pathlib import Path
+import logging
+import math
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from reviews.models import Review
+from bookings.models import Booking
+
+logger = logging.getLogger(__name__)
+
+
+class ItemSimilarityIndex:
+    """
+    Sparse provider x provider cosine similarity built from completed bookings
+
+    Each customer is a sparse vector of provider weights (latest review rating / 5,
+    or 0.7 for an unreviewed completed booking). The index keeps pairwise dot
+    products and squared norms, so a single weight change updates only the pairs
+    involving that customer's providers and similarities are exact at read time.
+    Updates and reads hold the index's lock, so a score never mixes dot products
+    and norms from before and after a concurrent refresh.
+    """
+
+    DEFAULT_WEIGHT = 0.7  # Same positive assumption as user-user filtering
+
+    def __init__(self):
+        self.customer_vectors: Dict[int, Dict[int, float]] = {}
+        self.dots: Dict[int, Dict[int, float]] = defaultdict(dict)
+        self.norms_sq: Dict[int, float] = defaultdict(float)
+        self.watermark = None  # Bookings/reviews updated after this are not indexed yet
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls) -> 'ItemSimilarityIndex':
+        """Build the index from all completed bookings"""
+        index = cls()
+        watermark = timezone.now()
+
+        pairs = set(Booking.objects.filter(status='completed').order_by().values_list(
+            'customer_id', 'provider_id'
+        ))
+        for (customer_id, provider_id), weight in index._load_weights(pairs).items():
+            index._set_weight(customer_id, provider_id, weight)
+
+        index.watermark = watermark
+        return index
+
+    def refresh(self, pairs: Iterable[Tuple[int, int]] = ()) -> int:
+        """
+        Apply bookings and reviews changed since the last build or refresh
+
+        pairs are (customer, provider) pairs to re-weight as well, such as those of
+        deleted bookings, which the updated_at watermark cannot see. Returns the
+        number of pairs re-weighted. Rows deleted in other processes are only
+        picked up by a full rebuild.
+        """
+        watermark = timezone.now()
+        changed = set(pairs)
+        changed |= set(Booking.objects.filter(updated_at__gte=self.watermark).order_by().values_list(
+            'customer_id', 'provider_id'
+        ))
+        changed |= set(Review.objects.filter(updated_at__gte=self.watermark).order_by().values_list(
+            'customer_id', 'provider_id'
+        ))
+
+        weights = self._load_weights(changed)
+        with self._lock:
+            for customer_id, provider_id in changed:
+                self._set_weight(customer_id, provider_id, weights.get((customer_id, provider_id), 0.0))
+            self.watermark = watermark
+        return len(changed)
+
+    def _load_weights(self, pairs: Set[Tuple[int, int]]) -> Dict[Tuple[int, int], float]:
+        """Weights for the pairs that have a completed booking; others are absent"""
+        if not pairs:
+            return {}
+
+        customer_ids = {customer_id for customer_id, _ in pairs}
+        provider_ids = {provider_id for _, provider_id in pairs}
+
+        completed = set(Booking.objects.filter(
+            customer_id__in=customer_ids,
+            provider_id__in=provider_ids,
+            status='completed'
+        ).order_by().values_list('customer_id', 'provider_id')) & pairs
+
+        # Latest review per pair, matching Review's default ordering
+        ratings = {}
+        for customer_id, provider_id, overall_rating in Review.objects.filter(
+            customer_id__in=customer_ids,
+            provider_id__in=provider_ids
+        ).order_by('-created_at').values_list('customer_id', 'provider_id', 'overall_rating'):
+            ratings.setdefault((customer_id, provider_id), overall_rating)
+
+        return {
+            pair: ratings[pair] / 5.0 if pair in ratings else self.DEFAULT_WEIGHT
+            for pair in completed
+        }
+
+    def _set_weight(self, customer_id: int, provider_id: int, weight: float):
+        """Change one customer->provider weight and update the affected dot products; hold the lock"""
+        vector = self.customer_vectors.setdefault(customer_id, {})
+        old = vector.get(provider_id, 0.0)
+        if old == weight:
+            if not vector:
+                del self.customer_vectors[customer_id]
+            return
+
+        delta = weight - old
+        for other_id, other_weight in vector.items():
+            if other_id == provider_id:
+                continue
+            dot = self.dots[provider_id].get(other_id, 0.0) + delta * other_weight
+            if abs(dot) < 1e-12:
+                self.dots[provider_id].pop(other_id, None)
+                self.dots[other_id].pop(provider_id, None)
+            else:
+                self.dots[provider_id][other_id] = dot
+                self.dots[other_id][provider_id] = dot
+
+        self.norms_sq[provider_id] += weight * weight - old * old
+
+        if weight:
+            vector[provider_id] = weight
+        else:
+            vector.pop(provider_id, None)
+            if not vector:
+                del self.customer_vectors[customer_id]
+
+    def similarity(self, provider_a: int, provider_b: int) -> float:
+        """Cosine similarity between two providers"""
+        with self._lock:
+            return self._similarity(provider_a, provider_b)
+
+    def _similarity(self, provider_a: int, provider_b: int) -> float:
+        # .get() so that reads never insert into the defaultdicts
+        dot = self.dots.get(provider_a, {}).get(provider_b, 0.0)
+        if not dot:
+            return 0.0
+        return dot / math.sqrt(self.norms_sq.get(provider_a, 0.0) * self.norms_sq.get(provider_b, 0.0))
+
+    def score(self, customer_id: int, candidate_providers: Iterable[int]) -> Dict[int, float]:
+        """
+        Similarity-weighted average of the customer's own provider weights
+
+        Only the providers the customer has used are visited for each candidate.
+        """
+        scores = {}
+
+        with self._lock:
+            vector = self.customer_vectors.get(customer_id)
+            for candidate_id in candidate_providers:
+                numerator = 0.0
+                denominator = 0.0
+
+                if vector:
+                    for provider_id, weight in vector.items():
+                        if provider_id == candidate_id:
+                            continue
+                        similarity = self._similarity(candidate_id, provider_id)
+                        numerator += similarity * weight
+                        denominator += similarity
+
+                scores[candidate_id] = numerator / denominator if denominator > 0 else 0.0
+
+        return scores
+
+    def has_history(self, customer_id: int) -> bool:
+        return bool(self.customer_vectors.get(customer_id))
+
+    def save(self, path: Path):
+        """Atomically write the index to disk"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f, self._lock:
+            pickle.dump({
+                'customer_vectors': self.customer_vectors,
+                'dots': dict(self.dots),
+                'norms_sq': dict(self.norms_sq),
+                'watermark': self.watermark,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'ItemSimilarityIndex':
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        index = cls()
+        index.customer_vectors = data['customer_vectors']
+        index.dots = defaultdict(dict, data['dots'])
+        index.norms_sq = defaultdict(float, data['norms_sq'])
+        index.watermark = data['watermark']
+        return index
+
+
+def item_similarity_path() -> Path:
+    return Path(getattr(settings, 'ML_ENGINE_DATA_DIR', settings.BASE_DIR / 'ml_data')) / 'item_similarity.pkl'
+
+
+_index: Optional[ItemSimilarityIndex] = None
+_last_refresh = 0.0
+_stale = False
+_deleted_pairs: Set[Tuple[int, int]] = set()
+_lock = threading.Lock()
+
+
+def get_item_similarity_index() -> ItemSimilarityIndex:
+    """
+    Process-wide index, loaded from disk (or built) on first use
+
+    Catches up incrementally at most every ITEM_SIMILARITY_REFRESH_INTERVAL seconds,
+    or on the next call after mark_item_similarity_stale().
+    """
+    global _index, _last_refresh, _stale
+
+    interval = getattr(settings, 'ITEM_SIMILARITY_REFRESH_INTERVAL', 60)
+    with _lock:
+        if _index is None:
+            path = item_similarity_path()
+            try:
+                _index = ItemSimilarityIndex.load(path)
+            except FileNotFoundError:
+                _index = ItemSimilarityIndex.build()
+            except Exception as e:
+                logger.error(f"Error loading item similarity index from {path}: {str(e)}")
+                _index = ItemSimilarityIndex.build()
+            _stale = True
+
+        if _stale or time.monotonic() - _last_refresh >= interval:
+            _index.refresh(_deleted_pairs)
+            _deleted_pairs.clear()
+            _last_refresh = time.monotonic()
+            _stale = False
+
+        return _index
+
+
+def mark_item_similarity_stale():
+    """Force a refresh on the next lookup in this process"""
+    global _stale
+    _stale = True
+
+
+def mark_booking_deleted(customer_id: int, provider_id: int):
+    """Re-weight this pair on the next lookup in this process"""
+    global _stale
+    with _lock:
+        _deleted_pairs.add((customer_id, provider_id))
+        _stale = True
+
+
+def use_item_similarity_index(index: ItemSimilarityIndex):
+    """Install an already built index for this process, e.g. one built from benchmark data"""
+    global _index, _last_refresh, _stale
+    with _lock:
+        _index = index
+        _last_refresh = time.monotonic()
+        _stale = False
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ml_engine.demand_forecast import DemandForecaster
+from ml_engine.dynamic_pricing import DynamicPricingEngine, price_suggestions
+from ml_engine.prediction_log import prediction_logger
+from ml_engine.synthetic import AREAS, CATEGORIES, generate_marketplace
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a full DynamicPricing recompute and quote lookups on a synthetic marketplace. "
+        "Runs against a throwaway test database, never the configured one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--services", type=int, default=100000, help="Active services to generate")
+        parser.add_argument("--providers", type=int, default=20000, help="Providers to generate")
+        parser.add_argument("--customers", type=int, default=20000, help="Customers to generate")
+        parser.add_argument("--bookings", type=int, default=100000, help="Bookings to generate")
+        parser.add_argument("--days", type=int, default=7, help="Daily windows to price")
+        parser.add_argument("--lookups", type=int, default=100000, help="Quote lookups to time")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed")
+
+    def handle(self, *args, **options):
+        # Quote audit records would reference test database rows and be written after it is destroyed
+        with prediction_logger.paused():
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.stdout.write("Generating marketplace...")
+                counts = generate_marketplace(
+                    customers=options["customers"],
+                    providers=options["providers"],
+                    services=options["services"],
+                    bookings=options["bookings"],
+                    seed=options["seed"],
+                )
+                self.stdout.write(", ".join(f"{name}={count}" for name, count in counts.items()))
+
+                start = time.perf_counter()
+                DemandForecaster().run()
+                self.stdout.write(f"Demand forecast:   {time.perf_counter() - start:8.2f}s")
+
+                engine = DynamicPricingEngine(window_days=options["days"])
+                start = time.perf_counter()
+                rows = engine.compute()
+                compute_seconds = time.perf_counter() - start
+                self.stdout.write(f"Pricing compute:   {compute_seconds:8.2f}s ({len(rows)} suggestions)")
+
+                start = time.perf_counter()
+                written = engine.run()
+                self.stdout.write(f"Pricing run+store: {time.perf_counter() - start:8.2f}s ({written} rows)")
+
+                keys = [
+                    (category, f"{prefix}{i:02d}")
+                    for category in CATEGORIES
+                    for i, (_, prefix, _, _) in enumerate(AREAS)
+                ]
+                lookups = options["lookups"]
+                start = time.perf_counter()
+                for i in range(lookups):
+                    price_suggestions.get(*keys[i % len(keys)])
+                per_lookup = (time.perf_counter() - start) / max(lookups, 1)
+                self.stdout.write(f"Lookup:            {per_lookup * 1e6:8.2f}us per quote")
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,220 @@
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from accounts.models import User
+from ml_engine.geo_index import mark_geo_index_stale
+from ml_engine.item_similarity import ItemSimilarityIndex, use_item_similarity_index
+from ml_engine.postal_index import mark_postal_index_stale
+from ml_engine.prediction_log import prediction_logger
+from ml_engine.price_distribution import mark_price_distribution_stale
+from ml_engine.profiling import RecommendationProfiler
+from ml_engine.recommendation_engine import RecommendationEngine, ServiceRecommendationEngine
+from ml_engine.synthetic import generate_marketplace
+from ml_engine.text_index import mark_text_index_stale
+
+
+class QueryCounter:
+    """connection.execute_wrapper hook counting queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the recommendation engines on seeded synthetic marketplaces and emit JSON. "
+        "Runs against a throwaway test database, never the configured one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            default=["200,40,120,2000", "1000,200,600,10000", "5000,1000,3000,50000"],
+            help="Marketplace sizes as customers,providers,services,bookings",
+        )
+        parser.add_argument("--samples", type=int, default=25, help="Customers measured per size")
+        parser.add_argument("--top-k", type=int, default=10, help="Recommendations requested per call")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for data and customer sampling")
+        parser.add_argument("--alpha", type=float, default=1.1, help="Power-law exponent for booking activity")
+        parser.add_argument("--vectorized", action="store_true", help="Score with the vectorized NumPy engine")
+        parser.add_argument(
+            "--collaborative-mode",
+            choices=RecommendationEngine.COLLABORATIVE_MODES,
+            default="user",
+            help="Collaborative filtering mode for provider recommendations",
+        )
+        parser.add_argument("--output", type=str, help="Write JSON to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        sizes = [self._parse_size(value) for value in options["sizes"]]
+
+        report = {
+            "environment": {
+                "commit": self._git_commit(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "numpy": np.__version__,
+                "database": connection.vendor,
+            },
+            "options": {
+                "samples": options["samples"],
+                "top_k": options["top_k"],
+                "seed": options["seed"],
+                "alpha": options["alpha"],
+                "vectorized": options["vectorized"],
+                "collaborative_mode": options["collaborative_mode"],
+            },
+            "results": [],
+        }
+
+        # Audit records would reference test database rows and be written after it is destroyed,
+        # and indexes saved under ML_ENGINE_DATA_DIR must not be replaced by synthetic ones
+        with prediction_logger.paused(), tempfile.TemporaryDirectory() as data_dir, \
+                override_settings(ML_ENGINE_DATA_DIR=data_dir):
+            for size in sizes:
+                self.stderr.write(f"Benchmarking {size}...")
+                report["results"].append(self._run_size(size, options))
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _run_size(self, size, options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start = time.perf_counter()
+            counts = generate_marketplace(seed=options["seed"], alpha=options["alpha"], **size)
+            generate_seconds = time.perf_counter() - start
+
+            # bulk_create sends no signals, so process-wide indexes still describe the
+            # previous size; rebuilding them on first use is part of the measured cost
+            for mark_stale in (mark_text_index_stale, mark_price_distribution_stale,
+                               mark_geo_index_stale, mark_postal_index_stale):
+                mark_stale()
+
+            if options["collaborative_mode"] == "item":
+                use_item_similarity_index(ItemSimilarityIndex.build())
+
+            rng = np.random.default_rng(options["seed"])
+            customer_ids = list(User.objects.filter(role="customer").order_by("id").values_list("id", flat=True))
+            sample_ids = rng.choice(customer_ids, size=min(options["samples"], len(customer_ids)), replace=False)
+            customers = list(User.objects.filter(id__in=sample_ids.tolist()).order_by("id"))
+
+            profiler = RecommendationProfiler(enabled=True)
+            provider_engine = RecommendationEngine(
+                vectorized=options["vectorized"],
+                collaborative_mode=options["collaborative_mode"],
+                profiler=profiler,
+            )
+            service_engine = ServiceRecommendationEngine(profiler=profiler)
+            top_k = options["top_k"]
+
+            calls = {
+                "get_provider_recommendations": lambda customer: provider_engine.get_provider_recommendations(
+                    customer=customer, max_recommendations=top_k
+                ),
+                "get_service_recommendations": lambda customer: service_engine.get_service_recommendations(
+                    customer=customer, max_recommendations=top_k
+                ),
+            }
+
+            return {
+                "size": size,
+                "rows": counts,
+                "generate_seconds": round(generate_seconds, 3),
+                "methods": {name: self._measure(call, customers, profiler) for name, call in calls.items()},
+                "stages": {
+                    name: {
+                        "mean_ms": metrics["time_ms"]["mean"],
+                        "mean_queries": metrics["queries"]["mean"],
+                    }
+                    for name, metrics in sorted(profiler.snapshot().items())
+                },
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _measure(self, call, customers, profiler):
+        """Latency and query count per call, then peak memory in a separate traced pass"""
+        latencies = []
+        queries = []
+        results = []
+        for customer in customers:
+            counter = QueryCounter()
+            start = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                result = call(customer)
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(counter.count)
+            results.append(len(result))
+
+        # tracemalloc slows everything down, so it is kept out of the timed pass and stage histograms
+        peaks = []
+        profiler.enabled = False
+        try:
+            for customer in customers:
+                tracemalloc.start()
+                try:
+                    call(customer)
+                    peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+                finally:
+                    tracemalloc.stop()
+        finally:
+            profiler.enabled = True
+
+        return {
+            "calls": len(customers),
+            "latency_ms": self._summary(latencies),
+            "queries": self._summary(queries),
+            "peak_memory_kib": self._summary(peaks),
+            "mean_results": round(statistics.mean(results), 2) if results else None,
+        }
+
+    def _summary(self, values):
+        if not values:
+            return None
+        values = np.asarray(values, dtype=float)
+        return {
+            "mean": round(float(values.mean()), 3),
+            "p50": round(float(np.percentile(values, 50)), 3),
+            "p95": round(float(np.percentile(values, 95)), 3),
+            "max": round(float(values.max()), 3),
+        }
+
+    def _parse_size(self, value):
+        try:
+            customers, providers, services, bookings = (int(part) for part in value.split(","))
+        except ValueError:
+            raise CommandError(f"Invalid size {value!r}; expected customers,providers,services,bookings")
+        return {"customers": customers, "providers": providers, "services": services, "bookings": bookings}
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ml_engine.recommendation_engine import RecommendationEngine
+
+
+class Command(BaseCommand):
+    help = "Benchmark dict-based vs vectorized score scaling, combination and top-k ranking"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000, 10000, 100000],
+            help="Numbers of candidate providers to benchmark",
+        )
+        parser.add_argument("--top-k", type=int, default=10, help="Number of recommendations to rank")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per size (best time is reported)")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for synthetic scores")
+
+    def handle(self, *args, **options):
+        engine = RecommendationEngine(vectorized=True)
+        rng = np.random.default_rng(options["seed"])
+        top_k = options["top_k"]
+
+        self.stdout.write(f"{'providers':>10} {'dict (ms)':>12} {'vectorized (ms)':>16} {'speedup':>9}")
+        for size in options["sizes"]:
+            provider_ids = list(range(1, size + 1))
+            raw = rng.random((size, len(engine.COMPONENTS)))
+            columns = {name: dict(zip(provider_ids, raw[:, i].tolist()))
+                       for i, name in enumerate(engine.COMPONENTS)}
+
+            dict_time = self._best_of(options["repeat"], lambda: self._dict_path(engine, columns, top_k))
+            vector_time = self._best_of(options["repeat"], lambda: self._vectorized_path(engine, raw, top_k))
+
+            dict_top = [pid for pid, _ in self._dict_path(engine, columns, top_k)]
+            vector_top = [provider_ids[i] for i in self._vectorized_path(engine, raw, top_k)]
+            if dict_top != vector_top:
+                self.stdout.write(self.style.WARNING(f"Rankings differ at {size} providers"))
+
+            self.stdout.write(
+                f"{size:>10} {dict_time * 1000:>12.2f} {vector_time * 1000:>16.2f} "
+                f"{dict_time / vector_time:>8.1f}x"
+            )
+
+    def _best_of(self, repeat, func):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    def _dict_path(self, engine, columns, top_k):
+        scaled = {}
+        for name, scores in columns.items():
+            if name in engine.SCALED_COMPONENTS:
+                scores = dict(zip(scores.keys(), engine.scaler.fit_transform(list(scores.values()))))
+            scaled[name] = scores
+
+        final_scores = engine._combine_scores(
+            scaled["collaborative"],
+            scaled["content_based"],
+            scaled["rating"],
+            scaled["popularity"],
+            scaled["availability"],
+            scaled["distance"],
+            scaled["price"],
+            scaled["sentiment"],
+        )
+        return sorted(final_scores.items(), key=lambda x: x[1]["final_score"], reverse=True)[:top_k]
+
+    def _vectorized_path(self, engine, raw, top_k):
+        matrix = raw.copy()
+        engine.scaler.fit_transform_columns(
+            matrix, [engine.COMPONENTS.index(name) for name in engine.SCALED_COMPONENTS]
+        )
+        weights = np.array([engine.WEIGHTS[name] for name in engine.COMPONENTS])
+        return engine._top_k(matrix @ weights, top_k)
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ml_engine.item_similarity import ItemSimilarityIndex, item_similarity_path
+
+
+class Command(BaseCommand):
+    help = "Build or incrementally refresh the item-item provider similarity index on disk"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild from all completed bookings instead of applying changes since the last run",
+        )
+
+    def handle(self, *args, **options):
+        path = item_similarity_path()
+        start = time.perf_counter()
+
+        if options["full"] or not path.exists():
+            self.stdout.write("Building item similarity index from all completed bookings...")
+            index = ItemSimilarityIndex.build()
+        else:
+            index = ItemSimilarityIndex.load(path)
+            since = index.watermark
+            changed = index.refresh()
+            self.stdout.write(f"Applied {changed} changed customer/provider pairs since {since}")
+
+        index.save(path)
+        pairs = sum(len(row) for row in index.dots.values()) // 2
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {len(index.norms_sq)} providers, {pairs} similar pairs and "
+            f"{len(index.customer_vectors)} customers to {path} in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ml_engine.text_index import ProviderTextIndex, text_index_path
+
+
+class Command(BaseCommand):
+    help = "Build or incrementally refresh the provider TF-IDF text index on disk"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild from all providers instead of re-indexing those with services changed since the last run",
+        )
+
+    def handle(self, *args, **options):
+        path = text_index_path()
+        start = time.perf_counter()
+
+        index = None
+        if not options["full"] and path.exists():
+            index = ProviderTextIndex.load(path)
+            if index.is_current():
+                since = index.watermark
+                changed = index.refresh()
+                self.stdout.write(f"Re-indexed {changed} providers with services changed since {since}")
+            else:
+                self.stdout.write("Saved index does not match the database (rows deleted or another database)")
+                index = None
+
+        if index is None:
+            self.stdout.write("Building provider text index from all provider descriptions and services...")
+            index = ProviderTextIndex.build()
+
+        index.save(path)
+        terms = sum(len(term_ids) for term_ids, _ in index.documents.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {len(index.documents)} providers, {len(index.vocabulary)} terms and {terms} "
+            f"non-zero weights to {path} in {time.perf_counter() - start:.1f}s"
+        ))
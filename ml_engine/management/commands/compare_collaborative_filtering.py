@@ -0,0 +1,71 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from bookings.models import Booking
+from ml_engine.recommendation_engine import RecommendationEngine
+
+
+class Command(BaseCommand):
+    help = "Compare user-user and item-item collaborative filtering scores offline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=100, help="Customers with history to sample")
+        parser.add_argument("--top-k", type=int, default=10, help="Size of the top-k lists to compare")
+        parser.add_argument("--category", type=str, help="Restrict candidates to a service category")
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+
+    def handle(self, *args, **options):
+        user_engine = RecommendationEngine(collaborative_mode="user")
+        item_engine = RecommendationEngine(collaborative_mode="item")
+        top_k = options["top_k"]
+
+        candidates = user_engine._get_candidate_providers(options["category"], None)
+        customer_ids = list(
+            Booking.objects.filter(status="completed", customer__role="customer")
+            .order_by("customer_id").values_list("customer_id", flat=True).distinct()[:options["customers"]]
+        )
+
+        # Warm the index so its build is not counted as scoring time
+        item_engine._collaborative_filtering_scores(User(id=0), candidates)
+
+        user_time = item_time = 0.0
+        overlaps, correlations = [], []
+        for customer in User.objects.filter(id__in=customer_ids):
+            start = time.perf_counter()
+            user_scores = user_engine._collaborative_filtering_scores(customer, candidates)
+            user_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            item_scores = item_engine._collaborative_filtering_scores(customer, candidates)
+            item_time += time.perf_counter() - start
+
+            user_top = set(sorted(candidates, key=lambda pid: user_scores[pid], reverse=True)[:top_k])
+            item_top = set(sorted(candidates, key=lambda pid: item_scores[pid], reverse=True)[:top_k])
+            if user_top | item_top:
+                overlaps.append(len(user_top & item_top) / len(user_top | item_top))
+
+            a = np.array([user_scores[pid] for pid in candidates])
+            b = np.array([item_scores[pid] for pid in candidates])
+            if len(candidates) > 1 and a.std() > 0 and b.std() > 0:
+                correlations.append(float(np.corrcoef(a, b)[0, 1]))
+
+        n = max(len(customer_ids), 1)
+        summary = {
+            "customers": len(customer_ids),
+            "candidates": len(candidates),
+            "top_k": top_k,
+            "mean_top_k_jaccard": round(float(np.mean(overlaps)), 4) if overlaps else None,
+            "mean_pearson": round(float(np.mean(correlations)), 4) if correlations else None,
+            "user_ms_per_customer": round(user_time * 1000 / n, 3),
+            "item_ms_per_customer": round(item_time * 1000 / n, 3),
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary))
+        else:
+            for key, value in summary.items():
+                self.stdout.write(f"{key:>22}: {value}")
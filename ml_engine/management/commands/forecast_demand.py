@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ml_engine.demand_forecast import DemandForecaster
+
+
+class Command(BaseCommand):
+    help = "Forecast daily booking demand per service category and area and store it in DemandForecast"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--history-days", type=int, default=182, help="Days of booking history to fit on")
+        parser.add_argument("--horizon", type=int, default=28, help="Days to forecast, starting today")
+        parser.add_argument(
+            "--area-prefix-length",
+            type=int,
+            help="Postal code characters that identify an area (default: DEMAND_FORECAST_AREA_PREFIX_LENGTH)",
+        )
+        parser.add_argument(
+            "--min-bookings",
+            type=int,
+            default=5,
+            help="Skip series with fewer bookings than this in the history window",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only refit series with bookings created or changed since the last run",
+        )
+
+    def handle(self, *args, **options):
+        forecaster = DemandForecaster(
+            history_days=options["history_days"],
+            horizon_days=options["horizon"],
+            area_prefix_length=options["area_prefix_length"],
+            min_bookings=options["min_bookings"],
+        )
+
+        start = time.perf_counter()
+        result = forecaster.run(incremental=options["incremental"])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {result['forecasts']} forecasts for {result['series']} series in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,129 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from accounts.models import User
+from services.models import ServiceCategory
+from ml_engine.models import RecommendationScore
+from ml_engine.prediction_log import prediction_logger
+from ml_engine.recommendation_engine import RecommendationEngine
+
+
+def precompute_chunk(customer_ids, categories, limit, vectorized, collaborative_mode):
+    """Compute and store recommendations for a chunk of customers; returns rows written"""
+    engine = RecommendationEngine(
+        vectorized=vectorized, collaborative_mode=collaborative_mode, replace_stored=True
+    )
+    computed = {category: [] for category in categories}
+    written = 0
+    started = timezone.now()
+
+    for customer in User.objects.filter(id__in=customer_ids).select_related('customer_profile'):
+        for category in categories:
+            recommendations = engine.get_provider_recommendations(
+                customer=customer,
+                service_category=category,
+                max_recommendations=limit
+            )
+            if recommendations:
+                computed[category].append(customer.id)
+                written += len(recommendations)
+
+    # Unchanged rows are skipped on write but were recomputed, so mark them as fresh;
+    # changed rows were stamped on write and dropped providers were deleted
+    now = timezone.now()
+    for category, ids in computed.items():
+        if ids:
+            RecommendationScore.objects.filter(
+                customer_id__in=ids,
+                service_category=category or "",
+                calculated_at__lt=started
+            ).update(calculated_at=now)
+
+    # Pool workers exit without running atexit handlers, so write the audit records now
+    prediction_logger.flush()
+    return written
+
+
+def _init_worker():
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Precompute provider recommendations for customers and store them in RecommendationScore"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            type=str,
+            help="Only customers active since this ISO date or datetime (login, booking or review)",
+        )
+        parser.add_argument("--limit", type=int, default=12, help="Recommendations stored per customer and category")
+        parser.add_argument("--workers", type=int, default=1, help="Worker processes (1 runs in-process)")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Customers per unit of work")
+        parser.add_argument(
+            "--vectorized",
+            action="store_true",
+            help="Score with the vectorized NumPy engine",
+        )
+
+    def handle(self, *args, **options):
+        customers = User.objects.filter(role="customer", is_active=True)
+
+        if options["since"]:
+            since = self._parse_since(options["since"])
+            customers = customers.filter(
+                Q(last_login__gte=since) |
+                Q(customer_bookings__updated_at__gte=since) |
+                Q(reviews_given__created_at__gte=since)
+            ).distinct()
+
+        customer_ids = list(customers.order_by("id").values_list("id", flat=True))
+        categories = [None] + list(
+            ServiceCategory.objects.filter(is_active=True).order_by("name").values_list("name", flat=True)
+        )
+        chunk_size = max(options["chunk_size"], 1)
+        chunks = [customer_ids[i:i + chunk_size] for i in range(0, len(customer_ids), chunk_size)]
+        job_args = (
+            categories, options["limit"], options["vectorized"],
+            getattr(settings, "RECOMMENDATION_COLLABORATIVE_MODE", "user"),
+        )
+
+        self.stdout.write(
+            f"Precomputing recommendations for {len(customer_ids)} customers "
+            f"across {len(categories)} category scopes in {len(chunks)} chunks..."
+        )
+        start = time.perf_counter()
+
+        if options["workers"] > 1 and len(chunks) > 1:
+            # Child processes must not inherit the parent's open connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options["workers"], initializer=_init_worker) as pool:
+                futures = [pool.submit(precompute_chunk, chunk, *job_args) for chunk in chunks]
+                written = sum(future.result() for future in futures)
+        else:
+            written = sum(precompute_chunk(chunk, *job_args) for chunk in chunks)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {written} recommendations in {elapsed:.1f}s"
+        ))
+
+    def _parse_since(self, value):
+        since = parse_datetime(value)
+        if since is None:
+            date = parse_date(value)
+            if date is None:
+                raise CommandError(f"Invalid --since value: {value}")
+            since = datetime.combine(date, datetime.min.time())
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ml_engine.cache import recommendation_cache
+from ml_engine.sentiment import score_reviews
+
+
+class Command(BaseCommand):
+    help = "Score review sentiment offline from comments, pros and cons and store it on each review"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Reviews scored and updated per batch")
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only score reviews that have no sentiment score yet",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        scored = score_reviews(incremental=options["incremental"], chunk_size=options["chunk_size"])
+        elapsed = time.perf_counter() - start
+
+        # Cached rankings may include the sentiment component
+        if scored:
+            recommendation_cache.invalidate_all()
+
+        self.stdout.write(self.style.SUCCESS(f"Scored sentiment for {scored} reviews in {elapsed:.1f}s"))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ml_engine.dynamic_pricing import DynamicPricingEngine
+
+
+class Command(BaseCommand):
+    help = "Recompute DynamicPricing suggestions per service category, area and day"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="Daily windows to price, starting today")
+        parser.add_argument(
+            "--area-prefix-length",
+            type=int,
+            help="Postal code characters that identify an area (default: DEMAND_FORECAST_AREA_PREFIX_LENGTH)",
+        )
+
+    def handle(self, *args, **options):
+        engine = DynamicPricingEngine(
+            window_days=options["days"],
+            area_prefix_length=options["area_prefix_length"],
+        )
+
+        start = time.perf_counter()
+        written = engine.run()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f"Stored {written} pricing suggestions in {elapsed:.1f}s"))
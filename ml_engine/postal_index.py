@@ -0,0 +1,136 @@
+from django.conf import settings
+from typing import Dict, Iterable, Optional, Set, Tuple
+from collections import Counter, defaultdict
+import threading
+import time
+
+from services.models import ServiceArea
+
+
+def normalize_postal_code(value: str) -> str:
+    return ''.join(ch for ch in value.upper() if ch.isalnum())
+
+
+class PostalPrefixIndex:
+    """
+    Prefix index from ServiceArea postal codes to the providers serving them
+
+    Every prefix of every postal code maps to the providers with an area under it
+    (counted, so a provider stays while any of its areas remains). A lookup walks
+    from the full code towards shorter prefixes, one dict access per step.
+    """
+
+    def __init__(self):
+        self.prefixes: Dict[str, Counter] = defaultdict(Counter)
+        self.areas: Dict[int, Tuple[int, str]] = {}
+
+    @classmethod
+    def build(cls) -> 'PostalPrefixIndex':
+        """Build the index from all service areas with a postal code in one query"""
+        index = cls()
+        for area_id, provider_id, postal_code in ServiceArea.objects.exclude(
+            postal_code=''
+        ).values_list('id', 'provider_id', 'postal_code'):
+            index.set_area(area_id, provider_id, postal_code)
+        return index
+
+    def set_area(self, area_id: int, provider_id: int, postal_code: str):
+        """Add or change one service area"""
+        self.remove_area(area_id)
+        code = normalize_postal_code(postal_code)
+        if not code:
+            return
+        self.areas[area_id] = (provider_id, code)
+        for length in range(1, len(code) + 1):
+            self.prefixes[code[:length]][provider_id] += 1
+
+    def remove_area(self, area_id: int):
+        entry = self.areas.pop(area_id, None)
+        if entry is None:
+            return
+        provider_id, code = entry
+        for length in range(1, len(code) + 1):
+            providers = self.prefixes[code[:length]]
+            providers[provider_id] -= 1
+            if providers[provider_id] <= 0:
+                del providers[provider_id]
+            if not providers:
+                del self.prefixes[code[:length]]
+
+    def match(self, postal_code: str, min_candidates: int = 1, min_length: int = 3,
+              within: Optional[Iterable[int]] = None) -> Optional[Tuple[str, Set[int]]]:
+        """
+        Providers serving the longest prefix of postal_code with at least min_candidates
+
+        Prefixes shorter than min_length are not tried. If no prefix has enough
+        providers, the shortest one with any is used. Restricted to `within` if
+        given. Returns (prefix, provider_ids), or None if nobody serves the code.
+        """
+        code = normalize_postal_code(postal_code)
+        allowed = set(within) if within is not None else None
+        best = None
+
+        for length in range(len(code), min(min_length, len(code)) - 1, -1):
+            providers = self.prefixes.get(code[:length])
+            if not providers:
+                continue
+            matched = set(providers) if allowed is None else allowed.intersection(providers)
+            if matched:
+                best = (code[:length], matched)
+                if len(matched) >= min_candidates:
+                    break
+
+        return best
+
+
+_index: Optional[PostalPrefixIndex] = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def _get_index() -> PostalPrefixIndex:
+    global _index, _built_at
+
+    interval = getattr(settings, 'POSTAL_INDEX_REBUILD_INTERVAL', 300)
+    if _index is None or time.monotonic() - _built_at >= interval:
+        _index = PostalPrefixIndex.build()
+        _built_at = time.monotonic()
+    return _index
+
+
+def providers_serving(postal_code: str, within: Optional[Iterable[int]] = None,
+                      min_candidates: Optional[int] = None) -> Optional[Set[int]]:
+    """
+    Providers serving the postal code, widened to shorter prefixes if there are too few
+
+    Uses the process-wide index, built on first use and rebuilt every
+    POSTAL_INDEX_REBUILD_INTERVAL seconds; changes made in this process are
+    applied by signals in between. Returns None if nobody serves the code.
+    """
+    if min_candidates is None:
+        min_candidates = getattr(settings, 'POSTAL_PREFIX_MIN_CANDIDATES', 10)
+    min_length = getattr(settings, 'POSTAL_PREFIX_MIN_LENGTH', 3)
+
+    with _lock:
+        match = _get_index().match(postal_code, min_candidates, min_length, within)
+    return match[1] if match else None
+
+
+def update_postal_area(area: ServiceArea):
+    """Apply a saved ServiceArea to the index if it has been built"""
+    with _lock:
+        if _index is not None:
+            _index.set_area(area.pk, area.provider_id, area.postal_code)
+
+
+def remove_postal_area(area_id: int):
+    with _lock:
+        if _index is not None:
+            _index.remove_area(area_id)
+
+
+def mark_postal_index_stale():
+    """Force a rebuild on the next lookup in this process"""
+    global _index
+    with _lock:
+        _index = None
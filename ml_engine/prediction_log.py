@@ -0,0 +1,186 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from .models import MLPrediction
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionLogger:
+    """
+    Write-behind MLPrediction logging
+
+    log() only builds an unsaved MLPrediction and puts it on a bounded in-process
+    queue; a daemon thread drains the queue and writes rows with bulk_create once
+    batch_size records are waiting or flush_interval seconds have passed since the
+    first one. When the queue is full the record is dropped and counted instead of
+    blocking the request.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, max_queue: Optional[int] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.enabled = enabled if enabled is not None else getattr(settings, 'ML_PREDICTION_LOGGING', True)
+        self.batch_size = batch_size or getattr(settings, 'ML_PREDICTION_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or getattr(settings, 'ML_PREDICTION_FLUSH_INTERVAL', 5.0)
+        self._queue = queue.Queue(maxsize=max_queue or getattr(settings, 'ML_PREDICTION_QUEUE_SIZE', 10000))
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def log(self, prediction_type: str, input_data: Dict[str, Any], prediction_result: Any,
+            user_id: Optional[int] = None, confidence: Optional[float] = None,
+            model_version: str = 'v1.0', related_object=None) -> bool:
+        """Queue one prediction record; returns False if logging is off or the record was dropped"""
+        if not self.enabled:
+            return False
+
+        record = MLPrediction(
+            user_id=user_id,
+            prediction_type=prediction_type,
+            input_data=input_data,
+            prediction_result=prediction_result,
+            confidence_score=round(confidence, 4) if confidence is not None else None,
+            model_version=model_version,
+        )
+        if related_object is not None:
+            record.content_type = ContentType.objects.get_for_model(related_object)
+            record.object_id = related_object.pk
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Write everything logged so far; returns False if that did not finish within timeout"""
+        if self._thread is None:
+            batch = self._drain(self.batch_size)
+            while batch:
+                self._write(batch)
+                batch = self._drain(self.batch_size)
+            return True
+
+        # The worker writes its pending batch as soon as it dequeues the marker
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    @contextmanager
+    def paused(self):
+        """
+        Drop records logged inside the block, after flushing earlier ones. Used while a
+        throwaway database is active, since queued rows would reference its objects and
+        be written after it is gone.
+        """
+        self.flush()
+        enabled, self.enabled = self.enabled, False
+        try:
+            yield
+        finally:
+            self.enabled = enabled
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'queued': self._queue.qsize(),
+                'capacity': self._queue.maxsize,
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'batches': self.batches,
+            }
+
+    def _ensure_worker(self):
+        # A forked child inherits the thread object but not the running thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='ml-prediction-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            flushed = None
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    flushed = item
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            # Drop this thread's connection if it has gone stale between flushes
+            close_old_connections()
+            self._write(batch)
+            if flushed is not None:
+                flushed.set()
+
+    def _drain(self, limit: int) -> List[MLPrediction]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[MLPrediction]):
+        if not batch:
+            return
+        with self._write_lock:
+            try:
+                MLPrediction.objects.bulk_create(batch, batch_size=self.batch_size)
+            except Exception:
+                logger.exception(f"Failed to write {len(batch)} ML prediction records")
+                with self._lock:
+                    self.failed += len(batch)
+                return
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+
+
+# Singleton instance
+prediction_logger = PredictionLogger()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Management commands and short-lived processes exit before the worker's next flush.
+    # Process pool workers never get here and flush at the end of each task instead.
+    try:
+        prediction_logger.flush()
+    except Exception:
+        logger.exception("Failed to flush ML prediction records at exit")
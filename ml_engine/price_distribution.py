@@ -0,0 +1,99 @@
+from django.conf import settings
+from typing import Dict, List, Optional, Sequence, Tuple
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+import threading
+import time
+
+from services.models import Service
+
+
+class PriceDistribution:
+    """
+    Sorted active service prices per (category, price_unit)
+
+    Prices are only comparable within the same unit, so each category keeps one
+    sorted list per price_unit. A price's percentile is found by bisection.
+    """
+
+    NEUTRAL_SCORE = 0.5  # No peers to compare against
+
+    def __init__(self, prices: Dict[Tuple[int, str], List[float]]):
+        self.prices = prices
+
+    @classmethod
+    def build(cls) -> 'PriceDistribution':
+        """Load all active prices in one query"""
+        prices = defaultdict(list)
+        for category_id, price_unit, base_price in Service.objects.filter(
+            is_active=True
+        ).order_by('base_price').values_list('category_id', 'price_unit', 'base_price'):
+            prices[(category_id, price_unit)].append(float(base_price))
+        return cls(dict(prices))
+
+    def percentile(self, category_id: int, price_unit: str, price: float) -> Optional[float]:
+        """
+        Percentile (0-1) of price among its peers: 0.0 for the cheapest, 1.0 for the
+        most expensive, tied prices share their mean rank. None with fewer than two peers.
+        """
+        peers = self.prices.get((category_id, price_unit))
+        if not peers or len(peers) < 2:
+            return None
+        price = float(price)
+        # Mean 0-based position of price among equal peers (bisect_right - 1 is the last one)
+        rank = (bisect_left(peers, price) + bisect_right(peers, price) - 1) / 2
+        return min(max(rank / (len(peers) - 1), 0.0), 1.0)
+
+    def price_score(self, category_id: int, price_unit: str, price: float) -> float:
+        """Price competitiveness: 1.0 for the cheapest of its peers, 0.0 for the most expensive"""
+        percentile = self.percentile(category_id, price_unit, price)
+        if percentile is None:
+            return self.NEUTRAL_SCORE
+        return 1.0 - percentile
+
+    def typical_price_score(self, category_id: int, price_unit: str, price: float) -> float:
+        """
+        How typical the price is among its peers: 1.0 in the middle half (25th to 75th
+        percentile), falling linearly to 0.0 at the cheapest and the most expensive.
+        1.0 with fewer than two peers, where the price is the typical one.
+        """
+        percentile = self.percentile(category_id, price_unit, price)
+        if percentile is None:
+            return 1.0
+        return min(4 * min(percentile, 1.0 - percentile), 1.0)
+
+    def quantiles(self, category_id: int, price_unit: str,
+                  points: Sequence[float] = (0.1, 0.25, 0.5, 0.75, 0.9)) -> Dict[float, float]:
+        """Nearest-rank price quantiles for one (category, price_unit)"""
+        peers = self.prices.get((category_id, price_unit))
+        if not peers:
+            return {}
+        return {q: peers[min(int(q * len(peers)), len(peers) - 1)] for q in points}
+
+
+_distribution: Optional[PriceDistribution] = None
+_built_at = 0.0
+_stale = False
+_lock = threading.Lock()
+
+
+def get_price_distribution() -> PriceDistribution:
+    """
+    Process-wide price distribution, rebuilt after a Service change in this
+    process or every PRICE_DISTRIBUTION_REFRESH_INTERVAL seconds
+    """
+    global _distribution, _built_at, _stale
+
+    interval = getattr(settings, 'PRICE_DISTRIBUTION_REFRESH_INTERVAL', 300)
+    with _lock:
+        if _distribution is None or _stale or time.monotonic() - _built_at >= interval:
+            _distribution = PriceDistribution.build()
+            _built_at = time.monotonic()
+            _stale = False
+        return _distribution
+
+
+def mark_price_distribution_stale():
+    """Force a rebuild on the next lookup in this process"""
+    global _stale
+    _stale = True
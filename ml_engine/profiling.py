@@ -0,0 +1,167 @@
+from django.conf import settings
+from django.db import connection
+from typing import Dict, List, Optional
+from bisect import bisect_left
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max"""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last bucket is overflow
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile"""
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'buckets': {
+                (f'le_{bound:g}' if i < len(self.bounds) else 'overflow'): count
+                for i, (bound, count) in enumerate(zip(self.bounds + [None], self.counts))
+            },
+        }
+
+
+class Stage:
+    """Measurements for one stage of one request"""
+
+    def __init__(self, name: str, candidates: Optional[int] = None):
+        self.name = name
+        self.candidates = candidates
+        self.queries = 0
+        self.elapsed_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class RecommendationProfiler:
+    """
+    Per-stage wall time, query count and candidate set size for the recommendation engines
+
+    Stages are recorded into process-wide histograms. When a whole engine call takes
+    longer than RECOMMENDATION_SLOW_LOG_MS, its per-stage breakdown is logged.
+    """
+
+    TIME_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+    QUERY_BOUNDS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+    CANDIDATE_BOUNDS = [0, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000]
+
+    def __init__(self, enabled: bool = True, slow_log_ms: Optional[float] = None):
+        self.enabled = enabled
+        self.slow_log_ms = slow_log_ms
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stages: Dict[str, Dict[str, Histogram]] = {}
+
+    @contextmanager
+    def request(self, name: str, label: str = ''):
+        """Group the stages of one engine call, recorded as '<name>_total', for slow-request logging"""
+        if not self.enabled or getattr(self._local, 'stages', None) is not None:
+            # Disabled, or nested inside another profiled request
+            yield
+            return
+
+        self._local.stages = []
+        total = Stage(f'{name}_total')
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(total):
+                yield
+        finally:
+            stages, self._local.stages = self._local.stages, None
+            total_ms = (time.perf_counter() - start) * 1000
+            self._record(total.name, total_ms, total.queries, None)
+
+            if self.slow_log_ms is not None and total_ms >= self.slow_log_ms:
+                breakdown = ', '.join(
+                    f"{s.name}={s.elapsed_ms:.1f}ms/{s.queries}q" for s in stages
+                )
+                logger.warning(f"Slow {name} {label}: {total_ms:.1f}ms ({breakdown})")
+
+    @contextmanager
+    def stage(self, name: str, candidates: Optional[int] = None):
+        """Measure a stage; set .candidates on the yielded Stage if only known afterwards"""
+        current = Stage(name, candidates)
+        if not self.enabled:
+            yield current
+            return
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(current):
+                yield current
+        finally:
+            current.elapsed_ms = (time.perf_counter() - start) * 1000
+            self._record(name, current.elapsed_ms, current.queries, current.candidates)
+            stages = getattr(self._local, 'stages', None)
+            if stages is not None:
+                stages.append(current)
+
+    def _record(self, name: str, elapsed_ms: float, queries: int, candidates: Optional[int]):
+        with self._lock:
+            histograms = self._stages.get(name)
+            if histograms is None:
+                histograms = self._stages[name] = {
+                    'time_ms': Histogram(self.TIME_BOUNDS_MS),
+                    'queries': Histogram(self.QUERY_BOUNDS),
+                    'candidates': Histogram(self.CANDIDATE_BOUNDS),
+                }
+            histograms['time_ms'].observe(elapsed_ms)
+            histograms['queries'].observe(queries)
+            if candidates is not None:
+                histograms['candidates'].observe(candidates)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                name: {metric: histogram.snapshot() for metric, histogram in histograms.items()}
+                for name, histograms in self._stages.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+
+# Singleton instance
+recommendation_profiler = RecommendationProfiler(
+    enabled=getattr(settings, 'RECOMMENDATION_PROFILING', True),
+    slow_log_ms=getattr(settings, 'RECOMMENDATION_SLOW_LOG_MS', None)
+)
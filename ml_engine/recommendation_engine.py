@@ -1,16 +1,36 @@
-from django.db.models import Avg, Count, Q, F
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, F
 from django.utils import timezone
 from typing import List, Dict, Tuple, Optional
+import heapq
 import logging
 import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import numpy as np
 
 from accounts.models import User, CustomerProfile, ServiceProviderProfile
 from services.models import Service, ServiceCategory
 from reviews.models import Review
 from bookings.models import Booking
+from .feature_store import ProviderFeatureStore
+from .cache import RecommendationCache, recommendation_cache
+from .item_similarity import get_item_similarity_index
+from .geo_index import locate_providers, parse_coordinates
+from .postal_index import providers_serving
+from .price_distribution import PriceDistribution, get_price_distribution
+from .prediction_log import prediction_logger
+from .text_index import get_text_index
+from .profiling import RecommendationProfiler, recommendation_profiler
 
 logger = logging.getLogger(__name__)
 
+# Decimal places of the RecommendationScore score columns
+SCORE_PRECISION = Decimal('0.0001')
+
 
 class SimpleMinMaxScaler:
     """Simple MinMaxScaler implementation"""
@@ -27,16 +47,105 @@ class SimpleMinMaxScaler:
             return [0.5] * len(values)  # All values become 0.5 if no variation
         
         return [(val - min_val) / (max_val - min_val) for val in values]
+    
+    def fit_transform_columns(self, matrix: np.ndarray, columns: List[int]) -> np.ndarray:
+        """Scale the given columns of a 2-D array to 0-1 range in place"""
+        if matrix.shape[0] == 0 or not columns:
+            return matrix
+        
+        block = matrix[:, columns]
+        min_vals = block.min(axis=0)
+        ranges = block.max(axis=0) - min_vals
+        constant = ranges == 0
+        
+        scaled = (block - min_vals) / np.where(constant, 1.0, ranges)
+        scaled[:, constant] = 0.5  # All values become 0.5 if no variation
+        matrix[:, columns] = scaled
+        return matrix
 
 
 class RecommendationEngine:
     """
     Hybrid recommendation engine combining collaborative filtering and content-based filtering
+    
+    With vectorized=True the candidate set is kept as a NumPy index and the component
+    scores form an (n_providers x n_components) matrix that is scaled, weighted and
+    ranked with array operations. When a RecommendationCache is given, results are
+    served from it until a relevant booking, review or provider change invalidates them.
+    With defer_persistence=True, RecommendationScore rows are written by a single
+    background thread so the request never waits on them. Live scoring only upserts
+    rows for location-less requests; with replace_stored=True (the
+    precompute_recommendations command) each (customer, category) set is replaced,
+    dropping providers no longer recommended. With precomputed_max_age set, stored
+    rows written within it that still pass the provider filters are served before
+    falling back to live scoring. collaborative_mode selects user-user ('user')
+    or item-item ('item') collaborative filtering.
     """
     
-    def __init__(self):
+    # Component weights - RATING IS ABSOLUTELY DOMINANT
+    # They sum to 1.0, so final scores stay in 0-1 (distance and price took their share
+    # from the original five components in proportion)
+    WEIGHTS = {
+        'rating': 0.73,        # DOMINANT: 73% of the total weight
+        'collaborative': 0.09, # Minimal impact
+        'content_based': 0.05, # Minimal impact
+        'popularity': 0.03,   # Minimal impact
+        'availability': 0.02, # Minimal impact
+        'distance': 0.04,     # Only non-zero when a location is given
+        'price': 0.04,        # Price competitiveness within category and price unit
+        'sentiment': 0.0      # Opt-in via RECOMMENDATION_SENTIMENT_WEIGHT
+    }
+    
+    # Column order of the vectorized component matrix
+    COMPONENTS = ('rating', 'collaborative', 'content_based', 'popularity', 'availability', 'distance', 'price',
+                  'sentiment')
+    
+    # Components that are min-max scaled column-wise (rating keeps its absolute hierarchy,
+    # collaborative scores arrive already scaled, distance, price and sentiment are absolute 0-1 scores)
+    SCALED_COMPONENTS = ('content_based', 'popularity', 'availability')
+    
+    # RecommendationScore columns written for every recommended provider
+    PERSISTED_FIELDS = (
+        'compatibility_score', 'distance_score', 'rating_score', 'price_score',
+        'availability_score', 'overall_score', 'factors_used'
+    )
+    
+    COLLABORATIVE_MODES = ('user', 'item')
+    
+    def __init__(self, vectorized: bool = False, cache: Optional[RecommendationCache] = None,
+                 defer_persistence: bool = False, precomputed_max_age: Optional[int] = None,
+                 replace_stored: bool = False, collaborative_mode: str = 'user',
+                 profiler: Optional[RecommendationProfiler] = None,
+                 sentiment_weight: Optional[float] = None):
+        if collaborative_mode not in self.COLLABORATIVE_MODES:
+            raise ValueError(f"Unknown collaborative_mode: {collaborative_mode}")
+        
+        # Review sentiment is scored offline (score_review_sentiment); it only
+        # contributes to rankings when given a weight, taken from the other
+        # components in proportion so the weights still sum to 1.0
+        if sentiment_weight is None:
+            sentiment_weight = getattr(settings, 'RECOMMENDATION_SENTIMENT_WEIGHT', 0.0)
+        if not 0.0 <= sentiment_weight < 1.0:
+            raise ValueError(f"sentiment_weight must be in [0, 1): {sentiment_weight}")
+        if sentiment_weight:
+            self.WEIGHTS = {
+                **{name: weight * (1.0 - sentiment_weight) for name, weight in self.WEIGHTS.items()},
+                'sentiment': sentiment_weight
+            }
+        
         # Simple min-max scaler implementation
         self.scaler = SimpleMinMaxScaler()
+        self.vectorized = vectorized
+        self.collaborative_mode = collaborative_mode
+        self.profiler = profiler or recommendation_profiler
+        self.cache = cache
+        self.precomputed_max_age = precomputed_max_age
+        self.replace_stored = replace_stored
+        
+        # One worker keeps writes for the same customer in order
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='recommendation-writer'
+        ) if defer_persistence else None
         
     def get_provider_recommendations(
         self, 
@@ -51,71 +160,236 @@ class RecommendationEngine:
         Args:
             customer: Customer user object
             service_category: Optional service category filter
-            location: Optional location filter
+            location: Optional "lat,lng" or service-area postal code / name; limits
+                candidates to providers who can reach it and enables distance scoring
             max_recommendations: Maximum number of recommendations
             
         Returns:
             List of recommendation dictionaries with scores and details
         """
+        with self.profiler.request('provider_recommendations', f'for customer {customer.id}'):
+            return self._get_provider_recommendations(
+                customer, service_category, location, max_recommendations
+            )
+    
+    def _get_provider_recommendations(self, customer: User, service_category: Optional[str],
+                                      location: Optional[str], max_recommendations: int) -> List[Dict]:
+        profiler = self.profiler
+        
+        if self.cache is not None:
+            with profiler.stage('cache_lookup'):
+                cached = self.cache.get(customer.id, service_category, location, max_recommendations)
+            if cached is not None:
+                return cached
+        
         try:
-            # Get base candidate providers
-            candidates = self._get_candidate_providers(service_category, location)
+            # Serve precomputed rows when they are fresh (they carry no location)
+            if self.precomputed_max_age is not None and not location:
+                with profiler.stage('precomputed'):
+                    precomputed = self.get_precomputed_recommendations(
+                        customer, service_category, max_recommendations
+                    )
+                if precomputed is not None:
+                    if self.cache is not None:
+                        self.cache.set(customer.id, service_category, location, max_recommendations,
+                                       precomputed)
+                    return precomputed
+            
+            # Get base candidate providers, limited to those who can reach the location
+            with profiler.stage('candidates') as stage:
+                nearby = locate_providers(location) if location else None
+                candidates = self._get_candidate_providers(service_category, location, nearby)
+                stage.candidates = len(candidates)
             
             if not candidates:
                 return []
             
-            # Calculate different recommendation scores
-            collaborative_scores = self._collaborative_filtering_scores(customer, candidates)
-            content_scores = self._content_based_scores(customer, candidates, service_category)
-            rating_scores = self._rating_based_scores(candidates)  # NEW: Dedicated rating score
-            popularity_scores = self._popularity_scores(candidates)
-            availability_scores = self._availability_scores(candidates)
-            
-            # Combine scores with weights
-            final_scores = self._combine_scores(
-                collaborative_scores,
-                content_scores,
-                rating_scores,  # NEW: Include rating scores
-                popularity_scores,
-                availability_scores
-            )
+            n = len(candidates)
             
-            # Sort by final score and create recommendation list
-            recommendations = []
-            for provider_id, score_data in sorted(final_scores.items(), 
-                                                key=lambda x: x[1]['final_score'], 
-                                                reverse=True)[:max_recommendations]:
+            # Load provider features once and share them across scorers
+            with profiler.stage('features', n):
+                features = ProviderFeatureStore.build(candidates)
+            
+            if self.vectorized:
+                # Includes the collaborative stage, which is also recorded on its own
+                with profiler.stage('vectorized_scoring', n):
+                    ranked = self._rank_vectorized(
+                        customer, candidates, service_category, features, max_recommendations, nearby
+                    )
+            else:
+                # Calculate different recommendation scores
+                with profiler.stage('collaborative', n):
+                    collaborative_scores = self._collaborative_filtering_scores(customer, candidates)
+                with profiler.stage('content_based', n):
+                    content_scores = self._content_based_scores(customer, candidates, service_category, features)
+                with profiler.stage('rating', n):
+                    rating_scores = self._rating_based_scores(candidates, features)  # NEW: Dedicated rating score
+                with profiler.stage('popularity', n):
+                    popularity_scores = self._popularity_scores(candidates, features)
+                with profiler.stage('availability', n):
+                    availability_scores = self._availability_scores(candidates, features)
+                with profiler.stage('distance', n):
+                    distance_scores = self._distance_scores(candidates, nearby)
+                with profiler.stage('price', n):
+                    price_scores = self._price_scores(candidates, service_category, features)
+                with profiler.stage('sentiment', n):
+                    sentiment_scores = self._sentiment_scores(candidates, features)
                 
-                provider = User.objects.get(id=provider_id)
-                recommendations.append({
-                    'provider': provider,
-                    'provider_profile': provider.provider_profile,
-                    'final_score': round(score_data['final_score'], 4),
-                    'score_breakdown': {
-                        'rating': round(score_data['rating'], 4),           # NEW: Rating score
-                        'collaborative': round(score_data['collaborative'], 4),
-                        'content_based': round(score_data['content_based'], 4),
-                        'popularity': round(score_data['popularity'], 4),
-                        'availability': round(score_data['availability'], 4)
-                    },
-                    'services': list(provider.services_offered.filter(
-                        is_active=True,
-                        category__name=service_category if service_category else None
-                    ).values('id', 'title', 'base_price', 'category__name'))
-                })
-            
-            # Save recommendations to database
-            self._save_recommendations(customer, recommendations, service_category)
+                with profiler.stage('combine', n):
+                    # Combine scores with weights
+                    final_scores = self._combine_scores(
+                        collaborative_scores,
+                        content_scores,
+                        rating_scores,  # NEW: Include rating scores
+                        popularity_scores,
+                        availability_scores,
+                        distance_scores,
+                        price_scores,
+                        sentiment_scores
+                    )
+                    
+                    # Sort by final score
+                    ranked = sorted(final_scores.items(),
+                                    key=lambda x: x[1]['final_score'],
+                                    reverse=True)[:max_recommendations]
+            
+            # Create recommendation list
+            with profiler.stage('hydration', len(ranked)):
+                recommendations = self._hydrate(ranked, service_category)
+            
+            # Save recommendations to database; stored rows are served to location-less
+            # reads, so location-scoped results are not written over them
+            with profiler.stage('save', len(recommendations)):
+                if not location:
+                    self._save_recommendations(customer, recommendations, service_category)
+                self._log_prediction(customer, service_category, location, max_recommendations,
+                                     n, recommendations)
+            
+            if self.cache is not None:
+                self.cache.set(customer.id, service_category, location, max_recommendations,
+                               recommendations)
             
             return recommendations
             
         except Exception as e:
-            logger.error(f"Error generating recommendations for customer {customer.id}: {str(e)}")
+            logger.exception(f"Error generating recommendations for customer {customer.id}: {str(e)}")
             return []
     
-    def _get_candidate_providers(self, service_category: Optional[str], 
-                               location: Optional[str]) -> List[int]:
-        """Get list of candidate provider IDs based on filters"""
+    def get_popular_providers(
+        self,
+        service_category: Optional[str] = None,
+        location: Optional[str] = None,
+        max_recommendations: int = 10
+    ) -> List[Dict]:
+        """
+        Non-personalized fallback: the best rated eligible providers
+        
+        Uses the same candidate filters as live scoring but only stored profile
+        columns, so it costs a few queries regardless of engine settings.
+        """
+        nearby = locate_providers(location) if location else None
+        candidates = self._get_candidate_providers(service_category, location, nearby)
+        if not candidates:
+            return []
+        
+        profiles = ServiceProviderProfile.objects.filter(user_id__in=candidates).order_by(
+            '-average_rating', '-total_reviews', '-completed_jobs', 'user_id'
+        ).values_list('user_id', 'average_rating', 'total_reviews')[:max_recommendations]
+        
+        ranked = []
+        for provider_id, average_rating, total_reviews in profiles:
+            score_data = dict.fromkeys(self.COMPONENTS, 0.0)
+            score_data['rating'] = min(float(average_rating) / 5.0 + min(total_reviews / 20.0, 0.1), 1.0)
+            score_data['final_score'] = score_data['rating'] * self.WEIGHTS['rating']
+            ranked.append((provider_id, score_data))
+        
+        return self._hydrate(ranked, service_category)
+    
+    def get_precomputed_recommendations(
+        self,
+        customer: User,
+        service_category: Optional[str] = None,
+        max_recommendations: int = 10
+    ) -> Optional[List[Dict]]:
+        """
+        Load stored RecommendationScore rows newer than precomputed_max_age
+        
+        Rows are checked against the live candidate filters, so providers that have
+        since been deactivated, unverified or made unavailable are never served.
+        Returns None on a miss, including when fewer fresh eligible rows exist than
+        were requested, so the caller can fall back to live scoring.
+        """
+        from ml_engine.models import RecommendationScore
+        
+        max_age = self.precomputed_max_age if self.precomputed_max_age is not None else 0
+        rows = list(RecommendationScore.objects.filter(
+            customer=customer,
+            service_category=service_category or "",
+            is_active=True,
+            calculated_at__gte=timezone.now() - timezone.timedelta(seconds=max_age),
+            provider_id__in=self._eligible_providers(service_category).values('id')
+        ).select_related('provider__provider_profile').order_by('-overall_score')[:max_recommendations])
+        
+        if not rows or len(rows) < max_recommendations:
+            return None
+        
+        services_by_provider = self._load_services([row.provider_id for row in rows], service_category)
+        
+        return [
+            {
+                'provider': row.provider,
+                'provider_profile': row.provider.provider_profile,
+                'final_score': float(row.overall_score),
+                'score_breakdown': row.factors_used,
+                'services': services_by_provider[row.provider_id]
+            }
+            for row in rows
+        ]
+    
+    def _hydrate(self, ranked: List[Tuple[int, Dict]],
+                 service_category: Optional[str]) -> List[Dict]:
+        """Build recommendation dicts for ranked (provider_id, score_data) pairs in two queries"""
+        providers = User.objects.select_related('provider_profile').in_bulk(
+            [provider_id for provider_id, _ in ranked]
+        )
+        services_by_provider = self._load_services(list(providers), service_category)
+        
+        recommendations = []
+        for provider_id, score_data in ranked:
+            provider = providers[provider_id]
+            recommendations.append({
+                'provider': provider,
+                'provider_profile': provider.provider_profile,
+                'final_score': round(score_data['final_score'], 4),
+                'score_breakdown': {
+                    'rating': round(score_data['rating'], 4),           # NEW: Rating score
+                    'collaborative': round(score_data['collaborative'], 4),
+                    'content_based': round(score_data['content_based'], 4),
+                    'popularity': round(score_data['popularity'], 4),
+                    'availability': round(score_data['availability'], 4),
+                    'distance': round(score_data['distance'], 4),
+                    'price': round(score_data['price'], 4),
+                    'sentiment': round(score_data['sentiment'], 4)
+                },
+                'services': services_by_provider[provider_id]
+            })
+        
+        return recommendations
+    
+    def _load_services(self, provider_ids: List[int],
+                       service_category: Optional[str]) -> Dict[int, List[Dict]]:
+        """Active services per provider in one query, limited to the category if one is given"""
+        services = Service.objects.filter(provider_id__in=provider_ids, is_active=True)
+        if service_category:
+            services = services.filter(category__name=service_category)
+        
+        services_by_provider = defaultdict(list)
+        for service in services.values('id', 'title', 'base_price', 'category__name', 'provider_id'):
+            services_by_provider[service.pop('provider_id')].append(service)
+        return services_by_provider
+    
+    def _eligible_providers(self, service_category: Optional[str]):
+        """Verified, available, active providers, offering the category if one is given"""
         queryset = User.objects.filter(
             role='provider',
             provider_profile__verification_status='verified',
@@ -129,77 +403,91 @@ class RecommendationEngine:
                 services_offered__is_active=True
             )
         
-        return list(queryset.distinct().values_list('id', flat=True))
+        return queryset
+    
+    def _get_candidate_providers(self, service_category: Optional[str], location: Optional[str] = None,
+                               nearby_providers: Optional[Dict[int, Tuple[float, float]]] = None) -> List[int]:
+        """
+        Get list of candidate provider IDs based on filters
+        
+        A location limits candidates to nearby_providers (those within reach of its
+        coordinates) together with the providers whose service-area postal codes
+        match it, so providers serving a postal code from areas without
+        coordinates are kept even when other areas let the code resolve to a point.
+        """
+        candidates = list(self._eligible_providers(service_category).distinct().values_list('id', flat=True))
+        
+        if not location:
+            return candidates
+        
+        reachable = set(nearby_providers) if nearby_providers is not None else set()
+        serving = None
+        if parse_coordinates(location) is None:
+            # Widen postal prefixes only as far as the geo hits leave candidates missing
+            eligible_nearby = reachable.intersection(candidates)
+            serving = providers_serving(
+                location, within=candidates,
+                min_candidates=max(getattr(settings, 'POSTAL_PREFIX_MIN_CANDIDATES', 10) - len(eligible_nearby), 1)
+            )
+        
+        if nearby_providers is None and serving is None:
+            # Unresolvable location: nothing to filter by
+            return candidates
+        
+        reachable |= serving or set()
+        return [pid for pid in candidates if pid in reachable]
     
     def _collaborative_filtering_scores(self, customer: User, 
                                       candidate_providers: List[int]) -> Dict[int, float]:
         """
         Calculate collaborative filtering scores based on similar users' preferences
+        
+        All completed bookings are loaded as (customer, provider, category) triples
+        in a single query, so the query count does not grow with the number of customers.
         """
+        if self.collaborative_mode == 'item':
+            return self._item_based_scores(customer, candidate_providers)
+        
         scores = {}
         
         try:
-            # Get customer's booking history
-            customer_bookings = Booking.objects.filter(
-                customer=customer,
-                status='completed'
-            ).select_related('provider', 'service')
+            customer_providers, customer_categories, other_providers, other_categories = \
+                self._load_booking_sets(customer)
             
-            if not customer_bookings:
+            if not customer_providers:
                 # New user - return zero scores
                 return {pid: 0.0 for pid in candidate_providers}
             
             # Find similar customers based on booking patterns
-            customer_providers = set(b.provider.id for b in customer_bookings)
-            customer_categories = set(b.service.category.name for b in customer_bookings)
-            
-            # Calculate similarity scores for other customers
-            similar_customers = []
-            for other_customer in User.objects.filter(role='customer').exclude(id=customer.id):
-                other_bookings = Booking.objects.filter(
-                    customer=other_customer,
-                    status='completed'
-                ).select_related('provider', 'service')
-                
-                if not other_bookings:
-                    continue
-                
-                other_providers = set(b.provider.id for b in other_bookings)
-                other_categories = set(b.service.category.name for b in other_bookings)
-                
-                # Jaccard similarity
-                provider_similarity = len(customer_providers & other_providers) / len(customer_providers | other_providers) if customer_providers | other_providers else 0
-                category_similarity = len(customer_categories & other_categories) / len(customer_categories | other_categories) if customer_categories | other_categories else 0
-                
-                overall_similarity = (provider_similarity * 0.7 + category_similarity * 0.3)
-                
-                if overall_similarity > 0:
-                    similar_customers.append((other_customer, overall_similarity))
+            similar_customers = self._jaccard_similarities(
+                customer_providers, customer_categories,
+                other_providers, other_categories
+            )
             
             # Sort by similarity and take top 20
             similar_customers.sort(key=lambda x: x[1], reverse=True)
             similar_customers = similar_customers[:20]
             
+            # Latest review rating per (similar customer, provider) pair
+            reviews = {}
+            for customer_id, provider_id, overall_rating in Review.objects.filter(
+                customer_id__in=[cid for cid, _ in similar_customers],
+                provider_id__in=candidate_providers
+            ).order_by('-created_at').values_list('customer_id', 'provider_id', 'overall_rating'):
+                reviews.setdefault((customer_id, provider_id), overall_rating)
+            
             # Calculate scores for candidate providers
             for provider_id in candidate_providers:
                 score = 0.0
                 total_weight = 0.0
                 
-                for similar_customer, similarity_weight in similar_customers:
+                for similar_customer_id, similarity_weight in similar_customers:
                     # Check if similar customer booked this provider
-                    if Booking.objects.filter(
-                        customer=similar_customer,
-                        provider_id=provider_id,
-                        status='completed'
-                    ).exists():
-                        # Get rating if available
-                        review = Review.objects.filter(
-                            customer=similar_customer,
-                            provider_id=provider_id
-                        ).first()
+                    if provider_id in other_providers[similar_customer_id]:
+                        overall_rating = reviews.get((similar_customer_id, provider_id))
                         
-                        if review:
-                            rating_score = review.overall_rating / 5.0  # Normalize to 0-1
+                        if overall_rating is not None:
+                            rating_score = overall_rating / 5.0  # Normalize to 0-1
                         else:
                             rating_score = 0.7  # Default positive assumption
                         
@@ -221,62 +509,132 @@ class RecommendationEngine:
         
         return scores
     
+    def _item_based_scores(self, customer: User,
+                           candidate_providers: List[int]) -> Dict[int, float]:
+        """
+        Calculate collaborative filtering scores from the item-item similarity index
+        
+        Only the providers the customer has used are looked up, so the cost does not
+        depend on the number of other customers.
+        """
+        try:
+            index = get_item_similarity_index()
+            
+            if not index.has_history(customer.id):
+                # New user - return zero scores
+                return {pid: 0.0 for pid in candidate_providers}
+            
+            scores = index.score(customer.id, candidate_providers)
+            
+            # Apply MinMax scaling
+            if scores:
+                score_values = list(scores.values())
+                scaled_scores = self.scaler.fit_transform(score_values)
+                scores = dict(zip(scores.keys(), scaled_scores))
+            
+        except Exception as e:
+            logger.error(f"Error in item-based collaborative filtering: {str(e)}")
+            scores = {pid: 0.0 for pid in candidate_providers}
+        
+        return scores
+    
+    def _load_booking_sets(self, customer: User) -> Tuple[set, set, Dict[int, set], Dict[int, set]]:
+        """
+        Load completed bookings as sparse customer->provider and customer->category sets
+        
+        Returns the target customer's provider and category sets, followed by the
+        sets of every other customer (role 'customer') with completed bookings.
+        """
+        customer_providers = set()
+        customer_categories = set()
+        other_providers = defaultdict(set)
+        other_categories = defaultdict(set)
+        
+        triples = Booking.objects.filter(
+            Q(customer=customer) | Q(customer__role='customer'),
+            status='completed'
+        ).order_by().values_list('customer_id', 'provider_id', 'service__category__name')
+        
+        for customer_id, provider_id, category_name in triples:
+            if customer_id == customer.id:
+                customer_providers.add(provider_id)
+                customer_categories.add(category_name)
+            else:
+                other_providers[customer_id].add(provider_id)
+                other_categories[customer_id].add(category_name)
+        
+        return customer_providers, customer_categories, other_providers, other_categories
+    
+    def _jaccard_similarities(self, customer_providers: set, customer_categories: set,
+                              other_providers: Dict[int, set],
+                              other_categories: Dict[int, set]) -> List[Tuple[int, float]]:
+        """
+        Compute Jaccard similarities against all other customers in one pass
+        
+        Works purely on the preloaded sets, so no queries are issued.
+        Returns (customer_id, similarity) pairs in customer id order.
+        """
+        similarities = []
+        for customer_id in sorted(other_providers):
+            providers = other_providers[customer_id]
+            categories = other_categories[customer_id]
+            
+            provider_union = len(customer_providers | providers)
+            category_union = len(customer_categories | categories)
+            
+            # Jaccard similarity
+            provider_similarity = len(customer_providers & providers) / provider_union if provider_union else 0
+            category_similarity = len(customer_categories & categories) / category_union if category_union else 0
+            
+            overall_similarity = (provider_similarity * 0.7 + category_similarity * 0.3)
+            
+            if overall_similarity > 0:
+                similarities.append((customer_id, overall_similarity))
+        
+        return similarities
+    
     def _content_based_scores(self, customer: User, candidate_providers: List[int],
-                            service_category: Optional[str]) -> Dict[int, float]:
+                            service_category: Optional[str],
+                            features: Optional[ProviderFeatureStore] = None) -> Dict[int, float]:
         """
         Calculate content-based scores based on provider attributes and customer preferences
         """
         scores = {}
         
         try:
-            # Get customer profile
-            customer_profile = getattr(customer, 'customer_profile', None)
-            customer_preferences = []
+            if features is None:
+                features = ProviderFeatureStore.build(candidate_providers)
             
-            if customer_profile and customer_profile.preferred_services:
-                customer_preferences = [pref.strip().lower() 
-                                      for pref in customer_profile.preferred_services.split(',')]
-            
-            # Get customer's location
-            customer_location = customer.address if customer.address else ""
+            # Preference text similarity for all candidates in one sparse mat-vec
+            text_scores = self._preference_text_scores(customer, candidate_providers)
             
             for provider_id in candidate_providers:
-                provider = User.objects.get(id=provider_id)
-                provider_profile = provider.provider_profile
+                provider_features = features[provider_id]
                 
                 score = 0.0
                 
                 # 1. Service category match
                 if service_category:
-                    category_match = provider.services_offered.filter(
-                        category__name=service_category,
-                        is_active=True
-                    ).exists()
+                    category_match = service_category in provider_features.active_categories
                     score += 0.3 if category_match else 0.0
                 
                 # 2. Provider rating
-                if provider_profile.average_rating > 0:
-                    rating_score = min(float(provider_profile.average_rating) / 5.0, 1.0)
+                if provider_features.average_rating > 0:
+                    rating_score = min(provider_features.average_rating / 5.0, 1.0)
                     score += rating_score * 0.25
                 
                 # 3. Experience
-                experience_score = min(float(provider_profile.years_of_experience) / 10.0, 1.0)
+                experience_score = min(float(provider_features.years_of_experience) / 10.0, 1.0)
                 score += experience_score * 0.15
                 
                 # 4. Completion rate
-                if provider_profile.completed_jobs > 0:
-                    completion_score = min(float(provider_profile.completed_jobs) / 50.0, 1.0)
+                if provider_features.completed_jobs > 0:
+                    completion_score = min(float(provider_features.completed_jobs) / 50.0, 1.0)
                     score += completion_score * 0.15
                 
-                # 5. Text similarity (description matching)
-                provider_text = f"{provider_profile.description} {' '.join([service.title for service in provider.services_offered.all()])}".lower()
-                
-                if customer_preferences:
-                    # Simple keyword matching
-                    preference_matches = sum(1 for pref in customer_preferences 
-                                          if pref in provider_text)
-                    text_score = min(preference_matches / len(customer_preferences), 1.0)
-                    score += text_score * 0.15
+                # 5. Text similarity (TF-IDF over description and service titles)
+                if text_scores is not None:
+                    score += text_scores[provider_id] * 0.15
                 
                 scores[provider_id] = min(score, 1.0)
             
@@ -292,27 +650,41 @@ class RecommendationEngine:
         
         return scores
     
-    def _rating_based_scores(self, candidate_providers: List[int]) -> Dict[int, float]:
+    def _preference_text_scores(self, customer: User,
+                                candidate_providers: List[int]) -> Optional[Dict[int, float]]:
+        """
+        Cosine similarity between the customer's preferred services and each candidate's
+        description and service titles, or None without preferences
+        """
+        customer_profile = getattr(customer, 'customer_profile', None)
+        if not customer_profile or not customer_profile.preferred_services:
+            return None
+        return get_text_index().score(customer_profile.preferred_services, candidate_providers)
+    
+    def _rating_based_scores(self, candidate_providers: List[int],
+                             features: Optional[ProviderFeatureStore] = None) -> Dict[int, float]:
         """
         Calculate scores based purely on provider ratings (highest rated first)
         """
         scores = {}
         
         try:
+            if features is None:
+                features = ProviderFeatureStore.build(candidate_providers)
+            
             for provider_id in candidate_providers:
-                provider = User.objects.get(id=provider_id)
-                provider_profile = provider.provider_profile
+                provider_features = features[provider_id]
                 
                 # Base score on average rating (0-5 scale)
-                if provider_profile.average_rating > 0:
+                if provider_features.average_rating > 0:
                     # Direct rating score without capping at 1.0
                     # 5.0/5 = 1.0, 4.0/5 = 0.8, 3.0/5 = 0.6, etc.
-                    rating_score = float(provider_profile.average_rating) / 5.0
+                    rating_score = provider_features.average_rating / 5.0
                 else:
                     rating_score = 0.0  # Zero rating for unrated providers
                 
                 # Small bonus for review count (confidence)
-                review_bonus = min(float(provider_profile.total_reviews) / 20.0, 0.1)  # Max 0.1 bonus
+                review_bonus = min(float(provider_features.total_reviews) / 20.0, 0.1)  # Max 0.1 bonus
                 
                 # Final rating score - preserve rating differences
                 final_score = min(rating_score + review_bonus, 1.0)
@@ -326,25 +698,25 @@ class RecommendationEngine:
         
         return scores
     
-    def _popularity_scores(self, candidate_providers: List[int]) -> Dict[int, float]:
+    def _popularity_scores(self, candidate_providers: List[int],
+                           features: Optional[ProviderFeatureStore] = None) -> Dict[int, float]:
         """
         Calculate popularity scores based on booking counts and reviews
         """
         scores = {}
         
         try:
+            if features is None:
+                features = ProviderFeatureStore.build(candidate_providers)
+            
             for provider_id in candidate_providers:
-                provider = User.objects.get(id=provider_id)
+                provider_features = features[provider_id]
                 
                 # Booking count (last 30 days)
-                recent_bookings = Booking.objects.filter(
-                    provider=provider,
-                    status='completed',
-                    created_at__gte=timezone.now() - timezone.timedelta(days=30)
-                ).count()
+                recent_bookings = provider_features.recent_completed_bookings
                 
                 # Review count
-                review_count = Review.objects.filter(provider=provider).count()
+                review_count = provider_features.review_count
                 
                 # Combined popularity score
                 booking_score = min(recent_bookings / 20.0, 1.0)  # Normalize to 0-1
@@ -364,25 +736,27 @@ class RecommendationEngine:
         
         return scores
     
-    def _availability_scores(self, candidate_providers: List[int]) -> Dict[int, float]:
+    def _availability_scores(self, candidate_providers: List[int],
+                             features: Optional[ProviderFeatureStore] = None) -> Dict[int, float]:
         """
         Calculate availability scores based on provider availability patterns
         """
         scores = {}
         
         try:
+            if features is None:
+                features = ProviderFeatureStore.build(candidate_providers)
+            
             for provider_id in candidate_providers:
-                provider = User.objects.get(id=provider_id)
+                provider_features = features[provider_id]
                 
                 # Check if provider is marked as available
-                if not provider.provider_profile.is_available:
+                if not provider_features.is_available:
                     scores[provider_id] = 0.0
                     continue
                 
                 # Count available time slots
-                available_slots = provider.availability_slots.filter(
-                    is_available=True
-                ).count()
+                available_slots = provider_features.available_slots
                 
                 # Maximum possible slots (7 days * typical 8 working hours)
                 max_slots = 56
@@ -399,24 +773,89 @@ class RecommendationEngine:
         except Exception as e:
             logger.error(f"Error in availability scoring: {str(e)}")
             scores = {pid: 0.5 for pid in candidate_providers}  # Default neutral score
-        
+
         return scores
-    
+
+    def _distance_scores(self, candidate_providers: List[int],
+                         nearby_providers: Optional[Dict[int, Tuple[float, float]]]) -> Dict[int, float]:
+        """
+        Calculate distance scores relative to each provider's service radius
+
+        1.0 at the provider's nearest service area, falling to 0.0 at the edge of
+        its service radius. All zero when no location was given.
+        """
+        if nearby_providers is None:
+            return {pid: 0.0 for pid in candidate_providers}
+
+        scores = {}
+        for provider_id in candidate_providers:
+            distance_km, radius_km = nearby_providers.get(provider_id, (0.0, 0.0))
+            scores[provider_id] = max(1.0 - distance_km / radius_km, 0.0) if radius_km > 0 else 0.0
+
+        return scores
+
+    def _price_scores(self, candidate_providers: List[int], service_category: Optional[str],
+                      features: Optional[ProviderFeatureStore] = None) -> Dict[int, float]:
+        """
+        Calculate price competitiveness from the per-category price distribution
+
+        Mean price score of the provider's active services (in the requested
+        category, if any); neutral for providers without such services.
+        """
+        try:
+            if features is None:
+                features = ProviderFeatureStore.build(candidate_providers)
+            distribution = get_price_distribution()
+
+            scores = {}
+            for provider_id in candidate_providers:
+                service_scores = [
+                    distribution.price_score(category_id, price_unit, base_price)
+                    for category_id, category_name, price_unit, base_price in features[provider_id].active_services
+                    if not service_category or category_name == service_category
+                ]
+                scores[provider_id] = (
+                    sum(service_scores) / len(service_scores) if service_scores
+                    else PriceDistribution.NEUTRAL_SCORE
+                )
+
+        except Exception as e:
+            logger.error(f"Error in price scoring: {str(e)}")
+            scores = {pid: PriceDistribution.NEUTRAL_SCORE for pid in candidate_providers}
+
+        return scores
+
+    def _sentiment_scores(self, candidate_providers: List[int],
+                          features: Optional[ProviderFeatureStore] = None) -> Dict[int, float]:
+        """
+        Calculate review sentiment scores from stored Review.sentiment_score values
+
+        Maps the provider's mean sentiment from [-1, 1] to [0, 1]; neutral for
+        providers whose reviews have not been scored yet. Nothing is analyzed here.
+        """
+        if features is None:
+            features = ProviderFeatureStore.build(candidate_providers)
+
+        scores = {}
+        for provider_id in candidate_providers:
+            sentiment = features[provider_id].average_sentiment
+            scores[provider_id] = (sentiment + 1.0) / 2.0 if sentiment is not None else 0.5
+
+        return scores
+
     def _combine_scores(self, collaborative_scores: Dict, content_scores: Dict,
-                       rating_scores: Dict, popularity_scores: Dict, availability_scores: Dict) -> Dict[int, Dict]:
+                       rating_scores: Dict, popularity_scores: Dict, availability_scores: Dict,
+                       distance_scores: Optional[Dict] = None,
+                       price_scores: Optional[Dict] = None,
+                       sentiment_scores: Optional[Dict] = None) -> Dict[int, Dict]:
         """
         Combine different scoring methods with weights - RATING PRIORITY
         """
         combined = {}
-        
-        # Updated weights - RATING IS ABSOLUTELY DOMINANT
-        weights = {
-            'rating': 0.80,        # DOMINANT: 80% weight for ratings
-            'collaborative': 0.10, # Minimal impact
-            'content_based': 0.05, # Minimal impact
-            'popularity': 0.03,   # Minimal impact
-            'availability': 0.02  # Minimal impact
-        }
+        weights = self.WEIGHTS
+        distance_scores = distance_scores or {}
+        price_scores = price_scores or {}
+        sentiment_scores = sentiment_scores or {}
         
         for provider_id in collaborative_scores.keys():
             combined[provider_id] = {
@@ -424,136 +863,420 @@ class RecommendationEngine:
                 'content_based': content_scores.get(provider_id, 0.0),
                 'rating': rating_scores.get(provider_id, 0.0),  # NEW: Rating score
                 'popularity': popularity_scores.get(provider_id, 0.0),
-                'availability': availability_scores.get(provider_id, 0.0)
+                'availability': availability_scores.get(provider_id, 0.0),
+                'distance': distance_scores.get(provider_id, 0.0),
+                'price': price_scores.get(provider_id, PriceDistribution.NEUTRAL_SCORE),
+                'sentiment': sentiment_scores.get(provider_id, 0.5)
             }
             
             # Calculate weighted final score with RATING ABSOLUTE DOMINANCE
             final_score = (
-                combined[provider_id]['rating'] * weights['rating'] +           # 80% weight - ABSOLUTE DOMINANCE
-                combined[provider_id]['collaborative'] * weights['collaborative'] + # 10% weight
+                combined[provider_id]['rating'] * weights['rating'] +           # 73% weight - ABSOLUTE DOMINANCE
+                combined[provider_id]['collaborative'] * weights['collaborative'] + # 9% weight
                 combined[provider_id]['content_based'] * weights['content_based'] + # 5% weight
                 combined[provider_id]['popularity'] * weights['popularity'] +       # 3% weight
-                combined[provider_id]['availability'] * weights['availability']    # 2% weight
+                combined[provider_id]['availability'] * weights['availability'] +   # 2% weight
+                combined[provider_id]['distance'] * weights['distance'] +           # 4% weight with a location
+                combined[provider_id]['price'] * weights['price'] +                 # 4% weight
+                combined[provider_id]['sentiment'] * weights['sentiment']           # Off unless configured
             )
             
             combined[provider_id]['final_score'] = final_score
         
         return combined
     
+    def _rank_vectorized(self, customer: User, candidate_providers: List[int],
+                         service_category: Optional[str], features: ProviderFeatureStore,
+                         max_recommendations: int,
+                         nearby_providers: Optional[Dict[int, Tuple[float, float]]] = None) -> List[Tuple[int, Dict]]:
+        """
+        Score, combine and rank candidates with array operations
+        
+        Returns the same (provider_id, score_data) pairs as sorting the output
+        of _combine_scores, limited to the top max_recommendations.
+        """
+        provider_ids = np.asarray(candidate_providers)
+        matrix = self._component_matrix(customer, candidate_providers, service_category, features,
+                                        nearby_providers)
+        
+        self.scaler.fit_transform_columns(
+            matrix, [self.COMPONENTS.index(name) for name in self.SCALED_COMPONENTS]
+        )
+        weights = np.array([self.WEIGHTS[name] for name in self.COMPONENTS])
+        final_scores = matrix @ weights
+        
+        ranked = []
+        for index in self._top_k(final_scores, max_recommendations):
+            score_data = dict(zip(self.COMPONENTS, matrix[index].tolist()))
+            score_data['final_score'] = float(final_scores[index])
+            ranked.append((int(provider_ids[index]), score_data))
+        
+        return ranked
+    
+    def _component_matrix(self, customer: User, candidate_providers: List[int],
+                          service_category: Optional[str],
+                          features: ProviderFeatureStore,
+                          nearby_providers: Optional[Dict[int, Tuple[float, float]]] = None) -> np.ndarray:
+        """Build the unscaled (n_providers x n_components) score matrix"""
+        rows = [features[provider_id] for provider_id in candidate_providers]
+        n = len(rows)
+        
+        def column(values, dtype=float):
+            return np.fromiter(values, dtype=dtype, count=n)
+        
+        average_rating = column(f.average_rating for f in rows)
+        total_reviews = column(f.total_reviews for f in rows)
+        experience = column(f.years_of_experience for f in rows)
+        completed_jobs = column(f.completed_jobs for f in rows)
+        recent_bookings = column(f.recent_completed_bookings for f in rows)
+        review_count = column(f.review_count for f in rows)
+        available_slots = column(f.available_slots for f in rows)
+        is_available = column((f.is_available for f in rows), dtype=bool)
+        
+        matrix = np.zeros((n, len(self.COMPONENTS)))
+        
+        # Rating - same formula as _rating_based_scores
+        rating = np.where(average_rating > 0, average_rating / 5.0, 0.0)
+        rating = rating + np.minimum(total_reviews / 20.0, 0.1)
+        matrix[:, self.COMPONENTS.index('rating')] = np.minimum(rating, 1.0)
+        
+        # Collaborative - set-based scores are already scaled
+        with self.profiler.stage('collaborative', n):
+            collaborative_scores = self._collaborative_filtering_scores(customer, candidate_providers)
+        matrix[:, self.COMPONENTS.index('collaborative')] = column(
+            collaborative_scores.get(provider_id, 0.0) for provider_id in candidate_providers
+        )
+        
+        # Content based - same formula as _content_based_scores
+        content = np.zeros(n)
+        if service_category:
+            content += 0.3 * column((service_category in f.active_categories for f in rows), dtype=bool)
+        content += np.where(average_rating > 0, np.minimum(average_rating / 5.0, 1.0) * 0.25, 0.0)
+        content += np.minimum(experience / 10.0, 1.0) * 0.15
+        content += np.where(completed_jobs > 0, np.minimum(completed_jobs / 50.0, 1.0) * 0.15, 0.0)
+        
+        text_scores = self._preference_text_scores(customer, candidate_providers)
+        if text_scores is not None:
+            content += column(text_scores[provider_id] for provider_id in candidate_providers) * 0.15
+        matrix[:, self.COMPONENTS.index('content_based')] = np.minimum(content, 1.0)
+        
+        # Popularity - same formula as _popularity_scores
+        matrix[:, self.COMPONENTS.index('popularity')] = (
+            np.minimum(recent_bookings / 20.0, 1.0) * 0.6 +
+            np.minimum(review_count / 50.0, 1.0) * 0.4
+        )
+        
+        # Availability - same formula as _availability_scores
+        matrix[:, self.COMPONENTS.index('availability')] = np.where(
+            is_available, np.minimum(available_slots / 56, 1.0), 0.0
+        )
+        
+        # Distance - same formula as _distance_scores
+        if nearby_providers is not None:
+            distance_scores = self._distance_scores(candidate_providers, nearby_providers)
+            matrix[:, self.COMPONENTS.index('distance')] = column(
+                distance_scores[provider_id] for provider_id in candidate_providers
+            )
+        
+        # Price - same formula as _price_scores
+        price_scores = self._price_scores(candidate_providers, service_category, features)
+        matrix[:, self.COMPONENTS.index('price')] = column(
+            price_scores[provider_id] for provider_id in candidate_providers
+        )
+        
+        # Sentiment - same formula as _sentiment_scores
+        sentiment = column(f.average_sentiment if f.average_sentiment is not None else np.nan for f in rows)
+        matrix[:, self.COMPONENTS.index('sentiment')] = np.where(np.isnan(sentiment), 0.5, (sentiment + 1.0) / 2.0)
+        
+        return matrix
+    
+    def _top_k(self, final_scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indices of the k highest scores, best first
+        
+        Uses a partition so only the selected k entries are sorted; ties are
+        broken by candidate order like the stable sort in the dict path, also
+        among scores tied with the k-th one.
+        """
+        n = len(final_scores)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=int)
+        
+        if k < n:
+            kth_score = np.partition(final_scores, n - k)[n - k]
+            above = np.flatnonzero(final_scores > kth_score)
+            tied = np.flatnonzero(final_scores == kth_score)[:k - len(above)]
+            indices = np.concatenate([above, tied])
+        else:
+            indices = np.arange(n)
+        
+        return indices[np.lexsort((indices, -final_scores[indices]))]
+    
     def _save_recommendations(self, customer: User, recommendations: List[Dict], 
                             service_category: Optional[str]):
-        """Save recommendations to database"""
+        """Save recommendations to database, on the background writer if enabled"""
+        rows = {
+            rec['provider'].id: {
+                'compatibility_score': rec['score_breakdown']['content_based'],
+                'distance_score': rec['score_breakdown']['distance'],
+                'rating_score': float(rec['provider_profile'].average_rating) / 5.0,
+                'price_score': rec['score_breakdown']['price'],
+                'availability_score': rec['score_breakdown']['availability'],
+                'overall_score': rec['final_score'],
+                'factors_used': rec['score_breakdown']
+            }
+            for rec in recommendations
+        }
+        
+        if self._writer is not None:
+            self._writer.submit(self._write_recommendations, customer.id, service_category or "", rows)
+        else:
+            self._write_recommendations(customer.id, service_category or "", rows)
+    
+    def _log_prediction(self, customer: User, service_category: Optional[str], location: Optional[str],
+                        max_recommendations: int, candidate_count: int, recommendations: List[Dict]):
+        """Queue an MLPrediction audit record; written in batches by the prediction logger"""
+        prediction_logger.log(
+            'provider_recommendation',
+            input_data={
+                'service_category': service_category or '',
+                'location': location or '',
+                'max_recommendations': max_recommendations,
+                'candidates': candidate_count,
+                'collaborative_mode': self.collaborative_mode,
+                'weights': self.WEIGHTS,
+            },
+            prediction_result=[
+                {
+                    'provider_id': rec['provider'].id,
+                    'final_score': rec['final_score'],
+                    'score_breakdown': rec['score_breakdown'],
+                }
+                for rec in recommendations
+            ],
+            user_id=customer.id,
+            confidence=min(recommendations[0]['final_score'], 1.0) if recommendations else None,
+            model_version='vectorized' if self.vectorized else 'weighted',
+        )
+    
+    def _write_recommendations(self, customer_id: int, service_category: str, rows: Dict[int, Dict]):
+        """
+        Upsert changed RecommendationScore rows
+        
+        Rows whose stored values already match are skipped, and the upsert against
+        the unique (customer, provider, service_category) constraint means concurrent
+        writers for the same customer cannot collide on insert. Only with
+        replace_stored are providers no longer recommended dropped: a live request
+        may ask for fewer recommendations than the precomputed set holds.
+        """
         try:
             from ml_engine.models import RecommendationScore
             
-            # Delete old recommendations for this customer/category
-            RecommendationScore.objects.filter(
-                customer=customer,
-                service_category=service_category or ""
-            ).delete()
-            
-            # Save new recommendations
-            for rec in recommendations:
-                RecommendationScore.objects.create(
-                    customer=customer,
-                    provider=rec['provider'],
-                    service_category=service_category or "",
-                    compatibility_score=rec['score_breakdown']['content_based'],
-                    distance_score=0.0,  # TODO: Implement geolocation scoring
-                    rating_score=float(rec['provider'].provider_profile.average_rating) / 5.0,
-                    price_score=0.0,  # TODO: Implement price scoring
-                    availability_score=rec['score_breakdown']['availability'],
-                    overall_score=rec['final_score'],
-                    factors_used=rec['score_breakdown']
+            existing = {
+                row['provider_id']: row
+                for row in RecommendationScore.objects.filter(
+                    customer_id=customer_id,
+                    service_category=service_category
+                ).values('provider_id', 'is_active', *self.PERSISTED_FIELDS)
+            }
+            
+            # Delete recommendations for providers that dropped out
+            stale = set(existing) - set(rows) if self.replace_stored else set()
+            if stale:
+                RecommendationScore.objects.filter(
+                    customer_id=customer_id,
+                    service_category=service_category,
+                    provider_id__in=stale
+                ).delete()
+            
+            changed = [
+                RecommendationScore(
+                    customer_id=customer_id,
+                    provider_id=provider_id,
+                    service_category=service_category,
+                    is_active=True,
+                    **values
+                )
+                for provider_id, values in rows.items()
+                if not self._is_unchanged(existing.get(provider_id), values)
+            ]
+            
+            if changed:
+                RecommendationScore.objects.bulk_create(
+                    changed,
+                    update_conflicts=True,
+                    unique_fields=['customer', 'provider', 'service_category'],
+                    update_fields=[*self.PERSISTED_FIELDS, 'is_active', 'calculated_at']
                 )
         
         except Exception as e:
             logger.error(f"Error saving recommendations: {str(e)}")
+        
+        finally:
+            if self._writer is not None:
+                # Writer threads hold their own connection; don't leak it between jobs
+                connection.close()
+    
+    def _is_unchanged(self, stored: Optional[Dict], values: Dict) -> bool:
+        """Compare a stored row with new values at the column's decimal precision"""
+        if stored is None or not stored['is_active']:
+            return False
+        
+        for field, value in values.items():
+            if field == 'factors_used':
+                if stored[field] != value:
+                    return False
+            elif stored[field] != Decimal(str(value)).quantize(SCORE_PRECISION):
+                return False
+        
+        return True
 
 
 class ServiceRecommendationEngine:
     """
     Service recommendation engine for suggesting relevant services to customers
+    
+    Services are streamed by category bucket into a bounded top-k heap, with the
+    customer's booked services and the in-memory price distribution loaded up front,
+    so the number of queries does not depend on the number of services.
     """
     
-    def __init__(self):
-        pass  # No complex initialization needed for now
+    # Weight of the percentile-based price score. Like the "within +/-20% of the
+    # category average" check it replaced, it rewards typical prices rather than the
+    # cheapest: the full 0.2 for prices in the middle half of their category and price
+    # unit, falling linearly to 0 at the cheapest and the most expensive.
+    PRICE_WEIGHT = 0.2
+    
+    # Highest score a service can reach without a preferred category match
+    MAX_SCORE_WITHOUT_PREFERENCE = 0.3 + PRICE_WEIGHT + 0.1
+    
+    def __init__(self, profiler: Optional[RecommendationProfiler] = None):
+        self.profiler = profiler or recommendation_profiler
     
     def get_service_recommendations(self, customer: User, 
                                   max_recommendations: int = 8) -> List[Dict]:
         """
         Get personalized service recommendations for a customer
         """
+        with self.profiler.request('service_recommendations', f'for customer {customer.id}'):
+            return self._get_service_recommendations(customer, max_recommendations)
+    
+    def _get_service_recommendations(self, customer: User, max_recommendations: int) -> List[Dict]:
         try:
-            # Get customer's booking history
-            past_services = Service.objects.filter(
-                bookings__customer=customer,
-                bookings__status='completed'
-            ).distinct()
+            if max_recommendations <= 0:
+                return []
             
-            # Get customer preferences
-            customer_profile = getattr(customer, 'customer_profile', None)
-            preferred_categories = []
+            with self.profiler.stage('service_history'):
+                # Get customer's booking history
+                booked_service_ids = set(Service.objects.filter(
+                    bookings__customer=customer,
+                    bookings__status='completed'
+                ).values_list('id', flat=True))
+                
+                # Get customer preferences
+                customer_profile = getattr(customer, 'customer_profile', None)
+                preferred_categories = []
+                
+                if customer_profile and customer_profile.preferred_services:
+                    preferred_categories = [pref.strip().lower() 
+                                           for pref in customer_profile.preferred_services.split(',')]
             
-            if customer_profile and customer_profile.preferred_services:
-                preferred_categories = [pref.strip().lower() 
-                                       for pref in customer_profile.preferred_services.split(',')]
+            with self.profiler.stage('price_distribution'):
+                price_distribution = get_price_distribution()
+                preferred_category_ids = [
+                    category_id
+                    for category_id, name in ServiceCategory.objects.values_list('id', 'name')
+                    if name.lower() in preferred_categories
+                ]
             
-            # Get all active services
-            all_services = Service.objects.filter(is_active=True)
+            # Stream preferred category buckets first
+            services = Service.objects.filter(is_active=True).select_related(
+                'provider__provider_profile', 'category'
+            ).order_by('id')
             
-            # Calculate similarity scores
-            recommendations = []
+            if preferred_category_ids:
+                buckets = [
+                    services.filter(category_id__in=preferred_category_ids),
+                    services.exclude(category_id__in=preferred_category_ids)
+                ]
+            else:
+                buckets = [services]
             
-            for service in all_services:
-                # Skip if customer already booked this service
-                if past_services.filter(id=service.id).exists():
-                    continue
-                
-                score = 0.0
-                
-                # 1. Category preference match
-                if preferred_categories:
-                    if service.category.name.lower() in preferred_categories:
-                        score += 0.4
-                
-                # 2. Provider quality
-                if service.provider.provider_profile.average_rating > 0:
-                    rating_score = float(service.provider.provider_profile.average_rating) / 5.0
-                    score += rating_score * 0.3
-                
-                # 3. Price reasonableness (compared to category average)
-                category_avg = Service.objects.filter(
-                    category=service.category,
-                    is_active=True
-                ).aggregate(avg_price=Avg('base_price'))['avg_price'] or 0
-                
-                if category_avg > 0:
-                    price_ratio = float(service.base_price) / float(category_avg)
-                    # Prefer reasonable prices (not too high, not too low)
-                    if 0.8 <= price_ratio <= 1.2:
-                        score += 0.2
-                
-                # 4. Provider availability
-                if service.provider.provider_profile.is_available:
-                    score += 0.1
-                
-                recommendations.append({
+            # Min-heap of (score, -service_id, service); ties keep the lower id like a stable sort
+            top = []
+            with self.profiler.stage('service_scan') as stage:
+                stage.candidates = 0
+                for bucket_number, bucket in enumerate(buckets):
+                    if bucket_number > 0 and len(top) == max_recommendations \
+                            and top[0][0] > self.MAX_SCORE_WITHOUT_PREFERENCE:
+                        # Nothing in the remaining buckets can displace the current top-k
+                        break
+                    
+                    for service in bucket.iterator(chunk_size=500):
+                        stage.candidates += 1
+                        
+                        # Skip if customer already booked this service
+                        if service.id in booked_service_ids:
+                            continue
+                        
+                        score = self._score_service(service, preferred_categories, price_distribution)
+                        entry = (score, -service.id, service)
+                        
+                        if len(top) < max_recommendations:
+                            heapq.heappush(top, entry)
+                        elif entry[:2] > top[0][:2]:
+                            heapq.heapreplace(top, entry)
+            
+            # Sort by score and return top recommendations
+            return [
+                {
                     'service': service,
                     'score': score,
                     'provider': service.provider,
                     'category': service.category
-                })
-            
-            # Sort by score and return top recommendations
-            recommendations.sort(key=lambda x: x['score'], reverse=True)
-            return recommendations[:max_recommendations]
+                }
+                for score, _, service in sorted(top, key=lambda entry: entry[:2], reverse=True)
+            ]
             
         except Exception as e:
-            logger.error(f"Error getting service recommendations: {str(e)}")
+            logger.exception(f"Error getting service recommendations: {str(e)}")
             return []
+    
+    def _score_service(self, service: Service, preferred_categories: List[str],
+                       price_distribution: PriceDistribution) -> float:
+        """Score a single service against the customer's preferences"""
+        score = 0.0
+        provider_profile = service.provider.provider_profile
+        
+        # 1. Category preference match
+        if preferred_categories:
+            if service.category.name.lower() in preferred_categories:
+                score += 0.4
+        
+        # 2. Provider quality
+        if provider_profile.average_rating > 0:
+            rating_score = float(provider_profile.average_rating) / 5.0
+            score += rating_score * 0.3
+        
+        # 3. Price reasonableness (percentile within category and price unit)
+        score += price_distribution.typical_price_score(
+            service.category_id, service.price_unit, service.base_price
+        ) * self.PRICE_WEIGHT
+        
+        # 4. Provider availability
+        if provider_profile.is_available:
+            score += 0.1
+        
+        return score
 
 
 # Singleton instances
-recommendation_engine = RecommendationEngine()
+recommendation_engine = RecommendationEngine(
+    vectorized=getattr(settings, 'RECOMMENDATION_ENGINE_VECTORIZED', False),
+    cache=recommendation_cache,
+    defer_persistence=getattr(settings, 'RECOMMENDATION_DEFER_PERSISTENCE', False),
+    precomputed_max_age=getattr(settings, 'RECOMMENDATION_PRECOMPUTED_MAX_AGE', None),
+    collaborative_mode=getattr(settings, 'RECOMMENDATION_COLLABORATIVE_MODE', 'user')
+)
 service_recommendation_engine = ServiceRecommendationEngine()
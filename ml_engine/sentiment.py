@@ -0,0 +1,157 @@
+from typing import Iterable, List, Optional, Tuple
+from decimal import Decimal
+import re
+
+import numpy as np
+
+from reviews.models import Review
+
+
+# Word valences in [-1, 1], tuned for home service reviews
+LEXICON = {
+    # Positive
+    'excellent': 0.9, 'outstanding': 0.9, 'amazing': 0.9, 'fantastic': 0.9, 'perfect': 0.9,
+    'wonderful': 0.85, 'awesome': 0.85, 'superb': 0.85, 'brilliant': 0.85, 'flawless': 0.85,
+    'great': 0.75, 'impressed': 0.7, 'recommend': 0.7, 'recommended': 0.7, 'love': 0.75, 'loved': 0.75,
+    'good': 0.55, 'nice': 0.5, 'happy': 0.6, 'pleased': 0.6, 'satisfied': 0.6, 'glad': 0.5,
+    'professional': 0.6, 'professionally': 0.6, 'reliable': 0.6, 'trustworthy': 0.6, 'honest': 0.55,
+    'friendly': 0.5, 'polite': 0.5, 'courteous': 0.5, 'helpful': 0.5, 'respectful': 0.5,
+    'punctual': 0.55, 'prompt': 0.5, 'quick': 0.4, 'fast': 0.4, 'efficient': 0.5, 'timely': 0.5,
+    'clean': 0.4, 'neat': 0.4, 'tidy': 0.4, 'thorough': 0.5, 'careful': 0.4, 'skilled': 0.55,
+    'knowledgeable': 0.5, 'expert': 0.5, 'experienced': 0.4, 'affordable': 0.4, 'reasonable': 0.35,
+    'fair': 0.3, 'worth': 0.4, 'quality': 0.3, 'fixed': 0.35, 'resolved': 0.4, 'smooth': 0.4,
+    'easy': 0.3, 'best': 0.8, 'thanks': 0.3, 'thank': 0.3, 'well': 0.3, 'fine': 0.2, 'okay': 0.1, 'ok': 0.1,
+    # Negative
+    'terrible': -0.9, 'horrible': -0.9, 'awful': -0.9, 'worst': -0.9, 'disgusting': -0.9, 'scam': -0.9,
+    'pathetic': -0.85, 'useless': -0.8, 'disaster': -0.85, 'fraud': -0.9, 'dishonest': -0.75,
+    'bad': -0.6, 'poor': -0.6, 'poorly': -0.6, 'disappointed': -0.65, 'disappointing': -0.65,
+    'rude': -0.7, 'unprofessional': -0.7, 'careless': -0.6, 'sloppy': -0.6, 'messy': -0.5, 'dirty': -0.55,
+    'late': -0.45, 'delayed': -0.45, 'delay': -0.4, 'slow': -0.4, 'unreliable': -0.6, 'lazy': -0.55,
+    'overpriced': -0.55, 'expensive': -0.35, 'overcharged': -0.65, 'broke': -0.5, 'broken': -0.5,
+    'damaged': -0.6, 'damage': -0.55, 'leak': -0.35, 'leaking': -0.4, 'problem': -0.3, 'problems': -0.3,
+    'issue': -0.25, 'issues': -0.25, 'mistake': -0.4, 'wrong': -0.4, 'waste': -0.6,
+    'avoid': -0.65, 'complaint': -0.5, 'complaints': -0.5, 'unhappy': -0.6, 'angry': -0.6, 'frustrating': -0.55,
+    'incompetent': -0.75, 'noshow': -0.7, 'cancelled': -0.35, 'refund': -0.3, 'worse': -0.6,
+}
+
+NEGATIONS = {'not', 'no', 'never', 'none', 'nobody', 'nothing', 'neither', 'nor', 'without', 'hardly', 'barely'}
+INTENSIFIERS = {
+    'very': 1.3, 'really': 1.3, 'extremely': 1.5, 'super': 1.4, 'so': 1.2, 'highly': 1.4,
+    'absolutely': 1.5, 'totally': 1.3, 'incredibly': 1.5, 'quite': 1.1, 'slightly': 0.7, 'somewhat': 0.8,
+}
+
+NEGATION_SCOPE = 3  # Tokens after a negation whose valence is flipped, within its clause
+NEGATION_FACTOR = -0.75
+NORMALIZATION_ALPHA = 15.0  # Larger values need more evidence to approach +/-1
+LABEL_THRESHOLD = 0.05
+
+CLAUSE_BREAKS = {'.', ',', ';', '!', '?'}
+
+TOKEN_RE = re.compile(r"[a-z]+(?:n't|'[a-z]+)?|[.,;!?]")
+
+
+class LexiconSentimentAnalyzer:
+    """
+    Offline lexicon-based sentiment scorer
+
+    Texts are tokenized into (text index, valence) pairs, with valences flipped
+    within a few tokens of a negation (never past a clause break: . , ; ! ?)
+    and scaled by a preceding intensifier. A
+    batch is then summed per text with one bincount and squashed into [-1, 1]
+    with x / sqrt(x^2 + alpha), so no model or network access is needed.
+    """
+
+    def _valences(self, text: str) -> List[float]:
+        valences = []
+        negated_for = 0
+        boost = 1.0
+        for token in TOKEN_RE.findall(text.lower()):
+            if token in CLAUSE_BREAKS:
+                negated_for = 0
+                boost = 1.0
+                continue
+            if token in NEGATIONS or token.endswith("n't"):
+                negated_for = NEGATION_SCOPE
+                continue
+            if token in INTENSIFIERS:
+                boost = INTENSIFIERS[token]
+                continue
+
+            valence = LEXICON.get(token)
+            if valence is not None:
+                valence *= boost
+                if negated_for:
+                    valence *= NEGATION_FACTOR
+                valences.append(valence)
+            boost = 1.0
+            negated_for = max(negated_for - 1, 0)
+        return valences
+
+    def score_batch(self, texts: Iterable[str]) -> np.ndarray:
+        """Sentiment scores in [-1, 1] for each text"""
+        texts = list(texts)
+        doc_index = []
+        valences = []
+        for i, text in enumerate(texts):
+            text_valences = self._valences(text or '')
+            doc_index.extend([i] * len(text_valences))
+            valences.extend(text_valences)
+
+        totals = np.bincount(
+            np.asarray(doc_index, dtype=np.int64),
+            weights=np.asarray(valences, dtype=float),
+            minlength=len(texts)
+        )
+        return totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+
+    @staticmethod
+    def labels(scores: np.ndarray) -> List[str]:
+        return np.where(
+            scores >= LABEL_THRESHOLD, 'positive',
+            np.where(scores <= -LABEL_THRESHOLD, 'negative', 'neutral')
+        ).tolist()
+
+    def analyze(self, texts: Iterable[str]) -> List[Tuple[float, str]]:
+        """(score rounded to the Review.sentiment_score precision, label) per text"""
+        scores = np.round(self.score_batch(texts), 2)
+        return list(zip(scores.tolist(), self.labels(scores)))
+
+
+def review_text(comment: str, pros: str = '', cons: str = '') -> str:
+    """Comment, pros and cons as one text, separated by clause breaks so negations stay in their part"""
+    return ' . '.join(part for part in (comment, pros, cons) if part)
+
+
+def score_reviews(incremental: bool = False, chunk_size: int = 2000,
+                  analyzer: Optional[LexiconSentimentAnalyzer] = None) -> int:
+    """
+    Score Review sentiment offline and store it on the reviews
+
+    Reviews are read in primary key pages, each scored and bulk-updated before the
+    next is fetched, so memory stays flat regardless of table size and no open
+    cursor spans the updates. Incremental runs only touch reviews whose
+    sentiment_score is still null.
+    """
+    analyzer = analyzer or LexiconSentimentAnalyzer()
+    reviews = Review.objects.order_by('id').only('id', 'comment', 'pros', 'cons')
+    if incremental:
+        reviews = reviews.filter(sentiment_score__isnull=True)
+
+    def flush(chunk):
+        results = analyzer.analyze(review_text(r.comment, r.pros, r.cons) for r in chunk)
+        for review, (score, label) in zip(chunk, results):
+            review.sentiment_score = Decimal(str(score))
+            review.sentiment_label = label
+        Review.objects.bulk_update(chunk, ['sentiment_score', 'sentiment_label'], batch_size=500)
+
+    scored = 0
+    last_id = 0
+    while True:
+        chunk = list(reviews.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        flush(chunk)
+        scored += len(chunk)
+        last_id = chunk[-1].id
+
+    return scored
@@ -0,0 +1,97 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from accounts.models import CustomerProfile, ServiceProviderProfile
+from services.models import Service, ServiceAvailability, ServiceArea
+from reviews.models import Review
+from bookings.models import Booking
+from .cache import recommendation_cache
+from .item_similarity import mark_booking_deleted, mark_item_similarity_stale
+from .geo_index import update_geo_area, remove_geo_area, update_geo_radius
+from .postal_index import update_postal_area, remove_postal_area
+from .price_distribution import mark_price_distribution_stale
+from .text_index import mark_text_index_dirty
+
+
+@receiver(pre_save, sender=Booking)
+def remember_booking_status(sender, instance, **kwargs):
+    """Keep the stored status so post_save can tell whether it changed"""
+    if instance.pk:
+        instance._previous_status = sender.objects.filter(pk=instance.pk).values_list(
+            'status', flat=True
+        ).first()
+    else:
+        instance._previous_status = None
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_on_booking_status_change(sender, instance, **kwargs):
+    """Only completed bookings feed the scorers, so ignore other status changes"""
+    previous_status = getattr(instance, '_previous_status', None)
+    if previous_status != instance.status and 'completed' in (previous_status, instance.status):
+        recommendation_cache.invalidate_all()
+        mark_item_similarity_stale()
+
+
+@receiver(post_delete, sender=Booking)
+def invalidate_on_booking_delete(sender, instance, **kwargs):
+    if instance.status == 'completed':
+        recommendation_cache.invalidate_all()
+        # The deleted row is invisible to the incremental refresh, so name its pair
+        mark_booking_deleted(instance.customer_id, instance.provider_id)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=ServiceProviderProfile)
+@receiver(post_delete, sender=ServiceProviderProfile)
+@receiver(post_save, sender=ServiceAvailability)
+@receiver(post_delete, sender=ServiceAvailability)
+@receiver(post_save, sender=ServiceArea)
+@receiver(post_delete, sender=ServiceArea)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_on_provider_change(sender, instance, **kwargs):
+    """Provider-side changes affect every customer's ranking"""
+    recommendation_cache.invalidate_all()
+
+
+@receiver(post_save, sender=CustomerProfile)
+def invalidate_on_customer_profile_change(sender, instance, **kwargs):
+    """Preferences only affect the customer's own recommendations"""
+    recommendation_cache.invalidate_customer(instance.user_id)
+
+
+@receiver(post_save, sender=ServiceArea)
+def update_location_indexes_area(sender, instance, **kwargs):
+    update_geo_area(instance)
+    update_postal_area(instance)
+
+
+@receiver(post_delete, sender=ServiceArea)
+def remove_location_indexes_area(sender, instance, **kwargs):
+    remove_geo_area(instance.pk)
+    remove_postal_area(instance.pk)
+
+
+@receiver(post_save, sender=ServiceProviderProfile)
+def update_geo_index_radius(sender, instance, **kwargs):
+    update_geo_radius(instance.user_id, instance.service_radius)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def refresh_price_distribution(sender, instance, **kwargs):
+    mark_price_distribution_stale()
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def reindex_service_provider_text(sender, instance, **kwargs):
+    mark_text_index_dirty(instance.provider_id)
+
+
+@receiver(post_save, sender=ServiceProviderProfile)
+@receiver(post_delete, sender=ServiceProviderProfile)
+def reindex_provider_text(sender, instance, **kwargs):
+    mark_text_index_dirty(instance.user_id)
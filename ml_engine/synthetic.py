@@ -0,0 +1,205 @@
+"""
+Seeded synthetic marketplace generator for benchmarks
+
+Customer activity and provider popularity follow Zipf-like power laws, so a few
+customers and providers account for most bookings, as in a real marketplace.
+Everything is written with bulk_create, which bypasses model signals.
+"""
+from django.contrib.auth.hashers import make_password
+from django.db.models import Avg, Count
+from django.utils import timezone
+from datetime import time
+from typing import Dict
+
+import numpy as np
+
+from accounts.models import User, CustomerProfile, ServiceProviderProfile
+from services.models import Service, ServiceCategory, ServiceAvailability, ServiceArea
+from reviews.models import Review
+from bookings.models import Booking
+
+CATEGORIES = [
+    'Cleaning', 'Plumbing', 'Electrical', 'Painting',
+    'Carpentry', 'Pest Control', 'Appliance Repair', 'Landscaping',
+]
+
+AREAS = [
+    # (area name, postal code prefix, latitude, longitude)
+    ('Koramangala', '5600', 12.9352, 77.6245),
+    ('Indiranagar', '5600', 12.9719, 77.6412),
+    ('Whitefield', '5600', 12.9698, 77.7500),
+    ('Andheri', '4000', 19.1136, 72.8697),
+    ('Bandra', '4000', 19.0596, 72.8295),
+    ('Connaught Place', '1100', 28.6315, 77.2167),
+]
+
+BATCH_SIZE = 2000
+
+
+def power_law_weights(n: int, alpha: float, rng: np.random.Generator) -> np.ndarray:
+    """Zipf-like probabilities over n items in random order"""
+    weights = 1.0 / np.arange(1, n + 1) ** alpha
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def generate_marketplace(customers: int, providers: int, services: int, bookings: int,
+                         seed: int = 42, alpha: float = 1.1) -> Dict[str, int]:
+    """Populate the current database with a synthetic marketplace; returns row counts"""
+    rng = np.random.default_rng(seed)
+    now = timezone.now()
+    password = make_password(None)  # Unusable password, hashed once
+
+    categories = ServiceCategory.objects.bulk_create([
+        ServiceCategory(name=name, description=f'{name} services') for name in CATEGORIES
+    ])
+
+    customer_users = User.objects.bulk_create([
+        User(username=f'bench_customer_{i}', role='customer', password=password, address=f'{i} Main Road')
+        for i in range(customers)
+    ], batch_size=BATCH_SIZE)
+    provider_users = User.objects.bulk_create([
+        User(username=f'bench_provider_{i}', role='provider', password=password)
+        for i in range(providers)
+    ], batch_size=BATCH_SIZE)
+
+    CustomerProfile.objects.bulk_create([
+        CustomerProfile(
+            user=user,
+            preferred_services=', '.join(
+                rng.choice(CATEGORIES, size=rng.integers(0, 3), replace=False)
+            ).lower()
+        )
+        for user in customer_users
+    ], batch_size=BATCH_SIZE)
+
+    ServiceProviderProfile.objects.bulk_create([
+        ServiceProviderProfile(
+            user=user,
+            business_name=f'Bench Services {i}',
+            description=f'Experienced {CATEGORIES[i % len(CATEGORIES)].lower()} professional',
+            years_of_experience=int(rng.integers(0, 20)),
+            verification_status='verified' if rng.random() < 0.9 else 'pending',
+            service_radius=int(rng.integers(5, 30)),
+            completed_jobs=int(rng.integers(0, 100)),
+            is_available=bool(rng.random() < 0.9),
+        )
+        for i, user in enumerate(provider_users)
+    ], batch_size=BATCH_SIZE)
+
+    # Every provider offers at least one service when there are enough to go round
+    provider_index = np.concatenate([
+        np.arange(min(providers, services)),
+        rng.integers(0, providers, size=max(services - providers, 0)),
+    ])
+    service_rows = []
+    for i, p in enumerate(provider_index):
+        category = categories[int(rng.integers(0, len(categories)))]
+        service_rows.append(Service(
+            provider=provider_users[p],
+            category=category,
+            title=f'{category.name} service {i}',
+            description=f'Professional {category.name.lower()} by {provider_users[p].username}',
+            base_price=round(float(rng.lognormal(6.5, 0.5)), 2),
+            price_unit=str(rng.choice(['per_hour', 'flat_rate', 'per_sqft', 'per_item'])),
+            is_active=bool(rng.random() < 0.95),
+        ))
+    service_objs = Service.objects.bulk_create(service_rows, batch_size=BATCH_SIZE)
+
+    ServiceAvailability.objects.bulk_create([
+        ServiceAvailability(provider=user, day_of_week=day, start_time=time(hour), end_time=time(hour + 1))
+        for user in provider_users
+        for day in range(7)
+        for hour in range(9, 9 + int(rng.integers(0, 9)))
+    ], batch_size=BATCH_SIZE)
+
+    area_rows = []
+    for user in provider_users:
+        for a in rng.choice(len(AREAS), size=rng.integers(1, 3), replace=False):
+            name, prefix, lat, lng = AREAS[a]
+            has_coordinates = rng.random() < 0.7
+            area_rows.append(ServiceArea(
+                provider=user,
+                area_name=name,
+                postal_code=f'{prefix}{int(rng.integers(0, 100)):02d}',
+                latitude=round(lat + rng.normal(0, 0.02), 6) if has_coordinates else None,
+                longitude=round(lng + rng.normal(0, 0.02), 6) if has_coordinates else None,
+            ))
+    ServiceArea.objects.bulk_create(area_rows, batch_size=BATCH_SIZE)
+
+    # Power-law customer activity and provider popularity
+    customer_p = power_law_weights(customers, alpha, rng)
+    provider_p = power_law_weights(providers, alpha, rng)
+    service_p = provider_p[provider_index]
+    service_p = service_p / service_p.sum()
+    provider_quality = rng.uniform(2.5, 5.0, size=providers)
+
+    booking_customers = rng.choice(customers, size=bookings, p=customer_p)
+    booking_services = rng.choice(len(service_objs), size=bookings, p=service_p)
+    statuses = rng.choice(
+        ['completed', 'confirmed', 'pending', 'cancelled'], size=bookings, p=[0.7, 0.1, 0.1, 0.1]
+    )
+    priorities = rng.choice(['low', 'normal', 'high', 'urgent'], size=bookings, p=[0.2, 0.6, 0.15, 0.05])
+    age_days = rng.exponential(45, size=bookings)
+
+    booking_rows = []
+    for i in range(bookings):
+        service = service_objs[booking_services[i]]
+        area = AREAS[int(rng.integers(0, len(AREAS)))]
+        created_at = now - timezone.timedelta(days=float(age_days[i]))
+        booking_rows.append(Booking(
+            customer=customer_users[booking_customers[i]],
+            provider=service.provider,
+            service=service,
+            booking_date=created_at.date(),
+            booking_time=time(10),
+            service_address=f'{area[0]}',
+            postal_code=f'{area[1]}{int(rng.integers(0, 100)):02d}',
+            quoted_price=service.base_price,
+            status=str(statuses[i]),
+            priority=str(priorities[i]),
+            completed_at=created_at if statuses[i] == 'completed' else None,
+        ))
+    booking_objs = Booking.objects.bulk_create(booking_rows, batch_size=BATCH_SIZE)
+
+    # auto_now_add ignores the value on insert, so spread creation times afterwards
+    for booking, days in zip(booking_objs, age_days):
+        booking.created_at = now - timezone.timedelta(days=float(days))
+    Booking.objects.bulk_update(booking_objs, ['created_at'], batch_size=BATCH_SIZE)
+
+    review_rows = []
+    comments = ['Great job, very professional', 'Okay service', 'Late and rude, poor work', 'Excellent and quick']
+    for booking, p in zip(booking_objs, booking_services):
+        if booking.status != 'completed' or rng.random() > 0.6:
+            continue
+        quality = provider_quality[provider_index[p]]
+        rating = int(np.clip(round(rng.normal(quality, 0.7)), 1, 5))
+        review_rows.append(Review(
+            booking=booking, customer=booking.customer, provider=booking.provider,
+            overall_rating=rating, quality_rating=rating, timeliness_rating=rating,
+            communication_rating=rating, value_rating=rating,
+            comment=comments[int(rng.integers(0, len(comments)))],
+        ))
+    Review.objects.bulk_create(review_rows, batch_size=BATCH_SIZE)
+
+    # bulk_create skips Review.save, so refresh provider ratings in one pass
+    stats = {
+        row['provider_id']: row
+        for row in Review.objects.order_by().values('provider_id').annotate(
+            avg=Avg('overall_rating'), count=Count('id')
+        )
+    }
+    profiles = list(ServiceProviderProfile.objects.filter(user_id__in=stats))
+    for profile in profiles:
+        profile.average_rating = round(stats[profile.user_id]['avg'], 2)
+        profile.total_reviews = stats[profile.user_id]['count']
+    ServiceProviderProfile.objects.bulk_update(profiles, ['average_rating', 'total_reviews'], batch_size=BATCH_SIZE)
+
+    return {
+        'customers': customers,
+        'providers': providers,
+        'services': len(service_objs),
+        'bookings': len(booking_objs),
+        'reviews': len(review_rows),
+        'service_areas': len(area_rows),
+    }
@@ -1,3 +1,1092 @@
-from django.test import TestCase
+import math
+import random
+import statistics
+import threading
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import caches
+from django.core.cache.backends.base import memcache_key_warnings
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import CustomerProfile, ServiceProviderProfile, User
+from bookings.models import Booking
+from reviews.models import Review
+from services.models import Service, ServiceArea, ServiceAvailability, ServiceCategory
+from .async_recommendations import BudgetedRecommendationFetcher, recommendation_fetcher
+from .cache import RecommendationCache, logger as cache_logger
+from .demand_forecast import DemandForecaster
+from .dynamic_pricing import DynamicPricingEngine, PriceSuggestionTable, area_key
+from .geo_index import ProviderGeoIndex, get_geo_index, haversine_km, mark_geo_index_stale
+from .item_similarity import ItemSimilarityIndex
+from .postal_index import PostalPrefixIndex, mark_postal_index_stale, normalize_postal_code, providers_serving
+from .models import DemandForecast, DynamicPricing, MLPrediction, RecommendationScore
+from .prediction_log import PredictionLogger, prediction_logger
+from .price_distribution import PriceDistribution, get_price_distribution, mark_price_distribution_stale
+from .recommendation_engine import SCORE_PRECISION, RecommendationEngine, ServiceRecommendationEngine
+from .sentiment import LEXICON, NEGATIONS, LexiconSentimentAnalyzer, review_text, score_reviews
+from .synthetic import AREAS, CATEGORIES, generate_marketplace
+from .text_index import ProviderTextIndex, tokenize
+
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'recommendations': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+}
+
+
+class MarketplaceTestCase(TestCase):
+    """A small seeded synthetic marketplace shared by the tests of a class"""
+
+    MARKETPLACE = {'customers': 40, 'providers': 15, 'services': 45, 'bookings': 400}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Queued audit records would outlive the test database, and cached results its rows
+        cls.enterClassContext(prediction_logger.paused())
+        cls.enterClassContext(override_settings(CACHES=LOCAL_CACHES))
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_marketplace(seed=7, **cls.MARKETPLACE)
+        cls.customers = list(User.objects.filter(role='customer').order_by('id'))
+        cls.provider_ids = list(User.objects.filter(role='provider').order_by('id').values_list('id', flat=True))
+
+
+class CollaborativeFilteringTests(MarketplaceTestCase):
+    """Scores from the bulk-loaded booking sets match the per-customer queries they replaced"""
+
+    def reference_scores(self, engine, customer, candidates):
+        def booking_sets(user):
+            bookings = Booking.objects.filter(customer=user, status='completed').select_related('service__category')
+            return {b.provider_id for b in bookings}, {b.service.category.name for b in bookings}
+
+        providers, categories = booking_sets(customer)
+        if not providers:
+            return {provider_id: 0.0 for provider_id in candidates}
+
+        similar = []
+        for other in User.objects.filter(role='customer').exclude(id=customer.id).order_by('id'):
+            other_providers, other_categories = booking_sets(other)
+            if not other_providers:
+                continue
+            similarity = (
+                len(providers & other_providers) / len(providers | other_providers) * 0.7 +
+                len(categories & other_categories) / len(categories | other_categories) * 0.3
+            )
+            if similarity > 0:
+                similar.append((other, similarity))
+        similar.sort(key=lambda pair: pair[1], reverse=True)
+
+        scores = {}
+        for provider_id in candidates:
+            score = total_weight = 0.0
+            for other, weight in similar[:20]:
+                if Booking.objects.filter(customer=other, provider_id=provider_id, status='completed').exists():
+                    review = Review.objects.filter(customer=other, provider_id=provider_id).first()
+                    score += weight * (review.overall_rating / 5.0 if review else 0.7)
+                    total_weight += weight
+            scores[provider_id] = score / total_weight if total_weight else 0.0
+        return dict(zip(scores, engine.scaler.fit_transform(list(scores.values()))))
+
+    def test_matches_per_customer_queries(self):
+        engine = RecommendationEngine()
+        compared = 0
+        for customer in self.customers[:10]:
+            expected = self.reference_scores(engine, customer, self.provider_ids)
+            actual = engine._collaborative_filtering_scores(customer, self.provider_ids)
+            self.assertEqual(set(actual), set(expected))
+            for provider_id, score in expected.items():
+                self.assertAlmostEqual(actual[provider_id], score, places=9)
+            compared += any(expected.values())
+        self.assertGreater(compared, 0, "no customer had collaborative signal")
+
+    def test_new_customer_scores_zero(self):
+        customer = User.objects.create(username='no_history', role='customer')
+        engine = RecommendationEngine()
+        self.assertEqual(
+            engine._collaborative_filtering_scores(customer, self.provider_ids),
+            dict.fromkeys(self.provider_ids, 0.0)
+        )
+
+
+class VectorizedScoringTests(MarketplaceTestCase):
+    """The vectorized engine ranks and scores like the per-provider dict path"""
+
+    def test_weights_sum_to_one(self):
+        self.assertAlmostEqual(sum(RecommendationEngine.WEIGHTS.values()), 1.0)
+        engine = RecommendationEngine(sentiment_weight=0.2)
+        self.assertAlmostEqual(sum(engine.WEIGHTS.values()), 1.0)
+        self.assertAlmostEqual(engine.WEIGHTS['rating'], RecommendationEngine.WEIGHTS['rating'] * 0.8)
+        for customer in self.customers[:5]:
+            for rec in RecommendationEngine().get_provider_recommendations(customer, max_recommendations=5):
+                self.assertLessEqual(rec['final_score'], 1.0)
+
+    def assertSameRecommendations(self, expected, actual):
+        self.assertEqual(len(actual), len(expected))
+        # Scores are equal up to float summation order, so near-ties may swap places
+        for want, got in zip(expected, actual):
+            self.assertAlmostEqual(got['final_score'], want['final_score'], places=3)
+        breakdowns = {rec['provider'].id: rec['score_breakdown'] for rec in expected}
+        for rec in actual:
+            if rec['provider'].id in breakdowns:
+                for component, value in breakdowns[rec['provider'].id].items():
+                    self.assertAlmostEqual(rec['score_breakdown'][component], value, places=3, msg=component)
+
+    def test_matches_dict_path(self):
+        dict_engine = RecommendationEngine(vectorized=False)
+        vectorized_engine = RecommendationEngine(vectorized=True)
+        for customer in self.customers[:10]:
+            for category in (None, 'Plumbing'):
+                with self.subTest(customer=customer.id, category=category):
+                    expected = dict_engine.get_provider_recommendations(customer, category, max_recommendations=8)
+                    actual = vectorized_engine.get_provider_recommendations(customer, category, max_recommendations=8)
+                    self.assertTrue(expected)
+                    self.assertSameRecommendations(expected, actual)
+
+    def test_top_k_breaks_ties_by_candidate_order(self):
+        engine = RecommendationEngine(vectorized=True)
+        scores = np.array([0.5, 0.9, 0.5, 0.1, 0.9, 0.5])
+        expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        for k in range(len(scores) + 1):
+            self.assertEqual(engine._top_k(scores, k).tolist(), expected[:k])
+
+
+class ItemSimilarityTests(MarketplaceTestCase):
+    """The incremental index scores like cosine similarities computed from the bookings"""
+
+    def reference_scores(self, customer_id, candidates):
+        vectors = {}
+        for booking in Booking.objects.filter(status='completed'):
+            review = Review.objects.filter(customer_id=booking.customer_id, provider_id=booking.provider_id).first()
+            weight = review.overall_rating / 5.0 if review else ItemSimilarityIndex.DEFAULT_WEIGHT
+            vectors.setdefault(booking.customer_id, {})[booking.provider_id] = weight
+
+        def cosine(a, b):
+            dot = sum(vector.get(a, 0.0) * vector.get(b, 0.0) for vector in vectors.values())
+            norms = math.sqrt(sum(vector.get(a, 0.0) ** 2 for vector in vectors.values()) *
+                              sum(vector.get(b, 0.0) ** 2 for vector in vectors.values()))
+            return dot / norms if dot else 0.0
+
+        own = vectors.get(customer_id, {})
+        scores = {}
+        for candidate in candidates:
+            pairs = [(cosine(candidate, provider), weight) for provider, weight in own.items() if provider != candidate]
+            denominator = sum(similarity for similarity, _ in pairs)
+            scores[candidate] = sum(s * w for s, w in pairs) / denominator if denominator > 0 else 0.0
+        return scores
+
+    def test_matches_cosine_from_bookings(self):
+        index = ItemSimilarityIndex.build()
+        for customer in self.customers[:5]:
+            expected = self.reference_scores(customer.id, self.provider_ids)
+            actual = index.score(customer.id, self.provider_ids)
+            for provider_id in self.provider_ids:
+                self.assertAlmostEqual(actual[provider_id], expected[provider_id], places=9)
+
+    def test_scores_during_concurrent_updates(self):
+        index = ItemSimilarityIndex.build()
+        customer_id = next(customer.id for customer in self.customers if index.has_history(customer.id))
+        expected = index.score(customer_id, self.provider_ids)
+        stop = threading.Event()
+
+        def churn():
+            # A customer who books every provider and then has the bookings deleted, over and over
+            while not stop.is_set():
+                for weight in (1.0, 0.0):
+                    with index._lock:
+                        for provider_id in self.provider_ids:
+                            index._set_weight(-1, provider_id, weight)
+
+        thread = threading.Thread(target=churn)
+        thread.start()
+        try:
+            for _ in range(200):
+                scores = index.score(customer_id, self.provider_ids)
+                self.assertTrue(all(0.0 <= score <= 1.0 + 1e-9 for score in scores.values()), scores)
+        finally:
+            stop.set()
+            thread.join()
+        for provider_id, score in index.score(customer_id, self.provider_ids).items():
+            self.assertAlmostEqual(score, expected[provider_id], places=9)
+
+
+class ServiceRecommendationTests(MarketplaceTestCase):
+    """The bucketed top-k heap returns the full sort's top services in a fixed number of queries"""
+
+    def setUp(self):
+        mark_price_distribution_stale()
+        get_price_distribution()
+        self.engine = ServiceRecommendationEngine()
+
+    def full_sort(self, customer, k):
+        booked = set(Booking.objects.filter(customer=customer, status='completed').values_list('service_id', flat=True))
+        preferred = [name.strip().lower() for name in customer.customer_profile.preferred_services.split(',')
+                     if customer.customer_profile.preferred_services]
+        scored = [
+            (self.engine._score_service(service, preferred, get_price_distribution()), service.id)
+            for service in Service.objects.filter(is_active=True).select_related('provider__provider_profile', 'category')
+            if service.id not in booked
+        ]
+        scored.sort(key=lambda pair: (pair[0], -pair[1]), reverse=True)
+        return scored[:k]
+
+    def test_matches_full_sort(self):
+        for customer in self.customers[:10]:
+            for k in (1, 5, 12):
+                with self.subTest(customer=customer.id, k=k):
+                    recommendations = self.engine.get_service_recommendations(customer, max_recommendations=k)
+                    self.assertEqual(
+                        [(rec['score'], rec['service'].id) for rec in recommendations],
+                        self.full_sort(customer, k)
+                    )
+
+    def add_services(self, count):
+        provider = User.objects.get(id=self.provider_ids[0])
+        category = ServiceCategory.objects.order_by('id').first()
+        Service.objects.bulk_create([
+            Service(provider=provider, category=category, title=f'Extra service {i}', description='Extra',
+                    base_price=100 + i)
+            for i in range(count)
+        ])
+
+    def test_typical_price_outranks_cheapest_and_most_expensive(self):
+        provider = User.objects.get(id=self.provider_ids[0])
+        category = ServiceCategory.objects.create(name='Price Test')
+        services = Service.objects.bulk_create([
+            Service(provider=provider, category=category, title=f'Priced {price}', description='Priced',
+                    base_price=price, price_unit='fixed')
+            for price in (50, 100, 150, 200, 1000)
+        ])
+        mark_price_distribution_stale()
+        scores = {
+            int(service.base_price): self.engine._score_service(
+                Service.objects.select_related('provider__provider_profile', 'category').get(id=service.id),
+                [], get_price_distribution()
+            )
+            for service in services
+        }
+        self.assertEqual(len({scores[100], scores[150], scores[200]}), 1)
+        self.assertGreater(scores[150], scores[50])
+        self.assertGreater(scores[150], scores[1000])
+
+    def test_query_count_does_not_grow_with_services(self):
+        CustomerProfile.objects.filter(user=self.customers[0]).update(preferred_services='')
+        customer = User.objects.get(id=self.customers[0].id)
+        # Booked services, customer profile, categories and one bucket
+        with self.assertNumQueries(4):
+            self.engine.get_service_recommendations(customer)
+        self.add_services(200)
+        customer = User.objects.get(id=self.customers[0].id)
+        with self.assertNumQueries(4):
+            self.engine.get_service_recommendations(customer)
+
+    def test_query_count_with_preferred_categories(self):
+        CustomerProfile.objects.filter(user=self.customers[0]).update(preferred_services='cleaning, plumbing')
+        customer = User.objects.get(id=self.customers[0].id)
+        # Booked services, customer profile, categories and at most two buckets
+        with CaptureQueriesContext(connection) as before:
+            self.engine.get_service_recommendations(customer)
+        self.add_services(200)
+        customer = User.objects.get(id=self.customers[0].id)
+        with CaptureQueriesContext(connection) as after:
+            self.engine.get_service_recommendations(customer)
+        self.assertLessEqual(len(before), 5)
+        self.assertEqual(len(after), len(before))
+
+
+class DeferredPersistenceTests(TransactionTestCase):
+    """The background writer stores the rows on its own connection and closes it after each job"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(prediction_logger.paused())
+        cls.enterClassContext(override_settings(CACHES=LOCAL_CACHES))
+
+    def setUp(self):
+        # Committed, so the writer thread's connection can see the rows
+        generate_marketplace(seed=7, customers=10, providers=8, services=20, bookings=80)
+        self.customer = User.objects.filter(role='customer').order_by('id').first()
+
+    def test_rows_are_written_in_the_background(self):
+        engine = RecommendationEngine(defer_persistence=True)
+        wrapper_class = type(connections['default'])
+        closed_by = []
+        original_close = wrapper_class.close
+
+        def close(wrapper):
+            closed_by.append(threading.current_thread().name)
+            return original_close(wrapper)
+
+        with mock.patch.object(wrapper_class, 'close', close):
+            recommendations = engine.get_provider_recommendations(self.customer, max_recommendations=5)
+            engine._writer.shutdown(wait=True)
+
+        self.assertEqual(len(recommendations), 5)
+        stored = dict(RecommendationScore.objects.filter(customer=self.customer, service_category='').values_list(
+            'provider_id', 'overall_score'
+        ))
+        self.assertEqual(stored, {
+            rec['provider'].id: Decimal(str(rec['final_score'])).quantize(SCORE_PRECISION) for rec in recommendations
+        })
+        self.assertTrue(any(name.startswith('recommendation-writer') for name in closed_by))
+
+
+class BudgetedFetcherTests(TransactionTestCase):
+    """Within the budget the fetcher returns live scoring's result; past it, the last one or the best rated"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(prediction_logger.paused())
+        cls.enterClassContext(override_settings(CACHES=LOCAL_CACHES))
+
+    def setUp(self):
+        # Committed, so the worker threads' connections can see the rows
+        generate_marketplace(seed=7, customers=10, providers=8, services=20, bookings=80)
+        self.customers = list(User.objects.filter(role='customer').order_by('id'))
+        self.engine = RecommendationEngine()
+        self.category = next(name for name in CATEGORIES if self.engine._get_candidate_providers(name))
+        caches['recommendations'].clear()
+
+    def fetcher(self, **kwargs):
+        fetcher = BudgetedRecommendationFetcher(self.engine, **kwargs)
+        self.addCleanup(fetcher._executor.shutdown, wait=True)
+        return fetcher
+
+    def blocked(self):
+        """Hold live scoring until the returned event is set"""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        compute = self.engine.get_provider_recommendations
+
+        def wait_then_compute(*args, **kwargs):
+            release.wait(10)
+            return compute(*args, **kwargs)
+
+        patcher = mock.patch.object(self.engine, 'get_provider_recommendations', side_effect=wait_then_compute)
+        self.addCleanup(patcher.stop)
+        return release, patcher.start()
+
+    def ids(self, recommendations):
+        return [rec['provider'].id for rec in recommendations]
+
+    def best_rated(self, service_category, limit):
+        candidates = set(self.engine._get_candidate_providers(service_category))
+        profiles = sorted(
+            (p for p in ServiceProviderProfile.objects.all() if p.user_id in candidates),
+            key=lambda p: (-p.average_rating, -p.total_reviews, -p.completed_jobs, p.user_id)
+        )
+        return [p.user_id for p in profiles[:limit]]
+
+    def test_live_matches_engine(self):
+        fetcher = self.fetcher(budget_ms=30000)
+        for customer in self.customers[:3]:
+            for category in (None, self.category):
+                with self.subTest(customer=customer.id, category=category):
+                    recommendations, source = fetcher.get_provider_recommendations(customer, category, None, 5)
+                    self.assertEqual(source, 'live')
+                    self.assertTrue(recommendations)
+                    self.assertEqual(
+                        self.ids(recommendations),
+                        self.ids(self.engine.get_provider_recommendations(customer, category, None, 5))
+                    )
+
+    def test_past_budget_serves_last_result_then_best_rated(self):
+        fetcher = self.fetcher(budget_ms=30000)
+        customer = self.customers[0]
+        live, _ = fetcher.get_provider_recommendations(customer, None, None, 5)
+
+        release, _ = self.blocked()
+        stale, source = fetcher.get_provider_recommendations(customer, None, None, 5, budget_ms=0)
+        self.assertEqual(source, 'stale')
+        self.assertTrue(stale)
+        self.assertEqual(self.ids(stale), self.ids(live))
+
+        for category in (None, self.category):
+            with self.subTest(category=category):
+                popular, source = fetcher.get_provider_recommendations(self.customers[1], category, None, 5, budget_ms=0)
+                self.assertEqual(source, 'popular')
+                self.assertEqual(self.ids(popular), self.best_rated(category, 5))
+
+    def test_full_queue_skips_live_scoring(self):
+        fetcher = self.fetcher(budget_ms=0, max_workers=1, max_pending=1)
+        release, compute = self.blocked()
+        fetcher.get_provider_recommendations(self.customers[0], None, None, 5)
+        _, source = fetcher.get_provider_recommendations(self.customers[1], None, None, 5)
+
+        self.assertEqual(source, 'popular')
+        release.set()
+        fetcher._executor.shutdown(wait=True)
+        self.assertEqual([call.args[0] for call in compute.call_args_list], [self.customers[0]])
+
+    def test_endpoint(self):
+        self.client.force_login(self.customers[0])
+        with mock.patch.object(recommendation_fetcher, 'budget_ms', 30000):
+            response = self.client.get(reverse('services:recommendations_api'), {'category': self.category})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['source'], 'live')
+        self.assertTrue(data['html'])
+        self.assertEqual(
+            data['count'], len(self.engine.get_provider_recommendations(self.customers[0], self.category, None, 3))
+        )
+
+        self.client.force_login(User.objects.filter(role='provider').first())
+        self.assertEqual(self.client.get(reverse('services:recommendations_api')).status_code, 403)
+
+
+class PredictionLoggerTests(TransactionTestCase):
+    """Queued records reach MLPrediction in batches, with the fields a direct create() would store"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='logged', role='customer')
+
+    def test_flush_writes_queued_records_in_batches(self):
+        log = PredictionLogger(batch_size=4, flush_interval=60)
+        records = [
+            {'input_data': {'n': i}, 'prediction_result': [i, i * 2], 'confidence': i / 10 + 0.00004}
+            for i in range(10)
+        ]
+        for record in records:
+            self.assertTrue(log.log('demand_forecast', user_id=self.user.id, model_version='test', **record))
+        self.assertTrue(log.flush())
+
+        stored = list(MLPrediction.objects.order_by('id').values(
+            'user_id', 'prediction_type', 'input_data', 'prediction_result', 'confidence_score', 'model_version'
+        ))
+        self.assertEqual(stored, [
+            {
+                'user_id': self.user.id, 'prediction_type': 'demand_forecast', 'input_data': record['input_data'],
+                'prediction_result': record['prediction_result'],
+                'confidence_score': Decimal(str(round(record['confidence'], 4))), 'model_version': 'test',
+            }
+            for record in records
+        ])
+        self.assertEqual((log.stats()['written'], log.stats()['batches']), (10, 3))
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        log = PredictionLogger(max_queue=2, batch_size=100, flush_interval=60)
+        # Without a worker draining it the queue fills up; flush() then writes inline
+        with mock.patch.object(log, '_ensure_worker'):
+            results = [log.log('demand_forecast', {'n': i}, {}) for i in range(5)]
+        self.assertEqual(results, [True, True, False, False, False])
+        self.assertEqual(log.stats()['dropped'], 3)
+        self.assertTrue(log.flush())
+        self.assertEqual(list(MLPrediction.objects.order_by('id').values_list('input_data', flat=True)),
+                         [{'n': 0}, {'n': 1}])
+
+    def test_paused_drops_records(self):
+        log = PredictionLogger(batch_size=4, flush_interval=60)
+        with log.paused():
+            self.assertFalse(log.log('demand_forecast', {}, {}))
+        self.assertTrue(log.log('demand_forecast', {}, {}))
+        log.flush()
+        self.assertEqual(MLPrediction.objects.count(), 1)
+
+
+class PriceDistributionTests(SimpleTestCase):
+    """Bisection percentiles match counting the peers, and typical prices score highest"""
+
+    def test_percentile_matches_counting(self):
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            peers = sorted(rng.integers(1, 20, rng.integers(1, 30)).astype(float).tolist())
+            distribution = PriceDistribution({(1, 'fixed'): peers})
+            for price in range(0, 22):
+                below = sum(peer < price for peer in peers)
+                equal = sum(peer == price for peer in peers)
+                expected = None if len(peers) < 2 else min(max((below + (equal - 1) / 2) / (len(peers) - 1), 0.0), 1.0)
+                with self.subTest(peers=peers, price=price):
+                    actual = distribution.percentile(1, 'fixed', price)
+                    if expected is None:
+                        self.assertIsNone(actual)
+                    else:
+                        self.assertAlmostEqual(actual, expected)
+
+    def test_typical_prices_score_highest(self):
+        distribution = PriceDistribution({(1, 'fixed'): [50.0, 100.0, 150.0, 200.0, 1000.0]})
+        scores = {price: distribution.typical_price_score(1, 'fixed', price) for price in (50, 100, 150, 200, 1000)}
+        self.assertEqual(scores, {50: 0.0, 100: 1.0, 150: 1.0, 200: 1.0, 1000: 0.0})
+        self.assertEqual(distribution.typical_price_score(2, 'fixed', 70), 1.0)
+        self.assertEqual(distribution.price_score(1, 'fixed', 50), 1.0)
+
+
+class GeoIndexTests(MarketplaceTestCase):
+    """Grid radius queries find the providers a haversine scan of every service area finds"""
+
+    def scan(self, latitude, longitude):
+        radii = dict(ServiceProviderProfile.objects.values_list('user_id', 'service_radius'))
+        nearest = {}
+        for area in ServiceArea.objects.filter(latitude__isnull=False, longitude__isnull=False):
+            distance = haversine_km(latitude, longitude, float(area.latitude), float(area.longitude))
+            radius = float(radii.get(area.provider_id, 0.0))
+            if distance <= radius and distance < nearest.get(area.provider_id, (math.inf,))[0]:
+                nearest[area.provider_id] = (distance, radius)
+        return nearest
+
+    def points(self):
+        rng = random.Random(5)
+        for _, _, latitude, longitude in AREAS:
+            yield latitude, longitude
+            for _ in range(5):
+                yield latitude + rng.uniform(-0.4, 0.4), longitude + rng.uniform(-0.4, 0.4)
+        yield 0.0, 0.0
+
+    def assertSameReach(self, index, latitude, longitude):
+        expected = self.scan(latitude, longitude)
+        actual = index.providers_within_reach(latitude, longitude)
+        self.assertEqual(set(actual), set(expected))
+        for provider_id, (distance, radius) in expected.items():
+            self.assertAlmostEqual(actual[provider_id][0], distance, places=9)
+            self.assertEqual(actual[provider_id][1], radius)
+
+    def test_matches_scan(self):
+        index = ProviderGeoIndex.build()
+        reached = 0
+        for latitude, longitude in self.points():
+            with self.subTest(latitude=latitude, longitude=longitude):
+                self.assertSameReach(index, latitude, longitude)
+                reached += bool(self.scan(latitude, longitude))
+        self.assertGreater(reached, 10)
+
+    def test_signal_updates_match_scan(self):
+        mark_geo_index_stale()
+        get_geo_index()
+        # The rows roll back, the process-wide index would not
+        self.addCleanup(mark_geo_index_stale)
+        area = ServiceArea.objects.filter(latitude__isnull=False).order_by('id').first()
+        area.latitude, area.longitude = AREAS[-1][2], AREAS[-1][3]
+        area.save()
+        ServiceArea.objects.filter(latitude__isnull=False).order_by('-id').first().delete()
+        profile = ServiceProviderProfile.objects.order_by('user_id').first()
+        profile.service_radius = 40
+        profile.save()
+        for latitude, longitude in self.points():
+            with self.subTest(latitude=latitude, longitude=longitude):
+                self.assertSameReach(get_geo_index(), latitude, longitude)
+
+    def test_resolves_place_names(self):
+        index = ProviderGeoIndex.build()
+        area = ServiceArea.objects.filter(latitude__isnull=False).exclude(area_name='').order_by('id').first()
+        points = ServiceArea.objects.filter(latitude__isnull=False, area_name=area.area_name).values_list(
+            'latitude', 'longitude'
+        )
+        latitude, longitude = index.resolve(f'  {area.area_name.upper()} ')
+        self.assertAlmostEqual(latitude, sum(float(lat) for lat, _ in points) / len(points))
+        self.assertAlmostEqual(longitude, sum(float(lng) for _, lng in points) / len(points))
+        self.assertEqual(index.resolve('12.5,77.5'), (12.5, 77.5))
+        self.assertIsNone(index.resolve('nowhere'))
+
+
+class PostalIndexTests(MarketplaceTestCase):
+    """Prefix lookups find the providers a scan of every service area's postal code finds"""
+
+    def scan(self, postal_code, min_candidates, min_length=3, within=None):
+        code = normalize_postal_code(postal_code)
+        if not code:
+            return None
+        areas = [
+            (provider_id, normalize_postal_code(area_code))
+            for provider_id, area_code in ServiceArea.objects.values_list('provider_id', 'postal_code')
+        ]
+        best = None
+        for length in range(len(code), min(min_length, len(code)) - 1, -1):
+            matched = {
+                provider_id for provider_id, area_code in areas
+                if area_code and area_code.startswith(code[:length]) and (within is None or provider_id in within)
+            }
+            if matched:
+                best = (code[:length], matched)
+                if len(matched) >= min_candidates:
+                    break
+        return best
+
+    def codes(self):
+        codes = sorted(set(ServiceArea.objects.exclude(postal_code='').values_list('postal_code', flat=True)))
+        return codes[:10] + ['560099', ' 40-0012 ', '110', '99999', '', '56']
+
+    def test_matches_scan(self):
+        index = PostalPrefixIndex.build()
+        within = set(self.provider_ids[::2])
+        for postal_code in self.codes():
+            for min_candidates in (1, 3, 10):
+                for allowed in (None, within):
+                    with self.subTest(postal_code=postal_code, min_candidates=min_candidates, within=allowed):
+                        self.assertEqual(
+                            index.match(postal_code, min_candidates, 3, allowed),
+                            self.scan(postal_code, min_candidates, 3, allowed)
+                        )
+
+    def test_signal_updates_match_scan(self):
+        mark_postal_index_stale()
+        providers_serving('560001')
+        self.addCleanup(mark_postal_index_stale)
+        area = ServiceArea.objects.exclude(postal_code='').order_by('id').first()
+        area.postal_code = '110042'
+        area.save()
+        ServiceArea.objects.exclude(postal_code='').order_by('-id').first().delete()
+        for postal_code in self.codes():
+            with self.subTest(postal_code=postal_code):
+                expected = self.scan(postal_code, 10)
+                self.assertEqual(providers_serving(postal_code, min_candidates=10), expected and expected[1])
+
+
+class ProviderTextIndexTests(MarketplaceTestCase):
+    """Sparse mat-vec scores equal a TF-IDF cosine computed provider by provider"""
+
+    QUERIES = ['Plumbing, Cleaning', 'electrical repair service', 'experienced painting professional',
+               'cleaning cleaning', 'nothing matches here', '']
+
+    def scan(self, query):
+        documents = {}
+        for profile in ServiceProviderProfile.objects.all():
+            titles = Service.objects.filter(provider_id=profile.user_id).order_by('id').values_list('title', flat=True)
+            documents[profile.user_id] = Counter(tokenize(f"{profile.description} {' '.join(titles)}"))
+        document_frequency = Counter(term for counts in documents.values() for term in counts)
+        idf = {
+            term: math.log((1 + len(documents)) / (1 + frequency)) + 1
+            for term, frequency in document_frequency.items()
+        }
+        query_weights = {term: idf[term] for term in set(tokenize(query)) if term in idf}
+        query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+
+        scores = {}
+        for provider_id, counts in documents.items():
+            weights = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            if not query_weights or not norm:
+                scores[provider_id] = 0.0
+                continue
+            dot = sum(weights.get(term, 0.0) * w for term, w in query_weights.items())
+            scores[provider_id] = dot / (norm * query_norm)
+        return scores
+
+    def assertMatchesScan(self, index):
+        candidates = self.provider_ids + [0]
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                expected = self.scan(query)
+                scores = index.score(query, candidates)
+                self.assertEqual(set(scores), set(candidates))
+                self.assertEqual(scores[0], 0.0)
+                for provider_id in self.provider_ids:
+                    self.assertAlmostEqual(scores[provider_id], min(expected[provider_id], 1.0))
+
+    def test_matches_scan(self):
+        self.assertMatchesScan(ProviderTextIndex.build())
+
+    def test_incremental_updates_match_scan(self):
+        index = ProviderTextIndex.build()
+        index.score('plumbing', self.provider_ids)
+
+        service = Service.objects.order_by('id').first()
+        service.title = 'Emergency plumbing and electrical repair'
+        service.save()
+        Service.objects.create(
+            provider_id=self.provider_ids[-1], category=service.category, title='Deep cleaning cleaning',
+            description='', base_price=Decimal('500.00'), duration_hours=Decimal('2.0'),
+        )
+        profile = ServiceProviderProfile.objects.get(user_id=self.provider_ids[0])
+        profile.description = 'Painting professional, ten years experienced'
+        profile.save()
+
+        self.assertTrue(index.is_current())
+        self.assertEqual(index.refresh(), len({service.provider_id, self.provider_ids[-1]}))
+        index.update_providers([profile.user_id])
+        self.assertMatchesScan(index)
+
+    def test_deleted_service_is_not_current(self):
+        index = ProviderTextIndex.build()
+        self.assertTrue(index.is_current())
+        Service.objects.order_by('id').first().delete()
+        self.assertFalse(index.is_current())
+        self.assertTrue(ProviderTextIndex.build().is_current())
+
+
+class HydrationTests(MarketplaceTestCase):
+    """Ranked providers are hydrated with their profiles and services in two queries"""
+
+    def ranked(self, provider_ids):
+        score_data = dict.fromkeys(RecommendationEngine.COMPONENTS, 0.5)
+        return [(provider_id, {**score_data, 'final_score': 1.0 / (i + 1)}) for i, provider_id in enumerate(provider_ids)]
+
+    def test_two_queries_regardless_of_providers(self):
+        engine = RecommendationEngine()
+        for count in (1, len(self.provider_ids)):
+            with self.subTest(providers=count), self.assertNumQueries(2):
+                recommendations = engine._hydrate(self.ranked(self.provider_ids[:count]), None)
+                for rec in recommendations:
+                    self.assertIsNotNone(rec['provider_profile'].average_rating)
+            self.assertEqual([rec['provider'].id for rec in recommendations], self.provider_ids[:count])
+
+    def test_services_are_active_and_in_category(self):
+        engine = RecommendationEngine()
+        recommendations = engine._hydrate(self.ranked(self.provider_ids), 'Cleaning')
+        for rec in recommendations:
+            expected = set(Service.objects.filter(
+                provider=rec['provider'], is_active=True, category__name='Cleaning'
+            ).values_list('id', flat=True))
+            self.assertEqual({service['id'] for service in rec['services']}, expected)
+
+
+class PrecomputedRecommendationTests(MarketplaceTestCase):
+    """Rows stored by precompute_recommendations are served while fresh, eligible and complete"""
+
+    LIMIT = 5
+
+    def setUp(self):
+        # Three active customers keep the command fast
+        self.customer = self.customers[0]
+        User.objects.filter(role='customer').exclude(id__in=[c.id for c in self.customers[:3]]).update(
+            is_active=False
+        )
+        self.precompute()
+
+    def precompute(self):
+        call_command('precompute_recommendations', limit=self.LIMIT, stdout=StringIO())
+
+    def stored(self, category=''):
+        return dict(RecommendationScore.objects.filter(
+            customer=self.customer, service_category=category
+        ).values_list('provider_id', 'overall_score'))
+
+    def age_rows(self, seconds):
+        RecommendationScore.objects.update(calculated_at=timezone.now() - timedelta(seconds=seconds))
+
+    def read(self, max_recommendations=LIMIT, max_age=3600):
+        engine = RecommendationEngine(precomputed_max_age=max_age)
+        return engine.get_precomputed_recommendations(self.customer, None, max_recommendations)
+
+    def test_rerun_keeps_unchanged_rows_fresh(self):
+        self.assertEqual(len(self.stored()), self.LIMIT)
+        self.age_rows(7200)
+        self.assertIsNone(self.read())
+        self.precompute()
+        recommendations = self.read()
+        self.assertIsNotNone(recommendations)
+        self.assertEqual({rec['provider'].id for rec in recommendations}, set(self.stored()))
+
+    def test_serves_stored_order_and_scores(self):
+        stored = self.stored()
+        recommendations = self.read(3)
+        self.assertEqual([float(stored[rec['provider'].id]) for rec in recommendations],
+                         sorted(map(float, stored.values()), reverse=True)[:3])
+
+    def test_ineligible_provider_is_not_served(self):
+        best = max(self.stored().items(), key=lambda item: item[1])[0]
+        ServiceProviderProfile.objects.filter(user_id=best).update(is_available=False)
+        recommendations = self.read(self.LIMIT - 1)
+        self.assertNotIn(best, [rec['provider'].id for rec in recommendations])
+        # The remaining rows no longer fill the full set
+        self.assertIsNone(self.read())
+
+    def test_falls_back_to_live_scoring(self):
+        engine = RecommendationEngine(precomputed_max_age=3600)
+        # Only LIMIT rows are stored, so a longer list was scored live
+        recommendations = engine.get_provider_recommendations(self.customer, max_recommendations=self.LIMIT + 3)
+        self.assertEqual(len(recommendations), self.LIMIT + 3)
+
+    def test_live_requests_do_not_replace_the_stored_set(self):
+        stored = self.stored()
+        engine = RecommendationEngine()
+        self.assertTrue(engine.get_provider_recommendations(self.customer, max_recommendations=2))
+        self.assertTrue(engine.get_provider_recommendations(
+            self.customer, location='12.9352,77.6245', max_recommendations=self.LIMIT
+        ))
+        self.assertEqual(set(self.stored()), set(stored))
+        self.assertIsNotNone(self.read())
+
+
+class BrokenCache:
+    def __getattr__(self, name):
+        raise ConnectionError("cache backend unavailable")
+
+
+class RecommendationCacheTests(MarketplaceTestCase):
+    """Cache keys suit every backend, and a failing backend falls back to live scoring"""
+
+    def test_keys_are_valid_for_memcached(self):
+        cache = RecommendationCache()
+        cache.set(1, 'Pest Control', 'Connaught Place, New Delhi', 10, [])
+        key = cache._entry_key(1, 'Pest Control', 'Connaught Place, New Delhi', 10)
+        self.assertEqual(list(memcache_key_warnings(key)), [])
+        self.assertEqual(cache.get(1, 'Pest Control', 'Connaught Place, New Delhi', 10), [])
+        self.assertIsNone(cache.get(1, 'Pest Control', 'Connaught Place', 10))
+
+    def test_backend_errors_fall_back_to_live_scoring(self):
+        cache = RecommendationCache()
+        live = RecommendationEngine().get_provider_recommendations(self.customers[0], max_recommendations=5)
+        with mock.patch.object(RecommendationCache, 'cache', BrokenCache()), self.assertLogs(cache_logger, 'ERROR'):
+            recommendations = RecommendationEngine(cache=cache).get_provider_recommendations(
+                self.customers[0], max_recommendations=5
+            )
+        self.assertEqual([rec['provider'].id for rec in recommendations], [rec['provider'].id for rec in live])
+        self.assertEqual(cache.stats()['misses'], 1)
+
+
+class SentimentNegationTests(SimpleTestCase):
+    """Negations flip valences only within their own clause"""
+
+    def setUp(self):
+        self.analyzer = LexiconSentimentAnalyzer()
+
+    def assertLabel(self, text, label):
+        (score, actual), = self.analyzer.analyze([text])
+        self.assertEqual(actual, label, f"{text!r} scored {score}")
+
+    def test_negation_stops_at_sentence_end(self):
+        self.assertLabel("No issues. Excellent, punctual plumber", 'positive')
+
+    def test_negation_stops_at_comma(self):
+        self.assertLabel("no problems, excellent work", 'positive')
+
+    def test_negation_stays_in_its_review_part(self):
+        self.assertLabel(review_text("No complaints", "excellent work, great attitude"), 'positive')
+
+    def test_negation_within_clause(self):
+        self.assertLabel("not good at all", 'negative')
+        self.assertLabel("never on time, rude", 'negative')
+
+    def test_negated_negative_is_positive(self):
+        self.assertLabel("no complaints at all", 'positive')
+
+    def test_negations_have_no_valence(self):
+        # A negation is consumed before the lexicon is looked up
+        self.assertFalse(NEGATIONS & set(LEXICON))
+
+    def test_clause_break_resets_intensifier(self):
+        boosted, plain = self.analyzer.score_batch(["very good", "very. good"])
+        self.assertGreater(boosted, plain)
+
+
+class ScoreReviewsTests(MarketplaceTestCase):
+    """The backfill scores every review once, in pages smaller than the table"""
+
+    def test_scores_every_review(self):
+        total = Review.objects.count()
+        self.assertGreater(total, 14)
+        self.assertEqual(score_reviews(chunk_size=7), total)
+        analyzer = LexiconSentimentAnalyzer()
+        reviews = list(Review.objects.order_by('id'))
+        expected = analyzer.analyze([review_text(r.comment, r.pros, r.cons) for r in reviews])
+        self.assertEqual(
+            [(float(r.sentiment_score), r.sentiment_label) for r in reviews],
+            [(score, label) for score, label in expected]
+        )
+
+    def test_incremental_only_scores_new_reviews(self):
+        Review.objects.filter(id__in=Review.objects.order_by('id').values('id')[:10]).update(sentiment_score=0.5)
+        self.assertEqual(score_reviews(incremental=True, chunk_size=3), Review.objects.count() - 10)
+        self.assertFalse(Review.objects.filter(sentiment_score__isnull=True).exists())
+        self.assertEqual(score_reviews(incremental=True, chunk_size=3), 0)
+
+
+class DemandForecastTests(MarketplaceTestCase):
+    """Grouped counts and the batched fit equal a per-booking count and a per-series fit"""
+
+    def count(self, start, end, prefix_length):
+        n_days = (end - start).days
+        series = defaultdict(lambda: [0.0] * n_days)
+        for booking in Booking.objects.exclude(status='cancelled').select_related('service__category'):
+            day = timezone.localdate(booking.created_at)
+            if not start <= day < end:
+                continue
+            category = booking.service.category.name
+            area = booking.postal_code[:prefix_length].strip().upper()
+            for key in ([(category, area)] if area else []) + [(category, '')]:
+                series[key][(day - start).days] += 1
+        return dict(series)
+
+    def test_series_match_booking_count(self):
+        today = timezone.localdate() + timedelta(days=1)
+        for prefix_length in (2, 3):
+            with self.subTest(prefix_length=prefix_length):
+                forecaster = DemandForecaster(area_prefix_length=prefix_length)
+                start = today - timedelta(days=forecaster.history_days)
+                keys, history = forecaster.load_series(start, today)
+                self.assertEqual(len(keys), len(set(keys)))
+                self.assertEqual(
+                    {key: list(row) for key, row in zip(keys, history)},
+                    self.count(start, today, prefix_length)
+                )
+
+    def test_fit_matches_per_series_fit(self):
+        forecaster = DemandForecaster()
+        today = timezone.localdate() + timedelta(days=1)
+        start = today - timedelta(days=forecaster.history_days)
+        _, history = forecaster.load_series(start, today)
+        model = forecaster.fit(history, start)
+
+        t = np.arange(history.shape[1], dtype=float)
+        weekdays = [(start + timedelta(days=i)).weekday() for i in range(history.shape[1])]
+        for i, y in enumerate(history):
+            with self.subTest(series=i):
+                slope, intercept = np.polyfit(t, y, 1)
+                self.assertAlmostEqual(model['slope'][i], slope)
+                self.assertAlmostEqual(model['intercept'][i], intercept)
+
+                trend = [max(intercept + slope * x, 1e-9) for x in t]
+                ratios = []
+                for weekday in range(7):
+                    observed = sum(v for v, d in zip(y, weekdays) if d == weekday)
+                    expected = sum(v for v, d in zip(trend, weekdays) if d == weekday)
+                    ratios.append(observed / expected if expected > 0 else 1.0)
+                mean = sum(ratios) / 7
+                seasonal = [r / mean for r in ratios] if mean > 0 else [1.0] * 7
+                np.testing.assert_allclose(model['seasonal'][i], seasonal)
+
+                fitted = [trend[x] * seasonal[d] for x, d in enumerate(weekdays)]
+                residual = math.sqrt(sum((v - f) ** 2 for v, f in zip(y, fitted)) / (len(y) - 2))
+                self.assertAlmostEqual(model['residual_std'][i], residual)
+
+    def stored(self):
+        return sorted(DemandForecast.objects.values_list(
+            'service_category', 'location_area', 'forecast_date', 'predicted_demand',
+            'confidence_interval', 'seasonal_factor', 'trend_factor'
+        ))
+
+    def test_incremental_run_matches_full_run(self):
+        forecaster = DemandForecaster()
+        today = timezone.localdate() + timedelta(days=1)
+        self.assertGreater(forecaster.run(today=today)['series'], 0)
+
+        booking = Booking.objects.exclude(status='cancelled').exclude(postal_code='').order_by('-created_at').first()
+        booking.status = 'cancelled'
+        booking.save()
+        result = forecaster.run(incremental=True, today=today)
+        self.assertEqual(result['series'], 2)
+        incremental = self.stored()
+
+        forecaster.run(today=today)
+        self.assertEqual(incremental, self.stored())
+
+
+class DynamicPricingTests(MarketplaceTestCase):
+    """Batched suggestions equal factors computed key by key, and table lookups equal a query"""
+
+    def scan(self, now, prefix_length=3):
+        services = list(Service.objects.filter(is_active=True).select_related('category'))
+        areas = defaultdict(set)
+        for area in ServiceArea.objects.exclude(postal_code=''):
+            areas[area.provider_id].add(area_key(area.postal_code, prefix_length))
+        slots = Counter(ServiceAvailability.objects.filter(is_available=True).values_list('provider_id', flat=True))
+        bookings = list(Booking.objects.exclude(status='cancelled').filter(
+            created_at__gte=now - timedelta(days=DynamicPricingEngine.RECENT_DAYS)
+        ).select_related('service__category'))
+
+        expected = {}
+        for category in {service.category.name for service in services}:
+            offered = [service for service in services if service.category.name == category]
+            units = Counter(service.price_unit for service in offered)
+            unit = min(units, key=lambda name: (-units[name], name))
+            base = statistics.median(float(service.base_price) for service in offered if service.price_unit == unit)
+            providers = {service.provider_id for service in offered}
+            for area in {''}.union(*(areas[provider_id] for provider_id in providers)):
+                serving = [p for p in providers if not area or area in areas[p]]
+                capacity = sum(max(slots[p] / 7.0, 1.0) for p in serving)
+                recent = [
+                    b for b in bookings if b.service.category.name == category and
+                    (not area or area_key(b.postal_code, prefix_length) == area)
+                ]
+                urgent = sum(DynamicPricingEngine.PRIORITY_WEIGHTS.get(b.priority, 0.0) for b in recent)
+                demand = min(max(1 + 0.5 * (len(recent) / 14 / capacity - 0.5), 0.8), 1.5)
+                competition = min(max(1.1 - 0.05 * math.log2(1 + len(serving)), 0.85), 1.1)
+                urgency = 1 + 0.3 * (urgent / len(recent) if recent else 0.0)
+                expected[(category, area)] = {
+                    'unit': unit, 'base': base, 'providers': len(serving), 'recent': len(recent),
+                    'suggested': base * demand * competition * urgency,
+                }
+        return expected
+
+    def test_matches_scan(self):
+        now = timezone.now()
+        rows = DynamicPricingEngine(window_days=2).compute(now)
+        expected = self.scan(now)
+
+        self.assertEqual(len(rows), 2 * len(expected))
+        for row in rows:
+            with self.subTest(category=row.service_category, area=row.location_area):
+                key = expected[(row.service_category, row.location_area)]
+                self.assertEqual(row.market_data['price_unit'], key['unit'])
+                self.assertEqual(row.market_data['providers'], key['providers'])
+                self.assertEqual(row.market_data['recent_bookings'], key['recent'])
+                self.assertAlmostEqual(row.base_price, key['base'], places=2)
+                self.assertAlmostEqual(row.suggested_price, key['suggested'], places=2)
+
+    def test_forecast_replaces_recent_demand(self):
+        now = timezone.now()
+        category = Service.objects.filter(is_active=True).order_by('id').first().category.name
+        DemandForecast.objects.create(
+            service_category=category, location_area='', forecast_date=timezone.localdate(now) + timedelta(days=1),
+            predicted_demand=50, confidence_interval={}, seasonal_factor=1, trend_factor=1,
+        )
+        rows = {
+            (row.service_category, row.location_area, row.date_range_start.date()): row
+            for row in DynamicPricingEngine(window_days=2).compute(now)
+        }
+        today, tomorrow = timezone.localdate(now), timezone.localdate(now) + timedelta(days=1)
+        self.assertFalse(rows[(category, '', today)].market_data['forecast'])
+        self.assertTrue(rows[(category, '', tomorrow)].market_data['forecast'])
+        self.assertEqual(rows[(category, '', tomorrow)].market_data['expected_demand'], 50)
+
+    def test_table_matches_query(self):
+        now = timezone.now()
+        DynamicPricing.objects.bulk_create(DynamicPricingEngine(window_days=3).compute(now))
+        table = PriceSuggestionTable()
+        postal_codes = sorted(set(ServiceArea.objects.values_list('postal_code', flat=True)))[:5] + ['', '99999']
+        areas_found = 0
+        for category in CATEGORIES + ['Unknown']:
+            for postal_code in postal_codes:
+                for days in range(4):
+                    when = now + timedelta(days=days)
+                    with self.subTest(category=category, postal_code=postal_code, days=days):
+                        current = DynamicPricing.objects.filter(
+                            service_category=category, date_range_start__lte=when, date_range_end__gt=when
+                        )
+                        area = area_key(postal_code)
+                        expected = (area and current.filter(location_area=area).first()) or \
+                            current.filter(location_area='').first()
+                        suggestion = table.get(category, postal_code, when)
+                        self.assertEqual(suggestion and suggestion.pk, expected and expected.pk)
+                        areas_found += bool(suggestion and suggestion.location_area)
+        self.assertGreater(areas_found, 0)
+
+
+class PriceQuoteViewTests(MarketplaceTestCase):
+    """The price quote endpoint answers bad input with 400, not a server error"""
+
+    def setUp(self):
+        self.client.force_login(self.customers[0])
+        self.service = Service.objects.filter(is_active=True).order_by('id').first()
+
+    def quote(self, **params):
+        return self.client.get(reverse('ml_engine:price_quote'), params)
+
+    def test_invalid_service_id_is_bad_request(self):
+        for params in ({}, {'service_id': ''}, {'service_id': 'abc'}, {'service_id': '-3'}, {'service_id': '1.5'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.quote(**params).status_code, 400)
+
+    def test_unknown_service_is_not_found(self):
+        self.assertEqual(self.quote(service_id=10 ** 9).status_code, 404)
+
+    def test_invalid_date_is_bad_request(self):
+        self.assertEqual(self.quote(service_id=self.service.id, date='tomorrow').status_code, 400)
+
+    def test_quotes_service(self):
+        response = self.quote(service_id=self.service.id, date='2026-01-05')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['service_id'], self.service.id)
+        self.assertGreater(response.json()['quoted_price'], 0)
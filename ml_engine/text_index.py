@@ -0,0 +1,314 @@
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter, defaultdict
+from pathlib import Path
+import logging
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from accounts.models import ServiceProviderProfile
+from services.models import Service
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have i in is it my of on or our the to we with you your'.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stop words, with simple plurals folded"""
+    tokens = []
+    for token in TOKEN_RE.findall((text or '').lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def column_dot(indptr: np.ndarray, column_rows: np.ndarray, column_weights: np.ndarray,
+               term_ids: List[int], query_weights: np.ndarray, n_rows: int) -> np.ndarray:
+    """Sparse mat-vec over column-major arrays: gather the query's columns and sum them into rows"""
+    starts, ends = indptr[term_ids], indptr[np.asarray(term_ids) + 1]
+    lengths = ends - starts
+    positions = np.repeat(starts - np.cumsum(np.concatenate([[0], lengths[:-1]])), lengths) + \
+        np.arange(lengths.sum())
+    return np.bincount(
+        column_rows[positions],
+        weights=column_weights[positions] * np.repeat(query_weights, lengths),
+        minlength=n_rows
+    )
+
+
+def table_signature() -> Tuple[int, Optional[int], int, Optional[int]]:
+    """(profile count, highest profile id, service count, highest service id)"""
+    profiles = ServiceProviderProfile.objects.order_by().aggregate(total=Count('id'), last=Max('id'))
+    services = Service.objects.order_by().aggregate(total=Count('id'), last=Max('id'))
+    return (profiles['total'], profiles['last'], services['total'], services['last'])
+
+
+class ProviderTextIndex:
+    """
+    Sparse TF-IDF matrix over provider descriptions and service titles
+
+    Each provider keeps its own term ids and sublinear term frequencies, so a
+    changed provider is re-tokenized on its own. The weighted matrix (idf applied,
+    rows L2-normalized) is compiled lazily into column-major arrays and a whole
+    preference query is scored against every provider with one sparse mat-vec,
+    giving cosine similarities in [0, 1].
+
+    The table signature taken with the watermark tells whether a saved index still
+    belongs to the current database: services added or edited later are caught by
+    refresh(), but a deleted profile or service means it must be rebuilt.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.documents: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}  # provider -> (term ids, 1 + log tf)
+        self.watermark = None  # Services updated after this are not indexed yet
+        self.signature = None  # table_signature() as of the watermark
+        self._compiled = None
+
+    @classmethod
+    def build(cls) -> 'ProviderTextIndex':
+        """Build the index for all providers"""
+        index = cls()
+        watermark, signature = timezone.now(), table_signature()
+        index._index_documents(index._load_texts(None))
+        index.watermark, index.signature = watermark, signature
+        return index
+
+    def is_current(self) -> bool:
+        """False if this index was built from another database or an indexed row was deleted since"""
+        if self.signature is None:
+            return False
+        profiles, last_profile, services, last_service = self.signature
+        return (
+            ServiceProviderProfile.objects.filter(id__lte=last_profile or 0).count() == profiles and
+            Service.objects.filter(id__lte=last_service or 0).count() == services
+        )
+
+    def update_providers(self, provider_ids: Iterable[int]) -> int:
+        """Re-index the given providers from the database, dropping those that no longer exist"""
+        provider_ids = set(provider_ids)
+        if not provider_ids:
+            return 0
+        texts = self._load_texts(provider_ids)
+        for provider_id in provider_ids - set(texts):
+            self.documents.pop(provider_id, None)
+        self._index_documents(texts)
+        self._compiled = None
+        return len(provider_ids)
+
+    def refresh(self) -> int:
+        """
+        Re-index providers whose services changed since the last build or refresh.
+        Only call this on a current index (see is_current()), since it advances the signature.
+        """
+        watermark, signature = timezone.now(), table_signature()
+        changed = set(Service.objects.filter(updated_at__gte=self.watermark).order_by().values_list(
+            'provider_id', flat=True
+        ))
+        self.update_providers(changed)
+        self.watermark, self.signature = watermark, signature
+        return len(changed)
+
+    def _load_texts(self, provider_ids: Optional[set]) -> Dict[int, str]:
+        """Description plus all service titles per provider, in two queries"""
+        profiles = ServiceProviderProfile.objects.order_by()
+        services = Service.objects.order_by('id')
+        if provider_ids is not None:
+            profiles = profiles.filter(user_id__in=provider_ids)
+            services = services.filter(provider_id__in=provider_ids)
+
+        titles = defaultdict(list)
+        for provider_id, title in services.values_list('provider_id', 'title'):
+            titles[provider_id].append(title)
+
+        return {
+            provider_id: f"{description} {' '.join(titles[provider_id])}"
+            for provider_id, description in profiles.values_list('user_id', 'description')
+        }
+
+    def _index_documents(self, texts: Dict[int, str]):
+        for provider_id, text in texts.items():
+            counts = Counter(tokenize(text))
+            term_ids = np.fromiter(
+                (self.vocabulary.setdefault(term, len(self.vocabulary)) for term in counts),
+                dtype=np.int64, count=len(counts)
+            )
+            frequencies = 1.0 + np.log(np.fromiter(counts.values(), dtype=float, count=len(counts)))
+            self.documents[provider_id] = (term_ids, frequencies)
+        self._compiled = None
+
+    def _compile(self):
+        """(row of provider, idf, column pointers, column rows, column weights)"""
+        if self._compiled is not None:
+            return self._compiled
+
+        provider_ids = list(self.documents)
+        row_of = {provider_id: row for row, provider_id in enumerate(provider_ids)}
+        n_terms = len(self.vocabulary)
+        lengths = [len(self.documents[provider_id][0]) for provider_id in provider_ids]
+        rows = np.repeat(np.arange(len(provider_ids)), lengths)
+        if provider_ids:
+            terms = np.concatenate([self.documents[provider_id][0] for provider_id in provider_ids])
+            frequencies = np.concatenate([self.documents[provider_id][1] for provider_id in provider_ids])
+        else:
+            terms = np.empty(0, dtype=np.int64)
+            frequencies = np.empty(0)
+
+        document_frequency = np.bincount(terms, minlength=n_terms)
+        idf = np.log((1.0 + len(provider_ids)) / (1.0 + document_frequency)) + 1.0
+
+        weights = frequencies * idf[terms]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(provider_ids)))
+        weights = np.divide(weights, norms[rows], out=np.zeros_like(weights), where=norms[rows] > 0)
+
+        order = np.argsort(terms, kind='stable')
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=n_terms))])
+
+        self._compiled = (row_of, idf, indptr, rows[order], weights[order])
+        return self._compiled
+
+    def score(self, query: str, candidate_providers: Iterable[int]) -> Dict[int, float]:
+        """Cosine similarity between the query text and each candidate's text"""
+        candidate_providers = list(candidate_providers)
+        row_of, idf, indptr, column_rows, column_weights = self._compile()
+
+        term_ids = sorted({self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary})
+        if not term_ids:
+            return {provider_id: 0.0 for provider_id in candidate_providers}
+
+        query_weights = idf[term_ids]
+        query_weights = query_weights / np.linalg.norm(query_weights)
+
+        similarities = column_dot(indptr, column_rows, column_weights, term_ids, query_weights, len(row_of))
+
+        return {
+            provider_id: float(min(similarities[row_of[provider_id]], 1.0)) if provider_id in row_of else 0.0
+            for provider_id in candidate_providers
+        }
+
+    def save(self, path: Path):
+        """Atomically write the index to disk (only build_text_index does this)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump({
+                'vocabulary': self.vocabulary,
+                'documents': self.documents,
+                'watermark': self.watermark,
+                'signature': self.signature,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'ProviderTextIndex':
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        index = cls()
+        index.vocabulary = data['vocabulary']
+        index.documents = data['documents']
+        index.watermark = data['watermark']
+        index.signature = data.get('signature')
+        return index
+
+
+def text_index_path() -> Path:
+    return Path(getattr(settings, 'ML_ENGINE_DATA_DIR', settings.BASE_DIR / 'ml_data')) / 'provider_text_index.pkl'
+
+
+_index: Optional[ProviderTextIndex] = None
+_loaded_mtime = None
+_checked_at = 0.0
+_last_refresh = 0.0
+_dirty = set()
+_lock = threading.Lock()
+
+
+def _load_current(path: Path) -> Optional[ProviderTextIndex]:
+    """The saved index, or None if there is none or it does not match the database"""
+    try:
+        index = ProviderTextIndex.load(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.error(f"Error loading provider text index from {path}: {str(e)}")
+        return None
+    if not index.is_current():
+        logger.warning(f"Provider text index at {path} does not match the database; run build_text_index --full")
+        return None
+    return index
+
+
+def get_text_index() -> ProviderTextIndex:
+    """
+    Process-wide index, loaded from disk on first use and built in memory only if
+    the saved one is missing or does not match the database. It is never saved here.
+
+    Providers changed in this process are re-indexed on the next call; service
+    changes from other processes are picked up every TEXT_INDEX_REFRESH_INTERVAL
+    seconds. A newer file written by build_text_index is loaded in its place,
+    checked every TEXT_INDEX_RELOAD_INTERVAL seconds.
+    """
+    global _index, _loaded_mtime, _checked_at, _last_refresh
+
+    refresh_interval = getattr(settings, 'TEXT_INDEX_REFRESH_INTERVAL', 60)
+    reload_interval = getattr(settings, 'TEXT_INDEX_RELOAD_INTERVAL', 3600)
+    with _lock:
+        if _index is None or time.monotonic() - _checked_at >= reload_interval:
+            _checked_at = time.monotonic()
+            path = text_index_path()
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                mtime = None
+            if mtime is not None and mtime != _loaded_mtime:
+                loaded = _load_current(path)
+                _loaded_mtime = mtime
+                if loaded is not None:
+                    _index = loaded
+                    _last_refresh = 0.0
+
+        if _index is None:
+            _index = ProviderTextIndex.build()
+            _last_refresh = time.monotonic()
+            _dirty.clear()
+
+        if _dirty:
+            _index.update_providers(_dirty)
+            _dirty.clear()
+
+        if time.monotonic() - _last_refresh >= refresh_interval:
+            _index.refresh()
+            _last_refresh = time.monotonic()
+
+        return _index
+
+
+def mark_text_index_dirty(provider_id: int):
+    """Re-index this provider on the next lookup in this process"""
+    with _lock:
+        _dirty.add(provider_id)
+
+
+def mark_text_index_stale():
+    """Drop this process's index; the next lookup loads the saved one or builds it again"""
+    global _index, _loaded_mtime
+    with _lock:
+        _index = None
+        _loaded_mtime = None
+        _dirty.clear()
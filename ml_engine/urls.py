@@ -7,6 +7,10 @@ urlpatterns = [
     # Recommendation API endpoints
     path('api/recommendations/', views.RecommendationAPIView.as_view(), name='recommendations_api'),
     path('api/service-recommendations/', views.ServiceRecommendationAPIView.as_view(), name='service_recommendations_api'),
+    path('api/cache-stats/', views.recommendation_cache_stats, name='cache_stats'),
+    path('api/profiling/', views.recommendation_profiling, name='profiling'),
+    path('api/prediction-log/', views.prediction_log_stats, name='prediction_log_stats'),
+    path('api/price-quote/', views.price_quote, name='price_quote'),
     
     # Recommendation dashboard
     path('dashboard/', views.recommendation_dashboard, name='recommendation_dashboard'),
@@ -11,6 +11,10 @@ import json
 import logging
 
 from .recommendation_engine import recommendation_engine, service_recommendation_engine
+from .cache import recommendation_cache
+from .profiling import recommendation_profiler
+from .dynamic_pricing import price_suggestions
+from .prediction_log import prediction_logger
 from .models import RecommendationScore, MLPrediction
 from accounts.models import User
 from services.models import Service, ServiceCategory
@@ -30,7 +34,7 @@ class RecommendationAPIView(View):
         Get personalized provider recommendations
         Query parameters:
         - category: Service category filter
-        - location: Location filter
+        - location: "lat,lng", postal code or area name
         - limit: Maximum number of recommendations (default: 10)
         """
         try:
@@ -181,3 +185,87 @@ def recommendation_dashboard(request):
     except Exception as e:
         logger.error(f"Error loading recommendation dashboard: {str(e)}")
         return render(request, 'error.html', {'error': 'Unable to load recommendations'})
+
+
+@login_required
+def recommendation_cache_stats(request):
+    """
+    Recommendation cache hit, miss and eviction counters for this process (staff only)
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    return JsonResponse(recommendation_cache.stats())
+
+
+@login_required
+def recommendation_profiling(request):
+    """
+    Per-stage latency, query count and candidate size histograms for this process (staff only)
+    Query parameters:
+    - reset: Clear the histograms after reading them
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    stages = recommendation_profiler.snapshot()
+    if request.GET.get('reset'):
+        recommendation_profiler.reset()
+    
+    return JsonResponse({
+        'enabled': recommendation_profiler.enabled,
+        'slow_log_ms': recommendation_profiler.slow_log_ms,
+        'stages': stages
+    })
+
+
+@login_required
+def prediction_log_stats(request):
+    """
+    MLPrediction write-behind queue depth and written, dropped and failed counters for this process (staff only)
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Access denied'}, status=403)
+    
+    return JsonResponse(prediction_logger.stats())
+
+
+@login_required
+def price_quote(request):
+    """
+    Dynamically adjusted price for a service
+    Query parameters:
+    - service_id: Service to quote
+    - postal_code: Customer postal code (optional)
+    - date: Booking date as YYYY-MM-DD (default: today)
+    """
+    service_id = request.GET.get('service_id', '')
+    if not service_id.isdigit():
+        return JsonResponse({'error': 'Invalid service_id'}, status=400)
+    
+    service = get_object_or_404(
+        Service.objects.select_related('category'),
+        id=int(service_id),
+        is_active=True
+    )
+    
+    when = None
+    if request.GET.get('date'):
+        try:
+            when = timezone.make_aware(timezone.datetime.strptime(request.GET['date'], '%Y-%m-%d'))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid date'}, status=400)
+    
+    postal_code = request.GET.get('postal_code', '')
+    suggestion = price_suggestions.get(service.category.name, postal_code, when)
+    
+    return JsonResponse({
+        'service_id': service.id,
+        'base_price': float(service.base_price),
+        'quoted_price': float(price_suggestions.quote(service, postal_code, when, customer_id=request.user.id)),
+        'factors': {
+            'demand_multiplier': float(suggestion.demand_multiplier),
+            'competition_factor': float(suggestion.competition_factor),
+            'urgency_factor': float(suggestion.urgency_factor),
+        } if suggestion else None
+    })
@@ -21,4 +21,5 @@ urlpatterns = [
     
     # API endpoints
     path('api/search/', views.search_api, name='search_api'),
+    path('api/recommendations/', views.recommendations_api, name='recommendations_api'),
 ]
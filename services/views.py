@@ -2,8 +2,10 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Avg, Count
+from django.conf import settings
 from django.core.paginator import Paginator
 from django.http import JsonResponse
+from django.template.loader import render_to_string
 from django.views.decorators.http import require_http_methods
 
 from .models import Service, ServiceCategory, ServiceAvailability, ServiceArea
@@ -13,6 +15,8 @@ from bookings.models import Booking
 
 # Import ML recommendation engine
 from ml_engine.recommendation_engine import recommendation_engine, service_recommendation_engine
+from ml_engine.postal_index import providers_serving
+from ml_engine.async_recommendations import recommendation_fetcher
 
 
 def service_list(request):
@@ -35,6 +39,12 @@ def service_list(request):
     if category:
         services = services.filter(category__name__icontains=category)
     
+    # Postal code filtering - providers serving the area, widened to nearby prefixes if few
+    postal_code = request.GET.get('postal_code', '').strip()
+    if postal_code:
+        serving = providers_serving(postal_code)
+        services = services.filter(provider_id__in=serving or [])
+    
     # Price range filtering
     min_price = request.GET.get('min_price')
     max_price = request.GET.get('max_price')
@@ -74,15 +84,17 @@ def service_list(request):
     # Get categories for filter dropdown
     categories = ServiceCategory.objects.filter(is_active=True)
     
-    # Get ML recommendations for logged-in customers
+    # Get ML recommendations for logged-in customers, unless the page fetches them afterwards
+    async_recommendations = getattr(settings, 'SERVICE_LIST_ASYNC_RECOMMENDATIONS', True)
     recommendations = []
     service_recommendations = []
-    if request.user.is_authenticated and request.user.role == 'customer':
+    if not async_recommendations and request.user.is_authenticated and request.user.role == 'customer':
         try:
             # Get provider recommendations
             recommendations = recommendation_engine.get_provider_recommendations(
                 customer=request.user,
                 service_category=category,
+                location=postal_code or None,
                 max_recommendations=3
             )
             
@@ -100,16 +112,49 @@ def service_list(request):
         'categories': categories,
         'search_query': search_query,
         'selected_category': category,
+        'postal_code': postal_code,
         'min_price': min_price,
         'max_price': max_price,
         'sort_by': sort_by,
         'recommendations': recommendations,
         'service_recommendations': service_recommendations,
+        'async_recommendations': async_recommendations,
     }
     
     return render(request, 'services/service_list.html', context)
 
 
+@login_required
+def recommendations_api(request):
+    """
+    Recommended providers block for the service listing, loaded after the page
+    Query parameters:
+    - category: Service category filter
+    - postal_code: Customer postal code
+    
+    Answers within RECOMMENDATION_TIME_BUDGET_MS with live, cached, stale or
+    best-rated providers; source says which.
+    """
+    if request.user.role != 'customer':
+        return JsonResponse({'error': 'Only customers can get recommendations'}, status=403)
+    
+    recommendations, source = recommendation_fetcher.get_provider_recommendations(
+        customer=request.user,
+        service_category=request.GET.get('category') or None,
+        location=request.GET.get('postal_code', '').strip() or None,
+        max_recommendations=3
+    )
+    
+    return JsonResponse({
+        'source': source,
+        'count': len(recommendations),
+        'html': render_to_string('services/_recommended_providers.html', {
+            'recommendations': recommendations,
+            'source': source,
+        }, request=request) if recommendations else '',
+    })
+
+
 def service_detail(request, service_id):
     """Service detail view"""
     service = get_object_or_404(